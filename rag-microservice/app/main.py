@@ -1,6 +1,79 @@
-from fastapi import FastAPI
-from app.routers import core
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from prometheus_client import generate_latest
+from app.routers import core, graph, jobs, migration, search
+from app.services import llm_clients, metrics, static_analysis
+from app.services.jobs import job_manager
+from app.utils.process import run_blocking
+import logging
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+
+def load_analysis_modules():
+    # The routers import these on first use so the worker starts serving quickly
+    from app.services import graph_export, migration, pipeline, search_index  # noqa: F401
+
+
+async def warm_up():
+    """Load the analysis modules and LLM clients in the background, before the first request needs them"""
+    started = time.perf_counter()
+    try:
+        await run_blocking(load_analysis_modules)
+        from app.services.migration import MIGRATION_MODEL
+        from app.services.pipeline import REFINE_MODEL, SUMMARY_MODEL
+        await llm_clients.warm_up(dict.fromkeys([SUMMARY_MODEL, REFINE_MODEL, MIGRATION_MODEL]))
+        logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.warning(f"Warm-up failed, continuing on demand: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warming = asyncio.create_task(warm_up())
+    yield
+    warming.cancel()
+    await job_manager.close()
+    await llm_clients.close()
+    await run_blocking(static_analysis.shutdown_pool)
+    search_index = sys.modules.get("app.services.search_index")
+    if search_index is not None:  # Loaded by the warm-up or the first analysis; finish its pending publishes
+        await run_blocking(search_index.search_indexes.flush)
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(core.router)
+app.include_router(graph.router)
+app.include_router(jobs.router)
+app.include_router(migration.router)
+app.include_router(search.router)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (e.g. /jobs/{job_id}) to keep the number of series bounded
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(method=request.method, route=getattr(route, "path", "unmatched"),
+                                            status=str(status)).observe(time.perf_counter() - started)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Process-wide metrics in the Prometheus text format"""
+    return Response(generate_latest(metrics.REGISTRY), media_type=metrics.CONTENT_TYPE)
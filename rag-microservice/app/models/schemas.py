@@ -6,7 +6,12 @@ class CodeAnalysisRequest(BaseModel):
     framework: str
 
 class MigrationRequest(BaseModel):
-    source_code: str
+    source_code: Optional[str] = None  # a single file or snippet, or:
+    git_url: Optional[str] = None  # a repository, migrated file by file
+    code_folder: Optional[str] = ""
+    auth_token: Optional[str] = None
+    language: Optional[str] = None  # selects the files of the repository, like PlantUMLTreeRequest.language
+    filename: Optional[str] = None  # name of source_code (e.g. App.jsx), picks its parser
     source_framework: str
     target_frameworks: List[str]
     preserve_structure: bool = True
@@ -17,6 +22,9 @@ class MigrationResponse(BaseModel):
     dependency_changes: List[str]
     warnings: List[str]
     confidence_score: float
+    translated_files: Optional[Dict[str, Dict[str, str]]] = None  # framework -> path -> code (repositories)
+    levels: List[List[str]] = []  # components by dependency level, leaves first
+    stats: Dict = {}
 
 class ComponentTranslationRequest(BaseModel):
     component_code: str
@@ -27,4 +35,35 @@ class MermaidTreeRequest(BaseModel):
     git_url: str
     language: str
     code_folder: str
-    auth_token: Optional[str] = None
\ No newline at end of file
+    auth_token: Optional[str] = None
+
+class PlantUMLTreeRequest(BaseModel):
+    git_url: str
+    language: str
+    code_folder: str
+    auth_token: Optional[str] = None
+    max_depth: Optional[int] = 5
+    include_external: Optional[bool] = False
+    use_cache: Optional[bool] = True
+    build_project: Optional[bool] = False
+    include_timings: Optional[bool] = False
+
+class GraphRequest(BaseModel):
+    git_url: str  # repository analyzed before through /plantuml-tree
+    language: str
+    code_folder: str
+    auth_token: Optional[str] = None  # required to read private repositories
+
+class GraphPageRequest(GraphRequest):
+    partition: Optional[str] = "package"  # "package" (by directory) or "subtree" (by entry point)
+    page: Optional[int] = 0
+    page_size: Optional[int] = 500  # functions per page
+    link: Optional[str] = "?page={page}"  # URL of another page for cross-links; {page} is its number
+
+class SearchRequest(BaseModel):
+    query: str
+    top_k: Optional[int] = 10
+    repo: Optional[str] = None  # git_url of an analyzed repository
+    auth_token: Optional[str] = None  # token for private repositories; only readable repositories are searched
+    file: Optional[str] = None  # file path or directory prefix, relative to the analyzed folder
+    language: Optional[str] = None
@@ -0,0 +1,64 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.schemas import GraphPageRequest, GraphRequest
+from app.services.access import repo_access
+from app.utils.process import run_blocking
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+NOT_ANALYZED = "Repository has not been analyzed yet, run /plantuml-tree first"
+NO_ACCESS = "Repository is not accessible with the given credentials"
+
+
+async def _stored_graph(request: GraphRequest):
+    # Deferred like the pipeline (the graph is rebuilt from the state it stores)
+    from app.services.graph_export import graphs
+    return await run_blocking(graphs.get, request.git_url, request.code_folder, request.language)
+
+
+@router.post("/graph", summary="Stream the call graph of an analyzed repository as NDJSON")
+async def graph(request: GraphRequest):
+    """
+    Stream the full call graph of the last analyzed commit as newline-delimited JSON.
+
+    Lines hold a bounded number of files, nodes or integer edges each, so the
+    response is produced incrementally regardless of the size of the graph:
+    {"type": "graph", ...counts}, then "files", "nodes" ([name, file index,
+    class, kind, line]), "edges" (flat caller/callee node indexes) and
+    "entry_points" lines, and finally {"type": "end"}. The caller must be able
+    to read the repository (with `auth_token` for private ones).
+    """
+    if not await repo_access.check(request.git_url, request.auth_token):
+        return JSONResponse(content={"error": NO_ACCESS}, status_code=403)
+    stored = await _stored_graph(request)
+    if stored is None:
+        return JSONResponse(content={"error": NOT_ANALYZED}, status_code=404)
+    return StreamingResponse(stored.ndjson(), media_type="application/x-ndjson")
+
+
+@router.post("/plantuml-tree/pages", response_model=dict, summary="One page of a partitioned PlantUML call graph")
+async def plantuml_page(request: GraphPageRequest):
+    """
+    Render one page of the call graph of the last analyzed commit.
+
+    `partition` groups functions by directory ("package") or by the subtree of
+    each entry point ("subtree") into pages of at most `page_size` functions.
+    Calls into other pages are drawn to stubs stereotyped and linked with their
+    page; `calls_into`/`called_from` count the calls between this page and others.
+    The caller must be able to read the repository, as for /graph.
+    """
+    from app.services.graph_export import GRAPH_MAX_PAGE_SIZE, PARTITIONS
+    if request.partition not in PARTITIONS:
+        return JSONResponse(content={"error": f"partition must be one of {', '.join(PARTITIONS)}"}, status_code=400)
+    page_size = min(max(request.page_size or 500, 1), GRAPH_MAX_PAGE_SIZE)
+    if not await repo_access.check(request.git_url, request.auth_token):
+        return JSONResponse(content={"error": NO_ACCESS}, status_code=403)
+    stored = await _stored_graph(request)
+    if stored is None:
+        return JSONResponse(content={"error": NOT_ANALYZED}, status_code=404)
+    result = await run_blocking(stored.page, request.partition, page_size, request.page or 0, request.link or "")
+    if result is None:
+        return JSONResponse(content={"error": f"Page {request.page} does not exist"}, status_code=404)
+    return JSONResponse(content=result)
@@ -0,0 +1,68 @@
+import asyncio
+import json
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.models.schemas import PlantUMLTreeRequest
+from app.services.jobs import FINISHED, job_manager
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Seconds between SSE keep-alive comments while no progress is made
+KEEPALIVE_INTERVAL = 15
+
+
+@router.post("/plantuml-tree/jobs", response_model=dict, status_code=202, summary="Start a background PlantUML analysis job")
+async def create_plantuml_job(request: PlantUMLTreeRequest):
+    """
+    Queue the /plantuml-tree analysis and return a job id immediately.
+
+    Poll GET /jobs/{job_id} or stream GET /jobs/{job_id}/events for stage progress.
+    An identical request (same repository and options) that is still queued or
+    running is answered with the existing job.
+    """
+    job, deduplicated = await job_manager.submit(request)
+    return JSONResponse(
+        content={"job_id": job.id, "status": job.status, "deduplicated": deduplicated},
+        status_code=202
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=dict, summary="Get the status, progress and result of an analysis job")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=job.to_dict())
+
+
+@router.get("/jobs/{job_id}/events", summary="Stream analysis job progress as Server-Sent Events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events stream: a `progress` event whenever a stage or counter
+    changes, then a final `done` event carrying the result or error.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+
+    async def events():
+        changed = job.subscribe()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(changed.wait(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                changed.clear()
+                if job.status in FINISHED:
+                    yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+                    return
+                yield f"event: progress\ndata: {json.dumps(job.to_dict(include_result=False))}\n\n"
+        finally:
+            job.unsubscribe(changed)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.models.schemas import MigrationRequest, MigrationResponse
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.post("/migrate", response_model=MigrationResponse, summary="Translate code or a repository to other frameworks")
+async def migrate(request: MigrationRequest):
+    """
+    Translate `source_code` (or the `code_folder` of `git_url`) from `source_framework` to every target framework.
+
+    Components (top-level definitions of a snippet, files of a repository) are
+    ordered by the call graph from leaves to roots. Each dependency level is
+    translated concurrently, all target frameworks in parallel, and every
+    component sees the translations of what it depends on. Translations are
+    cached by component content (including its dependencies), source and target.
+
+    Request body example:
+    {
+      "git_url": "https://github.com/your/repo.git",  // or "source_code": "..."
+      "code_folder": "src",
+      "language": "javascript",
+      "source_framework": "react",
+      "target_frameworks": ["vue", "svelte"]
+    }
+    """
+    # Deferred like the analysis pipeline (LangChain and the OpenAI SDK are loaded in the background at startup)
+    from app.services.migration import run_migration
+    from app.services.pipeline import AnalysisError
+    try:
+        return JSONResponse(content=await run_migration(request))
+    except AnalysisError as e:
+        return JSONResponse(content={"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        return JSONResponse(content={"error": f"Migration failed: {str(e)}"}, status_code=500)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.models.schemas import SearchRequest
+from app.services import llm_clients
+from app.services.access import repo_access
+from app.utils.process import run_blocking
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_TOP_K = 100
+
+
+@router.post("/search", response_model=dict, summary="Similarity search over the code of analyzed repositories")
+async def search(request: SearchRequest):
+    """
+    Embed the query and search the persistent indexes built by /plantuml-tree.
+
+    Only repositories indexed with the configured embedding provider are
+    searched, and only those the caller can read: each repository is checked
+    with `git ls-remote` using `auth_token` (anonymously without one), so
+    private repositories need a token that grants access. Optional filters:
+    `repo` (git_url), `file` (path or directory prefix) and `language`.
+    `search_ms` is the index lookup time, excluding the query embedding.
+    """
+    if not request.query.strip():
+        return JSONResponse(content={"error": "Query must not be empty"}, status_code=400)
+    top_k = min(max(request.top_k or 10, 1), MAX_TOP_K)
+    # Deferred like the pipeline: FAISS and the embedding providers are loaded at startup in the background
+    from app.services.embeddings import embedding_id
+    from app.services.search_index import search_indexes
+    try:
+        candidates = await run_blocking(search_indexes.repos, embedding_id(), request.repo)
+        granted = await asyncio.gather(*(repo_access.check(url, request.auth_token) for url in candidates))
+        allowed = [url for url, ok in zip(candidates, granted) if ok]
+        vector = await llm_clients.embeddings().aembed_query(request.query)
+        started = time.perf_counter()
+        found = await run_blocking(search_indexes.search, vector, embedding_id(), top_k,
+                                   request.repo, request.file, request.language, allowed)
+        found["search_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return JSONResponse(content=found)
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        return JSONResponse(content={"error": f"Search failed: {str(e)}"}, status_code=500)
@@ -0,0 +1,54 @@
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+from app.utils.git import authenticated_url, resolve_remote_head
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a successful access check is reused for the same repository and credentials
+ACCESS_CACHE_TTL = int(os.getenv("ACCESS_CACHE_TTL", "300"))
+# Seconds a failed check is reused: short, so a token that was just granted access works soon
+ACCESS_DENIED_TTL = int(os.getenv("ACCESS_DENIED_TTL", "30"))
+ACCESS_CHECK_TIMEOUT = int(os.getenv("ACCESS_CHECK_TIMEOUT", "30"))
+
+
+class RepoAccess:
+    """Checks that a caller can read a repository by listing its remote HEAD with the caller's credentials.
+
+    Stored analyses (graphs, search indexes) are only served to callers that pass
+    this check, so a private repository analyzed with one token is not exposed to
+    callers without it. Results are cached keyed by a hash of the token; denials
+    only briefly, so a search over many inaccessible repositories does not run
+    ls-remote against each of them on every request.
+    """
+
+    def __init__(self, ttl: int = ACCESS_CACHE_TTL, denied_ttl: int = ACCESS_DENIED_TTL):
+        self.ttl = ttl
+        self.denied_ttl = denied_ttl
+        self._granted: Dict[Tuple[str, str], float] = {}
+        self._denied: Dict[Tuple[str, str], float] = {}
+
+    @staticmethod
+    def _key(git_url: str, auth_token: Optional[str]) -> Tuple[str, str]:
+        return git_url, hashlib.sha256((auth_token or "").encode("utf-8")).hexdigest()
+
+    async def check(self, git_url: str, auth_token: Optional[str] = None) -> bool:
+        key = self._key(git_url, auth_token)
+        now = time.monotonic()
+        if self._granted.get(key, 0) > now:
+            return True
+        if self._denied.get(key, 0) > now:
+            return False
+        granted = await resolve_remote_head(authenticated_url(git_url, auth_token), ACCESS_CHECK_TIMEOUT) is not None
+        if not granted:
+            logger.info("Access check failed for a stored repository")
+        checked, ttl = (self._granted, self.ttl) if granted else (self._denied, self.denied_ttl)
+        for stale in [k for k, expires in checked.items() if expires <= now]:
+            del checked[stale]
+        checked[key] = now + ttl
+        return granted
+
+
+repo_access = RepoAccess()
@@ -0,0 +1,240 @@
+import os
+import re
+import ast
+from typing import List, Dict, Iterable, Optional, Tuple
+from app.services import js_extractor
+from app.services.call_graph import CallGraph
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CodeAnalyzer:
+    """Handles code parsing and function extraction"""
+    
+    @staticmethod
+    def post_process_plantuml(plantuml_code: str, functions: List[Dict]) -> str:
+        """Post-process PlantUML code to fix common issues"""
+        lines = plantuml_code.split('\n')
+        processed_lines = []
+        
+        # Track component types for better classification
+        component_files = set()
+        for func in functions:
+            if any(keyword in func['file'].lower() for keyword in ['component', 'page', 'layout']):
+                component_files.add(func['file'])
+        
+        # Process each line
+        for line in lines:
+            # Fix naming conventions
+            line = re.sub(r'Formatdate', 'FormatDate', line)
+            line = re.sub(r'Handlemouse(\w+)', r'HandleMouse\1', line)
+            
+            # Ensure proper PlantUML syntax
+            if '-->' in line:
+                # Clean up arrow connections
+                line = re.sub(r'\s+-->\s+', ' --> ', line)
+            
+            processed_lines.append(line)
+        
+        return '\n'.join(processed_lines)
+    
+    @staticmethod
+    def extract_functions_python(code: str, filename: str) -> List[Dict]:
+        """Extract function definitions and calls from Python code"""
+        return CodeAnalyzer.analyze_python(code, filename)[0]
+
+    @staticmethod
+    def analyze_python(code: str, filename: str) -> Tuple[List[Dict], Dict[str, List[str]]]:
+        """Extract functions and classes (with line spans; methods carry their class) and `from x import y` names"""
+        functions = []
+        imports = {}
+        try:
+            tree = ast.parse(code)
+            method_class = {}
+            for node in ast.walk(tree):
+                if isinstance(node, ast.ClassDef):
+                    for child in node.body:
+                        method_class[id(child)] = node.name
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    calls = []
+                    for child in ast.walk(node):
+                        if isinstance(child, ast.Call):
+                            if isinstance(child.func, ast.Name):
+                                calls.append(child.func.id)
+                            elif isinstance(child.func, ast.Attribute) and isinstance(child.func.value, ast.Name) \
+                                    and child.func.value.id in ("self", "cls"):
+                                calls.append(child.func.attr)
+                    
+                    functions.append(CodeAnalyzer._python_record(node, filename, calls, "function",
+                                                                 method_class.get(id(node))))
+                elif isinstance(node, ast.ClassDef):
+                    functions.append(CodeAnalyzer._python_record(node, filename, [], "class", method_class.get(id(node))))
+                elif isinstance(node, ast.ImportFrom):
+                    module = "." * node.level + (node.module or "")
+                    for alias in node.names:
+                        imports[alias.asname or alias.name] = [module, alias.name]
+        except SyntaxError:
+            logger.warning(f"Syntax error in {filename}, skipping AST analysis")
+        
+        return functions, imports
+
+    @staticmethod
+    def _python_record(node, filename: str, calls: List[str], kind: str, class_name: Optional[str]) -> Dict:
+        record = {
+            "name": node.name,
+            "file": filename,
+            "calls": calls,
+            "line": node.lineno,
+            "end_line": node.end_lineno,
+            "type": kind,
+            "class": class_name
+        }
+        doc = ast.get_docstring(node)
+        if doc:
+            record["doc"] = doc.strip().splitlines()[0][:200]
+        return record
+    
+    @staticmethod
+    def extract_functions_javascript(code: str, filename: str) -> List[Dict]:
+        """Extract function definitions and calls from JavaScript/TypeScript code"""
+        return CodeAnalyzer.analyze_javascript(code, filename)[0]
+
+    @staticmethod
+    def analyze_javascript(code: str, filename: str) -> Tuple[List[Dict], Dict[str, List[str]]]:
+        """Extract functions and ES module imports from JavaScript/TypeScript code"""
+        if js_extractor.available():
+            return js_extractor.extract(code, filename)
+        return CodeAnalyzer.extract_functions_javascript_regex(code, filename), {}
+
+    @staticmethod
+    def analyze_file(code: str, filename: str) -> Tuple[List[Dict], Dict[str, List[str]]]:
+        """Functions and imported names (local name -> [module, imported name]) of a source file"""
+        if filename.endswith((".py",)):
+            return CodeAnalyzer.analyze_python(code, filename)
+        return CodeAnalyzer.analyze_javascript(code, filename)
+
+    @staticmethod
+    def extract_functions_javascript_regex(code: str, filename: str) -> List[Dict]:
+        """Regex fallback used when tree-sitter grammars are not installed (quadratic in file size)"""
+        functions = []
+        
+        # Regex patterns for different function types
+        patterns = {
+            'function_declaration': r'function\s+(\w+)\s*\([^)]*\)\s*{',
+            'arrow_function': r'(?:const|let|var)\s+(\w+)\s*=\s*(?:\([^)]*\)|[\w]+)\s*=>\s*{?',
+            'method_definition': r'(\w+)\s*\([^)]*\)\s*{',
+            'function_calls': r'(\w+)\s*\('
+        }
+        
+        # Extract function definitions
+        for pattern_type, pattern in patterns.items():
+            if pattern_type != 'function_calls':
+                matches = re.finditer(pattern, code, re.MULTILINE)
+                for match in matches:
+                    func_name = match.group(1)
+                    line_num = code[:match.start()].count('\n') + 1
+                    
+                    # Find function calls within this function
+                    calls = []
+                    call_matches = re.finditer(patterns['function_calls'], code[match.start():])
+                    for call_match in call_matches:
+                        call_name = call_match.group(1)
+                        if call_name != func_name and not call_name.startswith('console'):
+                            calls.append(call_name)
+                    
+                    functions.append({
+                        "name": func_name,
+                        "file": filename,
+                        "calls": list(set(calls)),  # Remove duplicates
+                        "line": line_num,
+                        "type": pattern_type
+                    })
+        
+        return functions
+
+class PlantUMLGenerator:
+    """Handles PlantUML diagram generation"""
+    
+    @staticmethod
+    def build_call_tree(functions: List[Dict], max_depth: int = 5, graph: Optional[CallGraph] = None) -> Dict:
+        """Build a hierarchical call tree from function data"""
+        graph = graph or CallGraph(functions)
+        # Limit to top 10 entry points (functions not called by others)
+        return graph.call_tree(max_depth, limit=10)
+    
+    @staticmethod
+    def header_lines() -> List[str]:
+        return [
+            "@startuml",
+            "!theme plain",
+            "skinparam backgroundColor #FFFFFF",
+            "skinparam component {",
+            "  BackgroundColor #E1F5FE",
+            "  BorderColor #0277BD",
+            "}",
+            "",
+        ]
+
+    @staticmethod
+    def declaration_lines(graph: CallGraph, nodes: Iterable[int]) -> List[str]:
+        """File packages declaring the given graph nodes"""
+        plantuml_lines = []
+        # Create file-based grouping
+        file_groups = {}
+        for i in nodes:
+            file_name = os.path.basename(graph.functions[i]['file']).replace('.', '_')
+            file_groups.setdefault(file_name, []).append(i)
+        
+        # Add file packages
+        for file_name, group in file_groups.items():
+            plantuml_lines.append(f"package \"{file_name}\" {{")
+            for i in group:
+                func_data = graph.functions[i]
+                func_name = func_data['name']
+                alias = graph.alias(i)
+                # Determine component type based on function characteristics
+                if 'component' in func_data['file'].lower() or func_name.startswith(('use', 'Use')):
+                    plantuml_lines.append(f"  component [{func_name}] as {alias}")
+                elif 'util' in func_data['file'].lower() or any(keyword in func_name.lower() for keyword in ['format', 'parse', 'validate', 'handle']):
+                    plantuml_lines.append(f"  class \"{func_name}\" as {alias} {{")
+                    plantuml_lines.append(f"    +{func_name}()")
+                    plantuml_lines.append(f"  }}")
+                else:
+                    plantuml_lines.append(f"  component [{func_name}] as {alias}")
+            plantuml_lines.append("}")
+            plantuml_lines.append("")
+        return plantuml_lines
+
+    @staticmethod
+    def edge_lines(graph: CallGraph, edges: Iterable[Tuple[int, int]]) -> List[str]:
+        """Deduplicated `caller --> callee` lines in first-seen order"""
+        connections = {}
+        for caller, callee in edges:
+            parent, child = graph.alias(caller), graph.alias(callee)
+            if parent != child:
+                connections.setdefault(f"{parent} --> {child}", None)
+        return list(connections)
+
+    @staticmethod
+    def fragment_to_plantuml(graph: CallGraph, nodes: Iterable[int], edges: Iterable[Tuple[int, int]]) -> str:
+        """Diagram of a subset of the graph: the given nodes grouped by file plus the given edges"""
+        plantuml_lines = PlantUMLGenerator.header_lines()
+        plantuml_lines.extend(PlantUMLGenerator.declaration_lines(graph, nodes))
+        plantuml_lines.extend(PlantUMLGenerator.edge_lines(graph, edges))
+        plantuml_lines.append("")
+        plantuml_lines.append("@enduml")
+        return "\n".join(plantuml_lines)
+
+    @staticmethod
+    def tree_to_plantuml(call_tree: Dict, graph: CallGraph) -> str:
+        """Convert call tree to PlantUML syntax"""
+        # Build connections from call tree, iteratively and in depth-first order
+        edges = []
+        stack = [node for node in reversed(list(call_tree.values())) if node]
+        while stack:
+            node = stack.pop()
+            children = list(node.get("children", {}).values())
+            edges.extend((graph.index[node["id"]], graph.index[child["id"]]) for child in children)
+            stack.extend(reversed(children))
+        return PlantUMLGenerator.fragment_to_plantuml(graph, range(len(graph)), edges)
@@ -0,0 +1,107 @@
+import fcntl
+import os
+import shutil
+import subprocess
+from typing import List, Optional, Tuple
+from app.services.cache import cache_key, content_hash, get_cache
+from app.utils.process import run_blocking, run_command
+import logging
+
+logger = logging.getLogger(__name__)
+
+NPM_TIMEOUT = int(os.getenv("NPM_TIMEOUT", "300"))
+
+# Checked in order; the first one present decides the package manager and the node_modules cache key
+LOCKFILES = ["package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml"]
+
+# Install command and script runner of the package manager that owns each lockfile
+PACKAGE_MANAGERS = {
+    "package-lock.json": (["npm", "ci"], ["npm", "run"]),
+    "npm-shrinkwrap.json": (["npm", "ci"], ["npm", "run"]),
+    "yarn.lock": (["yarn", "install", "--frozen-lockfile"], ["yarn", "run"]),
+    "pnpm-lock.yaml": (["pnpm", "install", "--frozen-lockfile"], ["pnpm", "run"]),
+    None: (["npm", "install"], ["npm", "run"]),
+}
+
+FICLONE = 0x40049409  # Linux ioctl sharing the extents of a file (copy-on-write) on btrfs, XFS and overlayfs
+
+
+def _clone_or_copy(src: str, dst: str):
+    # A reflink restores node_modules nearly for free where supported; unlike a hard link, writes of the
+    # build (e.g. node_modules/.cache) cannot reach the cached copy
+    try:
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        shutil.copystat(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def copy_tree(src: str, dst: str):
+    shutil.copytree(src, dst, symlinks=True, copy_function=_clone_or_copy)
+
+
+def restore_tree(src: str, dst: str):
+    """Replace dst (e.g. a node_modules committed to the repository) with a copy of src"""
+    if os.path.islink(dst) or os.path.isfile(dst):
+        os.remove(dst)
+    elif os.path.isdir(dst):
+        shutil.rmtree(dst)
+    copy_tree(src, dst)
+
+
+def find_lockfile(code_path: str) -> Optional[str]:
+    for name in LOCKFILES:
+        if os.path.isfile(os.path.join(code_path, name)):
+            return name
+    return None
+
+
+def dependencies_key(code_path: str) -> Optional[str]:
+    """Cache key for node_modules derived from the lockfile (or package.json when there is none)"""
+    name = find_lockfile(code_path) or "package.json"
+    path = os.path.join(code_path, name)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return cache_key("node_modules", name, content_hash(f.read()))
+
+
+def package_manager(code_path: str) -> Tuple[List[str], List[str]]:
+    """(install command, script runner) matching the project's lockfile"""
+    return PACKAGE_MANAGERS[find_lockfile(code_path)]
+
+
+async def install_dependencies(code_path: str):
+    """Restore node_modules from the lockfile-keyed cache, or install and cache it"""
+    modules_cache = get_cache("node_modules")
+    key = await run_blocking(dependencies_key, code_path)
+    if key is None:
+        logger.info("No package.json found, skipping dependency install")
+        return
+    node_modules = os.path.join(code_path, "node_modules")
+    cached_dir = await run_blocking(modules_cache.get_dir, key)
+    if cached_dir:
+        logger.info("Restoring node_modules from cache")
+        try:
+            await run_blocking(restore_tree, cached_dir, node_modules)
+            return
+        except OSError as e:
+            # E.g. the entry was evicted mid-copy or the disk is full: a fresh install still works
+            logger.warning(f"Restoring node_modules failed: {e}, installing instead")
+            await run_blocking(shutil.rmtree, node_modules, ignore_errors=True)
+    install, _ = package_manager(code_path)
+    await run_command(install, cwd=code_path, timeout=NPM_TIMEOUT)
+    if os.path.isdir(node_modules):
+        await run_blocking(modules_cache.put_dir, key, node_modules, copy_tree)
+
+
+async def build_project(code_path: str):
+    """Opt-in build stage: install (cached) dependencies and run the `build` script"""
+    logger.info("Installing dependencies and building project")
+    try:
+        await install_dependencies(code_path)
+        _, run_script = package_manager(code_path)
+        await run_command([*run_script, "build"], cwd=code_path, check=False, timeout=NPM_TIMEOUT)
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError, FileNotFoundError) as e:
+        logger.warning(f"Build step failed: {e}, continuing with analysis")
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.services.metrics import CACHE_REQUESTS
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("CACHE_DIR", "./data/cache")
+# Temporary entries older than this (seconds) are leftovers of crashed workers; younger ones may be in-flight
+# writes or mirror clones of other processes sharing the cache
+CACHE_TMP_MAX_AGE = int(os.getenv("CACHE_TMP_MAX_AGE", "86400"))
+
+# Default size limits (MB) per cache namespace, overridable with CACHE_MAX_MB_<NAMESPACE>
+CACHE_LIMITS_MB = {
+    "results": 64,
+    "functions": 256,
+    "summaries": 256,
+    "translations": 256,
+    "repos": 2048,
+    "mirrors": 8192,
+    "node_modules": 4096,
+}
+
+
+def cache_key(*parts: Any) -> str:
+    """Build a stable cache key from arbitrary JSON-serializable parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def content_hash(*parts: str) -> str:
+    """Hash file contents (and anything else that affects the derived value)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8", errors="ignore"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _disk_size(path: str) -> int:
+    if os.path.isdir(path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for file in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    pass
+        return total
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return time.time()
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def read_entry(root: str, key: str) -> Optional[Any]:
+    """Read a JSON value from a cache root without LRU bookkeeping (safe in worker processes); see DiskLRUCache.touch"""
+    try:
+        with open(os.path.join(root, key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class DiskLRUCache:
+    """Size-bounded on-disk cache of JSON values and artifact directories with LRU eviction.
+
+    Recency is tracked in memory and persisted through file mtimes, so the order
+    survives restarts and is shared (approximately) between worker processes.
+    Pinned entries (see pin) are in use and skipped by eviction.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.name = os.path.basename(os.path.normpath(root))  # Namespace, as reported in metrics
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._pins: Dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        found = []
+        stale_before = time.time() - CACHE_TMP_MAX_AGE
+        for entry in os.scandir(self.root):
+            if entry.name.startswith("."):
+                if entry.name.startswith(".tmp-") and _mtime(entry.path) < stale_before:
+                    _remove(entry.path)
+                continue
+            found.append((entry.stat().st_mtime, entry.name, _disk_size(entry.path)))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _touch(self, key: str):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        else:
+            size = _disk_size(self._path(key))
+            self._entries[key] = size
+            self._total += size
+
+    def _forget(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total -= size
+
+    def _commit(self, key: str, tmp_path: str):
+        path = self._path(key)
+        size = _disk_size(tmp_path)
+        with self._lock:
+            _remove(path)
+            os.replace(tmp_path, path)
+            self._forget(key)
+            self._entries[key] = size
+            self._total += size
+            self._evict()
+
+    def _evict(self):
+        if self._total <= self.max_bytes:
+            return
+        # Least recently used first, never the newest entry or one that is in use
+        for key in list(self._entries)[:-1]:
+            if self._total <= self.max_bytes:
+                break
+            if self._pins.get(key):
+                continue
+            self._total -= self._entries.pop(key)
+            _remove(self._path(key))
+            logger.debug(f"Evicted cache entry {key} from {self.root}")
+
+    def pin(self, key: str):
+        """Keep key from being evicted until a matching unpin (pin before get_dir to avoid racing eviction)"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: str):
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+
+    def _tmp_path(self) -> str:
+        return os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached JSON value for key, or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                self._forget(key)
+                CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+                return None
+            self._touch(key)
+        CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+        return value
+
+    def touch(self, key: str):
+        """Mark an entry read elsewhere (e.g. via read_entry) as recently used"""
+        with self._lock:
+            if os.path.exists(self._path(key)):
+                self._touch(key)
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value under key"""
+        tmp_path = self._tmp_path()
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        self._commit(key, tmp_path)
+
+    def get_dir(self, key: str) -> Optional[str]:
+        """Return the path of a cached artifact directory, or None on a miss"""
+        path = self._path(key)
+        with self._lock:
+            if not os.path.isdir(path):
+                self._forget(key)
+                CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+                return None
+            self._touch(key)
+        CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+        return path
+
+    def put_dir(self, key: str, src_dir: str, copy_tree=shutil.copytree) -> str:
+        """Copy an artifact directory into the cache and return its cached path"""
+        tmp_path = self._tmp_path()
+        copy_tree(src_dir, tmp_path)
+        self._commit(key, tmp_path)
+        return self._path(key)
+
+    def new_tmp_dir(self) -> str:
+        """Path (not yet created) inside the cache root for building an entry in place; see adopt_dir"""
+        return self._tmp_path()
+
+    def adopt_dir(self, key: str, tmp_path: str) -> str:
+        """Move a directory built at a new_tmp_dir() path into the cache without copying"""
+        self._commit(key, tmp_path)
+        return self._path(key)
+
+    def refresh(self, key: str):
+        """Re-measure an entry that was modified in place (e.g. a fetched mirror) and evict if over quota"""
+        with self._lock:
+            if key not in self._entries:
+                return
+            size = _disk_size(self._path(key))
+            self._total += size - self._entries[key]
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes}
+
+
+_caches: Dict[str, DiskLRUCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str) -> DiskLRUCache:
+    """Return the process-wide cache for a namespace (results, functions, summaries, translations, repos, mirrors, node_modules)"""
+    with _caches_lock:
+        if namespace not in _caches:
+            default_mb = CACHE_LIMITS_MB.get(namespace, 256)
+            max_mb = int(os.getenv(f"CACHE_MAX_MB_{namespace.upper()}", default_mb))
+            _caches[namespace] = DiskLRUCache(os.path.join(CACHE_DIR, namespace), max_mb * 1024 * 1024)
+        return _caches[namespace]
@@ -0,0 +1,241 @@
+import os
+import posixpath
+import re
+import sys
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+JS_EXTENSIONS = (".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs", ".mts", ".cts")
+PYTHON_EXTENSIONS = (".py",)
+# Import specifiers resolved against the analyzed folder rather than the importing file
+ROOT_ALIASES = ("@/", "~/")
+
+# Per file: local name -> [module specifier, imported name]
+Imports = Dict[str, Dict[str, List[str]]]
+
+
+def qualified_id(func: Dict) -> str:
+    """Unique id of an extracted function: file::name, or file::class::name for methods"""
+    if func.get("class"):
+        return f"{func['file']}::{func['class']}::{func['name']}"
+    return f"{func['file']}::{func['name']}"
+
+
+def _module_path(path: str) -> str:
+    """Module a file provides: path without extension, package dir for __init__/index files"""
+    stem = os.path.splitext(path)[0]
+    base = posixpath.basename(stem)
+    if base in ("__init__", "index"):
+        return posixpath.dirname(stem)
+    return stem
+
+
+class CallGraph:
+    """Function call graph with interned qualified ids and compact (CSR) adjacency arrays.
+
+    Node i is `functions[i]` (the first record per qualified id); its callees are
+    `targets[offsets[i]:offsets[i + 1]]`. Calls are resolved by bare name, in order:
+    a method of the same class, a function of the same file, a name imported into
+    the file, and finally a globally unique name. Ambiguous calls add no edge but
+    still stop their candidates from being reported as entry points.
+    """
+
+    def __init__(self, functions: Iterable[Dict], imports: Optional[Imports] = None):
+        self.functions: List[Dict] = []
+        self.ids: List[str] = []
+        self.index: Dict[str, int] = {}
+        calls: List[List[str]] = []
+        for func in functions:
+            node_id = sys.intern(qualified_id(func))
+            i = self.index.get(node_id)
+            if i is None:
+                self.index[node_id] = len(self.ids)
+                self.ids.append(node_id)
+                self.functions.append(func)
+                calls.append(list(func.get("calls", ())))
+            else:
+                # Same name defined twice in one scope (e.g. overloads): merge the calls
+                calls[i].extend(func.get("calls", ()))
+
+        self._build_lookups()
+        self._module_cache: Dict[Tuple[str, str], Optional[str]] = {}
+        self.stats = {"resolved_local": 0, "resolved_import": 0, "resolved_global": 0, "ambiguous": 0, "external": 0}
+        # Functions of one file (and class) mostly call the same names; resolve each once
+        resolved: Dict[Tuple[str, Optional[str], str], Tuple[Optional[int], str]] = {}
+
+        self.offsets = array("l", [0])
+        self.targets = array("l")
+        self.in_degree = array("l", bytes(len(self.ids) * self.offsets.itemsize))
+        called = bytearray(len(self.ids))
+        imports = imports or {}
+        for i, func in enumerate(self.functions):
+            file_imports = imports.get(func["file"], {})
+            seen = set()
+            for name in calls[i]:
+                key = (func["file"], func.get("class"), name)
+                if key not in resolved:
+                    resolved[key] = self._resolve(func, name, file_imports, called)
+                target, outcome = resolved[key]
+                self.stats[outcome] += 1
+                if target is not None and target != i and target not in seen:
+                    seen.add(target)
+                    self.targets.append(target)
+                    self.in_degree[target] += 1
+            self.offsets.append(len(self.targets))
+        self.entry_points: List[int] = [i for i in range(len(self.ids)) if not self.in_degree[i] and not called[i]]
+
+    def _build_lookups(self):
+        self._by_scope: Dict[Tuple[str, Optional[str], str], int] = {}
+        self._by_name: Dict[str, List[int]] = {}
+        self._by_module: Dict[str, str] = {}
+        self._by_suffix: Dict[str, List[str]] = {}
+        files = set()
+        for i, func in enumerate(self.functions):
+            self._by_scope.setdefault((func["file"], func.get("class"), func["name"]), i)
+            self._by_name.setdefault(func["name"], []).append(i)
+            files.add(func["file"])
+        for path in sorted(files):
+            module = _module_path(path.replace(os.sep, "/"))
+            self._by_module.setdefault(module, path)
+            # Every trailing part of the module path, for imports rooted somewhere above the analyzed folder
+            parts = module.split("/")
+            for start in range(len(parts)):
+                self._by_suffix.setdefault("/".join(parts[start:]), []).append(path)
+
+    def _resolve(self, func: Dict, name: str, file_imports: Dict[str, List[str]],
+                 called: bytearray) -> Tuple[Optional[int], str]:
+        """Return the node a call by name refers to (or None) and which rule decided it"""
+        file = func["file"]
+        if func.get("class"):
+            target = self._by_scope.get((file, func["class"], name))
+            if target is not None:
+                return target, "resolved_local"
+        target = self._by_scope.get((file, None, name))
+        if target is not None:
+            return target, "resolved_local"
+        imported = file_imports.get(name)
+        if imported:
+            module_file = self._resolve_module(file, imported[0])
+            if module_file is not None:
+                target = self._by_scope.get((module_file, None, imported[1]))
+                if target is None:
+                    # Default imports are usually bound to the name the module defines
+                    target = self._by_scope.get((module_file, None, name))
+                if target is not None:
+                    return target, "resolved_import"
+        candidates = self._by_name.get(name)
+        if not candidates:
+            return None, "external"
+        if len(candidates) == 1:
+            return candidates[0], "resolved_global"
+        for candidate in candidates:
+            called[candidate] = 1
+        return None, "ambiguous"
+
+    def _resolve_module(self, file: str, specifier: str) -> Optional[str]:
+        """Map an import specifier used in file to an analyzed file, or None for external modules"""
+        key = (posixpath.dirname(file), specifier)
+        if key not in self._module_cache:
+            self._module_cache[key] = self._find_module(key[0], specifier, file.endswith(PYTHON_EXTENSIONS))
+        return self._module_cache[key]
+
+    def _find_module(self, directory: str, specifier: str, python: bool) -> Optional[str]:
+        if python:
+            level = len(specifier) - len(specifier.lstrip("."))
+            module = specifier[level:].replace(".", "/")
+            if level:
+                base = directory
+                for _ in range(level - 1):
+                    base = posixpath.dirname(base)
+                return self._by_module.get(posixpath.normpath(posixpath.join(base, module)) if module else base)
+            return self._unique_suffix(module)
+        if specifier.startswith("."):
+            module = posixpath.normpath(posixpath.join(directory, specifier))
+            return self._by_module.get(_module_path(module) if module.endswith(JS_EXTENSIONS) else module)
+        for alias in ROOT_ALIASES:
+            if specifier.startswith(alias):
+                module = specifier[len(alias):]
+                return self._unique_suffix(_module_path(module) if module.endswith(JS_EXTENSIONS) else module)
+        return None
+
+    def _unique_suffix(self, module: str) -> Optional[str]:
+        matches = self._by_suffix.get(module)
+        return matches[0] if matches and len(matches) == 1 else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def callees(self, i: int) -> array:
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def alias(self, i: int) -> str:
+        """PlantUML-safe node alias: the bare name when unique, otherwise qualified by file and class"""
+        func = self.functions[i]
+        if len(self._by_name[func["name"]]) == 1:
+            return re.sub(r"\W", "_", func["name"])
+        return re.sub(r"\W", "_", self.ids[i])
+
+    def walk(self, roots: Iterable[int], max_depth: int) -> Iterator[Tuple[int, int, int]]:
+        """Yield (caller, callee, depth of callee) edges reachable from roots within max_depth.
+
+        Breadth-first from all roots at once, so every node is expanded exactly once
+        at its smallest depth: O(V + E) over the reached subgraph. Edges into nodes
+        expanded elsewhere are still reported so shared callees keep all callers.
+        """
+        return self._bfs(roots, max_depth, bytearray(len(self.ids)))
+
+    def edges(self, max_depth: int) -> List[Tuple[int, int]]:
+        """Edges within max_depth of the entry points, then of nodes only reachable through cycles"""
+        expanded = bytearray(len(self.ids))
+        edges = [(caller, callee) for caller, callee, _ in self._bfs(self.entry_points, max_depth, expanded)]
+        for i in range(len(self.ids)):
+            if not expanded[i]:
+                edges.extend((caller, callee) for caller, callee, _ in self._bfs((i,), max_depth, expanded))
+        return edges
+
+    def _bfs(self, roots: Iterable[int], max_depth: int, expanded: bytearray) -> Iterator[Tuple[int, int, int]]:
+        if max_depth <= 0:
+            return
+        queue = deque()
+        for root in roots:
+            if not expanded[root]:
+                expanded[root] = 1
+                queue.append((root, 0))
+        while queue:
+            node, depth = queue.popleft()
+            if depth + 1 >= max_depth:
+                continue
+            for target in self.callees(node):
+                if not expanded[target]:
+                    expanded[target] = 1
+                    queue.append((target, depth + 1))
+                yield node, target, depth + 1
+
+    def call_tree(self, max_depth: int = 5, limit: Optional[int] = 10) -> Dict:
+        """Nested {id: {"id", "name", "file", "children"}} trees from the first `limit` entry points"""
+        roots = self.entry_points[:limit] if limit is not None else self.entry_points
+        nodes: Dict[int, Dict] = {}
+
+        def node(i: int) -> Dict:
+            if i not in nodes:
+                func = self.functions[i]
+                nodes[i] = {"id": self.ids[i], "name": func["name"], "file": func["file"], "children": {}}
+            return nodes[i]
+
+        tree = {self.ids[root]: node(root) for root in roots if max_depth > 0}
+        for caller, callee, _ in self.walk(roots, max_depth):
+            if callee in nodes:
+                # Reached through another caller first: link a leaf so the tree stays finite
+                child = dict(nodes[callee], children={})
+            else:
+                child = node(callee)
+            nodes[caller]["children"][self.ids[callee]] = child
+        return tree
@@ -0,0 +1,119 @@
+import os
+from typing import Dict, List, Optional, Tuple
+from app.services.call_graph import qualified_id
+from app.services.summarizer import Chunk
+
+# Longest code chunk embedded as-is; longer spans are split into windows of whole lines
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "4000"))
+# Which spans also get an LLM summary: "large" (only spans split into windows), "all" or "none"
+CHUNK_SUMMARIES = os.getenv("CHUNK_SUMMARIES", "large").lower()
+# Characters of a span's code included in its summarization prompt
+SUMMARY_PROMPT_CHARS = 12000
+
+# (summary chunk id, metadata, code) for a span that needs an LLM summary
+SpanSummary = Tuple[str, Dict, str]
+
+ELISION = "...\n"
+
+
+def span_label(func: Dict) -> str:
+    """Display name of a span: function, Class.method or module"""
+    if not func.get("name"):
+        return "module"
+    return f"{func['class']}.{func['name']}" if func.get("class") else func["name"]
+
+
+def _windows(lines: List[Tuple[int, str]], max_chars: int) -> List[List[Tuple[int, str]]]:
+    """Pack (line number, text) pairs into windows of at most max_chars, cutting overlong lines"""
+    windows, current, size = [], [], 0
+    for number, text in lines:
+        pieces = [text[i:i + max_chars] for i in range(0, len(text), max_chars)] or [text]
+        for piece in pieces:
+            if current and size + len(piece) > max_chars:
+                windows.append(current)
+                current, size = [], 0
+            current.append((number, piece))
+            size += len(piece)
+    if current:
+        windows.append(current)
+    return windows
+
+
+def _join(lines: List[Tuple[int, str]], code_lines: List[int]) -> str:
+    """Concatenate lines, marking gaps that hide code (nested definitions chunked on their own) with an ellipsis.
+
+    code_lines[n] is the number of non-blank lines among the first n lines of the file.
+    """
+    parts = []
+    for i, (number, text) in enumerate(lines):
+        previous = lines[i - 1][0] if i else number
+        if code_lines[number - 1] > code_lines[previous]:
+            parts.append(ELISION)
+        parts.append(text if text.endswith("\n") else text + "\n")
+    return "".join(parts)
+
+
+def chunk_file(content: str, path: str, functions: List[Dict],
+               max_chars: int = CHUNK_MAX_CHARS, summaries: str = CHUNK_SUMMARIES) -> Tuple[List[Chunk], List[SpanSummary]]:
+    """Split a source file into one chunk per extracted function/class plus one for module-level code.
+
+    Each line belongs to the innermost span containing it, so nested definitions
+    are not embedded twice and every non-blank line is covered. Spans longer than
+    max_chars become several windows; those (or all spans, per `summaries`) are
+    also returned as summarization work. Chunk metadata links each vector to its
+    call graph node (`node`, a qualified id) and line range.
+    """
+    lines = content.splitlines(keepends=True)
+    spans = [func for func in functions if func.get("line") and func.get("end_line")]
+    spans.sort(key=lambda func: (func["line"], -func["end_line"]))
+    owner = [-1] * len(lines)
+    for i, func in enumerate(spans):
+        # Sorted outermost first, so inner spans overwrite their parents' lines
+        for number in range(func["line"] - 1, min(func["end_line"], len(lines))):
+            owner[number] = i
+    owned: Dict[int, List[Tuple[int, str]]] = {}
+    code_lines = [0]
+    for number, text in enumerate(lines):
+        blank = not text.strip()
+        code_lines.append(code_lines[-1] + (not blank))
+        # Blank lines between definitions only separate them
+        if not (blank and owner[number] == -1):
+            owned.setdefault(owner[number], []).append((number + 1, text))
+
+    chunks, pending = [], []
+    for i in sorted(owned, key=lambda i: owned[i][0][0]):
+        span_lines = owned[i]
+        if not any(text.strip() for _, text in span_lines):
+            continue
+        func: Optional[Dict] = spans[i] if i >= 0 else None
+        if func is not None:
+            node = qualified_id(func)
+            metadata = {"file": path, "kind": func.get("type", "function"), "name": func["name"],
+                        "class": func.get("class"), "node": node}
+            title = f"{metadata['kind']} {span_label(func)}"
+        else:
+            node = f"{path}::<module>"
+            metadata = {"file": path, "kind": "module", "name": None, "class": None, "node": None}
+            title = "module"
+        base_id = f"{node}:{span_lines[0][0]}"
+        windows = _windows(span_lines, max_chars)
+        for part, window in enumerate(windows):
+            start, end = window[0][0], window[-1][0]
+            text = f"{path} | {title} | lines {start}-{end}\n{_join(window, code_lines)}"
+            chunks.append((f"{base_id}#{part}", text, dict(metadata, type="code", start_line=start, end_line=end,
+                                                           part=part, parts=len(windows))))
+        if summaries == "all" or (summaries == "large" and len(windows) > 1):
+            code = _join(span_lines, code_lines)[:SUMMARY_PROMPT_CHARS]
+            pending.append((f"{base_id}#summary", dict(metadata, type="summary", start_line=span_lines[0][0],
+                                                       end_line=span_lines[-1][0]), code))
+    return chunks, pending
+
+
+def file_summary(functions: List[Dict], span_summaries: List[Tuple[Dict, str]], max_chars: int = 1000) -> Optional[str]:
+    """Short description of a file for call graph refinement from docstrings and (metadata, summary) of its spans"""
+    parts = [f"{span_label(func)}: {func['doc']}" for func in functions if func.get("doc")]
+    parts.extend(f"{span_label(metadata)}: {summary}" for metadata, summary in span_summaries)
+    if not parts:
+        return None
+    summary = "; ".join(parts)
+    return summary if len(summary) <= max_chars else summary[:max_chars - 3] + "..."
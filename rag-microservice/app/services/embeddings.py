@@ -0,0 +1,155 @@
+import os
+import threading
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+from app.services.cache import CACHE_DIR, cache_key
+from app.services.llm_clients import http_clients
+from app.services.metrics import CACHE_REQUESTS
+from app.services.vector_cache import VectorCache, text_digest
+from app.utils.process import run_blocking
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # pragma: no cover - optional, only needed for EMBEDDING_PROVIDER=local
+    SentenceTransformer = None
+
+# openai (default) or local (sentence-transformers on this machine)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_DEVICE = os.getenv("LOCAL_EMBEDDING_DEVICE", "cpu")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+# Intra-op threads for local inference; 0 keeps the library default
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+VECTOR_CACHE = os.getenv("VECTOR_CACHE", "true").lower() in ("1", "true", "yes")
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def _load_model(model_name: str, device: str):
+    """Load a sentence-transformers model once per process"""
+    key = f"{model_name}@{device}"
+    with _models_lock:
+        if key not in _models:
+            if SentenceTransformer is None:
+                raise RuntimeError("EMBEDDING_PROVIDER=local requires the sentence-transformers package")
+            if LOCAL_EMBEDDING_THREADS > 0:
+                import torch
+                torch.set_num_threads(LOCAL_EMBEDDING_THREADS)
+            logger.info(f"Loading embedding model {model_name} on {device}")
+            _models[key] = SentenceTransformer(model_name, device=device)
+        return _models[key]
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers embeddings computed in-process, in batches, one inference at a time per model"""
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, device: str = LOCAL_EMBEDDING_DEVICE,
+                 batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = max(1, batch_size)
+        self._model = _load_model(model_name, device)
+        # Concurrent encode() calls would only oversubscribe the CPU threads
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        with self._lock:
+            vectors = self._model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                         normalize_embeddings=True, show_progress_bar=False)
+        return vectors.astype("float32").tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_blocking(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings provider so identical texts are embedded once, across requests and restarts"""
+
+    def __init__(self, inner: Embeddings, cache: VectorCache):
+        self.inner = inner
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def _split(self, texts: List[str]):
+        digests = [text_digest(text) for text in texts]
+        cached = self.cache.get_many(digests)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        CACHE_REQUESTS.labels(cache="vectors", result="hit").inc(len(texts) - len(missing))
+        CACHE_REQUESTS.labels(cache="vectors", result="miss").inc(len(missing))
+        return digests, cached, missing
+
+    def _merge(self, digests, cached, missing: List[int], vectors: List[List[float]]) -> List[List[float]]:
+        self.cache.put_many([digests[i] for i in missing], vectors)
+        result = [vector.tolist() if vector is not None else None for vector in cached]
+        for i, vector in zip(missing, vectors):
+            result[i] = list(vector)
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests, cached, missing = self._split(texts)
+        vectors = self.inner.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._merge(digests, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        digests, cached, missing = await run_blocking(self._split, texts)
+        vectors = await self.inner.aembed_documents([texts[i] for i in missing]) if missing else []
+        return await run_blocking(self._merge, digests, cached, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.inner.aembed_query(text)
+
+
+def embedding_id(provider: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL) -> str:
+    """Identifies the vector space; indexes and cached vectors are only reusable within one"""
+    if provider == "local":
+        return f"local:{model or LOCAL_EMBEDDING_MODEL}"
+    return f"openai:{model or 'default'}"
+
+
+_vector_caches: Dict[str, VectorCache] = {}
+_vector_caches_lock = threading.Lock()
+
+
+def vector_cache(space: str) -> VectorCache:
+    """Process-wide vector cache for one embedding space"""
+    with _vector_caches_lock:
+        if space not in _vector_caches:
+            _vector_caches[space] = VectorCache(os.path.join(CACHE_DIR, "vectors", cache_key("vectors", space)[:16]))
+        return _vector_caches[space]
+
+
+def create_embeddings(provider: str = EMBEDDING_PROVIDER, model: str = EMBEDDING_MODEL,
+                      use_cache: bool = VECTOR_CACHE) -> Embeddings:
+    """Embeddings client for the configured provider, wrapped in the on-disk vector cache"""
+    if provider == "local":
+        inner = LocalEmbeddings(model or LOCAL_EMBEDDING_MODEL)
+    elif provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        kwargs = {"model": model} if model else {}
+        sync_client, async_client = http_clients()
+        inner = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"), http_client=sync_client,
+                                 http_async_client=async_client, **kwargs)
+    else:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {provider!r}, expected 'openai' or 'local'")
+    if not use_cache:
+        return inner
+    return CachedEmbeddings(inner, vector_cache(embedding_id(provider, model)))
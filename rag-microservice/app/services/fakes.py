@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import re
+import time
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic offline stand-in for ChatOpenAI with simulated latency"""
+
+    response: str = ""
+    echo_plantuml: bool = False  # Answer with the first PlantUML diagram found in the prompt
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        self.calls += 1
+        text = "\n".join(str(message.content) for message in messages)
+        content = self.response or f"Summary {hashlib.sha256(text.encode()).hexdigest()[:12]}"
+        if self.echo_plantuml:
+            match = re.search(r"@startuml.*?@enduml", text, re.DOTALL)
+            content = match.group(0) if match else content
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(text) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(text) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic offline embeddings: vectors derived from a hash of the text"""
+
+    def __init__(self, size: int = 64, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.batches = 0
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode()).digest()
+        return [(digest[i % len(digest)] - 128) / 128.0 for i in range(self.size)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        self.batches += 1
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        self.batches += 1
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._vector(text)
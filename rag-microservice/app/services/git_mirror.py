@@ -0,0 +1,142 @@
+import asyncio
+import os
+import shutil
+import tarfile
+from typing import Callable, Dict, Optional
+from app.services.cache import DiskLRUCache, cache_key, get_cache
+from app.utils.git import git_command, has_commit, head_commit
+from app.utils.process import run_blocking
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keep a bare, blobless mirror per repository; when disabled every request does a shallow sparse clone
+GIT_MIRROR_CACHE = os.getenv("GIT_MIRROR_CACHE", "true").lower() in ("1", "true", "yes")
+GIT_TIMEOUT = int(os.getenv("GIT_TIMEOUT", "600"))
+
+
+class SourceCheckout:
+    """The sources of one request: `repo_dir` answers history queries (git diff) for `commit`.
+
+    A cached mirror stays pinned in the cache until `release` is called.
+    """
+
+    def __init__(self, repo_dir: str, commit: str, release: Optional[Callable[[], None]] = None):
+        self.repo_dir = repo_dir
+        self.commit = commit
+        self._release = release
+
+    def release(self):
+        if self._release is not None:
+            self._release()
+            self._release = None
+
+
+def normalize_folder(code_folder: str) -> str:
+    """Repo-relative folder for pathspecs; empty for the repository root"""
+    folder = os.path.normpath(code_folder.strip("/")) if code_folder else ""
+    return "" if folder == "." else folder
+
+
+def _extract_tar(archive: str, target_dir: str):
+    with tarfile.open(archive) as tar:
+        tar.extractall(target_dir, filter="data")
+    os.remove(archive)
+
+
+class MirrorCache:
+    """Bare `--filter=blob:none` mirrors under ./data, updated with `git fetch` and evicted LRU by disk usage.
+
+    Only commits and trees are mirrored up front; `git archive` of the analyzed
+    folder lazily fetches just the blobs it needs.
+    """
+
+    def __init__(self, cache: DiskLRUCache):
+        self.cache = cache
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def key(git_url: str) -> str:
+        return cache_key("mirror", git_url)
+
+    async def ensure(self, git_url: str, clone_url: str, commit: Optional[str]) -> str:
+        """Return an up-to-date mirror of git_url that contains commit (or the latest HEAD).
+
+        The mirror is pinned against eviction; the caller unpins it (cache.unpin(key)) once done with it.
+        """
+        key = self.key(git_url)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self.cache.pin(key)
+        try:
+            return await self._ensure(key, lock, git_url, clone_url, commit)
+        except BaseException:
+            self.cache.unpin(key)
+            raise
+
+    async def _ensure(self, key: str, lock: asyncio.Lock, git_url: str, clone_url: str, commit: Optional[str]) -> str:
+        async with lock:
+            mirror_dir = await run_blocking(self.cache.get_dir, key)
+            if mirror_dir is None:
+                logger.info(f"Creating mirror of {git_url}")
+                tmp_dir = self.cache.new_tmp_dir()
+                try:
+                    await git_command(["clone", "--quiet", "--mirror", "--filter=blob:none", clone_url, tmp_dir],
+                                      timeout=GIT_TIMEOUT)
+                    # Credentials are passed per command instead of being stored in the mirror config
+                    await git_command(["config", "--unset", "remote.origin.url"], cwd=tmp_dir)
+                    mirror_dir = await run_blocking(self.cache.adopt_dir, key, tmp_dir)
+                except BaseException:
+                    await run_blocking(shutil.rmtree, tmp_dir, ignore_errors=True)
+                    raise
+            elif commit is None or not await has_commit(mirror_dir, commit):
+                logger.info(f"Fetching updates into mirror of {git_url}")
+                await git_command(["fetch", "--quiet", "--prune", "--filter=blob:none", "origin"],
+                                  cwd=mirror_dir, remote_url=clone_url, timeout=GIT_TIMEOUT)
+                await run_blocking(self.cache.refresh, key)
+            else:
+                logger.info(f"Mirror of {git_url} already has commit {commit}")
+        return mirror_dir
+
+    async def export(self, mirror_dir: str, clone_url: str, commit: str, code_folder: str, target_dir: str):
+        """Write the tree of code_folder at commit into target_dir (paths stay repo-relative)"""
+        archive = os.path.join(target_dir, ".source.tar")
+        pathspec = [code_folder] if code_folder else []
+        await git_command(["archive", "--format=tar", f"--output={archive}", commit, "--", *pathspec],
+                          cwd=mirror_dir, remote_url=clone_url, timeout=GIT_TIMEOUT)
+        await run_blocking(_extract_tar, archive, target_dir)
+
+
+async def shallow_checkout(clone_url: str, code_folder: str, target_dir: str) -> SourceCheckout:
+    """Clone only the latest commit, without blobs outside code_folder"""
+    await git_command(["clone", "--quiet", "--depth", "1", "--filter=blob:none", "--sparse", clone_url, target_dir],
+                      timeout=GIT_TIMEOUT)
+    if code_folder:
+        await git_command(["sparse-checkout", "set", code_folder], cwd=target_dir, timeout=GIT_TIMEOUT)
+    return SourceCheckout(target_dir, await head_commit(target_dir))
+
+
+_mirrors: Optional[MirrorCache] = None
+
+
+async def fetch_source(git_url: str, clone_url: str, commit: Optional[str], code_folder: str,
+                       target_dir: str) -> SourceCheckout:
+    """Materialize code_folder of the repository at commit (remote HEAD if None) under target_dir.
+
+    Call `release()` on the result once its repo_dir is no longer needed.
+    """
+    global _mirrors
+    code_folder = normalize_folder(code_folder)
+    if not GIT_MIRROR_CACHE:
+        return await shallow_checkout(clone_url, code_folder, target_dir)
+    if _mirrors is None:
+        _mirrors = MirrorCache(get_cache("mirrors"))
+    mirrors = _mirrors
+    mirror_dir = await mirrors.ensure(git_url, clone_url, commit)
+    key = mirrors.key(git_url)
+    try:
+        commit = commit or await head_commit(mirror_dir)
+        await mirrors.export(mirror_dir, clone_url, commit, code_folder, target_dir)
+    except BaseException:
+        mirrors.cache.unpin(key)
+        raise
+    return SourceCheckout(mirror_dir, commit, lambda: mirrors.cache.unpin(key))
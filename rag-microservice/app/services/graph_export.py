@@ -0,0 +1,263 @@
+import json
+import os
+import posixpath
+import threading
+from array import array
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.services.analysis import PlantUMLGenerator
+from app.services.cache import get_cache
+from app.services.call_graph import CallGraph
+from app.services.embeddings import embedding_id
+from app.services.pipeline import ANALYSIS_CACHE_VERSION, build_call_graph
+from app.services.repo_state import RepoStateStore, repo_state_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Call graphs kept in memory for streaming and paging (each rebuilt from the stored repository state)
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "4"))
+# Files, nodes or edges per NDJSON line
+GRAPH_CHUNK = int(os.getenv("GRAPH_CHUNK", "1000"))
+GRAPH_MAX_PAGE_SIZE = 2000
+
+PARTITIONS = ("package", "subtree")
+
+
+class Pagination:
+    """Assignment of every node to a page, plus page-to-page call counts for cross-links"""
+
+    def __init__(self, pages: List[List[int]], titles: List[str], size: int):
+        self.pages = pages
+        self.titles = titles
+        self.page_of = array("l", bytes(size * array("l").itemsize))
+        for p, nodes in enumerate(pages):
+            for i in nodes:
+                self.page_of[i] = p
+        self.calls_into: List[Dict[int, int]] = [{} for _ in pages]
+        self.called_from: List[Dict[int, int]] = [{} for _ in pages]
+
+
+class StoredGraph:
+    """Call graph of the last analyzed commit of a repository, with interned file ids"""
+
+    def __init__(self, graph: CallGraph, commit: Optional[str]):
+        self.graph = graph
+        self.commit = commit
+        self.files: List[str] = []
+        file_ids: Dict[str, int] = {}
+        self.file_of = array("l")
+        for func in graph.functions:
+            f = file_ids.get(func["file"])
+            if f is None:
+                f = file_ids[func["file"]] = len(self.files)
+                self.files.append(func["file"])
+            self.file_of.append(f)
+        self._paginations: Dict[Tuple[str, int], Pagination] = {}
+        self._lock = threading.Lock()
+
+    def ndjson(self, chunk: int = GRAPH_CHUNK) -> Iterator[bytes]:
+        """The graph as newline-delimited JSON, a bounded number of items per line.
+
+        Lines are {"type": "graph", ...counts} followed by "files", "nodes",
+        "edges" and "entry_points" lines and a final {"type": "end"}. Files and
+        nodes are numbered by position (each line carries the index of its first
+        item in "start"): a node is [name, file index, class, kind, line] and
+        edges are a flat [caller, callee, caller, callee, ...] list of node indexes.
+        """
+        graph = self.graph
+
+        def line(data: Dict) -> bytes:
+            return (json.dumps(data, separators=(",", ":")) + "\n").encode("utf-8")
+
+        yield line({"type": "graph", "commit": self.commit, "files": len(self.files), "nodes": len(graph),
+                    "edges": graph.edge_count, "entry_points": len(graph.entry_points)})
+        for start in range(0, len(self.files), chunk):
+            yield line({"type": "files", "start": start, "items": self.files[start:start + chunk]})
+        for start in range(0, len(graph), chunk):
+            items = [[func["name"], self.file_of[i], func.get("class"), func.get("type", "function"), func.get("line")]
+                     for i, func in enumerate(graph.functions[start:start + chunk], start)]
+            yield line({"type": "nodes", "start": start, "items": items})
+        for start in range(0, graph.edge_count, chunk):
+            items = []
+            # Callers of the edge range, found through the CSR offsets
+            caller = _caller_of(graph.offsets, start)
+            for e in range(start, min(start + chunk, graph.edge_count)):
+                while graph.offsets[caller + 1] <= e:
+                    caller += 1
+                items.append(caller)
+                items.append(graph.targets[e])
+            yield line({"type": "edges", "start": start, "items": items})
+        for start in range(0, len(graph.entry_points), chunk):
+            yield line({"type": "entry_points", "start": start, "items": graph.entry_points[start:start + chunk]})
+        yield line({"type": "end"})
+
+    def pagination(self, partition: str, page_size: int) -> Pagination:
+        key = (partition, page_size)
+        with self._lock:
+            pagination = self._paginations.get(key)
+        if pagination is None:
+            pages, titles = (self._package_pages if partition == "package" else self._subtree_pages)(page_size)
+            pagination = Pagination(pages, titles, len(self.graph))
+            graph, page_of = self.graph, pagination.page_of
+            for caller in range(len(graph)):
+                source = page_of[caller]
+                for callee in graph.callees(caller):
+                    target = page_of[callee]
+                    if target != source:
+                        pagination.calls_into[source][target] = pagination.calls_into[source].get(target, 0) + 1
+                        pagination.called_from[target][source] = pagination.called_from[target].get(source, 0) + 1
+            with self._lock:
+                pagination = self._paginations.setdefault(key, pagination)
+        return pagination
+
+    def _package_pages(self, page_size: int) -> Tuple[List[List[int]], List[str]]:
+        """Whole directories per page where they fit, else whole files, else runs of a file's nodes"""
+        by_file: Dict[int, List[int]] = {}
+        for i, f in enumerate(self.file_of):
+            by_file.setdefault(f, []).append(i)
+        by_dir: Dict[str, List[int]] = {}
+        for f in sorted(by_file, key=lambda f: self.files[f]):
+            by_dir.setdefault(posixpath.dirname(self.files[f].replace(os.sep, "/")), []).append(f)
+
+        pages, titles = [], []
+
+        def place(nodes: List[int], title: str):
+            if not pages or len(pages[-1]) + len(nodes) > page_size:
+                pages.append([])
+                titles.append([])
+            pages[-1].extend(nodes)
+            if title not in titles[-1]:
+                titles[-1].append(title)
+
+        for directory, files in by_dir.items():
+            title = directory or "."
+            nodes = [i for f in files for i in by_file[f]]
+            if len(nodes) <= page_size:
+                place(nodes, title)
+                continue
+            for f in files:
+                for start in range(0, len(by_file[f]), page_size):
+                    place(by_file[f][start:start + page_size], title)
+        return pages, [", ".join(names) for names in titles]
+
+    def _subtree_pages(self, page_size: int) -> Tuple[List[List[int]], List[str]]:
+        """Nodes in breadth-first order of each entry point's subtree, cut into pages"""
+        graph = self.graph
+        seen = bytearray(len(graph))
+        order: List[int] = []
+        roots = list(graph.entry_points) + list(range(len(graph)))  # Then nodes only reachable through cycles
+        for root in roots:
+            if seen[root]:
+                continue
+            seen[root] = 1
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                order.append(node)
+                for callee in graph.callees(node):
+                    if not seen[callee]:
+                        seen[callee] = 1
+                        queue.append(callee)
+        pages = [order[start:start + page_size] for start in range(0, len(order), page_size)]
+        return pages, [f"from {graph.ids[nodes[0]]}" for nodes in pages]
+
+    def page(self, partition: str, page_size: int, page: int, link: str) -> Optional[Dict]:
+        """One page of the partitioned diagram; calls to other pages point at stubs linked to their page"""
+        pagination = self.pagination(partition, page_size)
+        if not 0 <= page < len(pagination.pages):
+            return None
+        graph, page_of = self.graph, pagination.page_of
+        nodes = pagination.pages[page]
+        edges, stubs = [], {}
+        for caller in nodes:
+            for callee in graph.callees(caller):
+                if page_of[callee] == page:
+                    edges.append((caller, callee))
+                elif len(stubs) < page_size or callee in stubs:
+                    stubs.setdefault(callee, []).append(caller)
+        lines = PlantUMLGenerator.header_lines()
+        lines.append(f"title {pagination.titles[page]} (page {page + 1} of {len(pagination.pages)})")
+        lines.append("")
+        lines.extend(PlantUMLGenerator.declaration_lines(graph, nodes))
+        if stubs:
+            lines.append('package "other pages" {')
+            for callee in stubs:
+                target = page_of[callee]
+                # Plain substitution: the template comes from the caller and may contain other braces
+                url = link.replace("{page}", str(target))
+                lines.append(f"  component [{graph.functions[callee]['name']}] as {graph.alias(callee)} "
+                             f"<<page {target + 1}>> [[{url}]]")
+            lines.append("}")
+            lines.append("")
+        lines.extend(PlantUMLGenerator.edge_lines(graph, edges))
+        lines.extend(f"{graph.alias(caller)} ..> {graph.alias(callee)}"
+                     for callee, callers in stubs.items() for caller in dict.fromkeys(callers))
+        lines.append("")
+        lines.append("@enduml")
+        return {
+            "commit": self.commit,
+            "partition": partition,
+            "page": page,
+            "pages": len(pagination.pages),
+            "page_size": page_size,
+            "title": pagination.titles[page],
+            "nodes": len(nodes),
+            "edges": len(edges),
+            "calls_into": {str(p): n for p, n in sorted(pagination.calls_into[page].items())},
+            "called_from": {str(p): n for p, n in sorted(pagination.called_from[page].items())},
+            "plantuml": "\n".join(lines),
+        }
+
+
+def _caller_of(offsets: array, edge: int) -> int:
+    """Node whose callee range contains the given edge index (binary search over the CSR offsets)"""
+    low, high = 0, len(offsets) - 2
+    while low < high:
+        middle = (low + high + 1) // 2
+        if offsets[middle] <= edge:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class GraphStore:
+    """Small LRU of call graphs rebuilt from stored repository states, keyed by the state's location and version"""
+
+    def __init__(self, max_graphs: int = GRAPH_CACHE_SIZE):
+        self.max_graphs = max(1, max_graphs)
+        self._graphs: "OrderedDict[Tuple[str, int], StoredGraph]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, git_url: str, code_folder: str, language: str) -> Optional[StoredGraph]:
+        """Graph of the last analysis of a repository folder, or None if it was never analyzed (blocking)"""
+        states = RepoStateStore(get_cache("repos"))
+        key = repo_state_key(git_url, code_folder, language, embedding_id())
+        state_dir = states.cache.get_dir(key)
+        if not state_dir:
+            return None
+        try:
+            version = os.stat(os.path.join(state_dir, RepoStateStore.STATE_FILE)).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            stored = self._graphs.get((key, version))
+            if stored is not None:
+                self._graphs.move_to_end((key, version))
+                return stored
+        state, _ = states.load(key, ANALYSIS_CACHE_VERSION)
+        if state is None:
+            return None
+        stored = StoredGraph(build_call_graph(state), state.commit)
+        with self._lock:
+            stored = self._graphs.setdefault((key, version), stored)
+            self._graphs.move_to_end((key, version))
+            for stale in [k for k in self._graphs if k[0] == key and k[1] != version]:
+                del self._graphs[stale]
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+        return stored
+
+
+graphs = GraphStore()
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from app.models.schemas import PlantUMLTreeRequest
+from app.services.cache import cache_key
+from app.services.progress import Progress
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Seconds a finished job stays available for polling
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+# Finished jobs (with their results) kept in memory at most; the oldest are dropped first
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "256"))
+
+FINISHED = ("succeeded", "failed")
+
+
+class Job:
+    """A background /plantuml-tree analysis whose progress can be polled or streamed"""
+
+    def __init__(self, request: PlantUMLTreeRequest, key: str):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.key = key
+        self.commit: Optional[str] = None  # Known once the analysis has run
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.status_code: Optional[int] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._loop = asyncio.get_running_loop()
+        self._subscribers: List[asyncio.Event] = []
+        self.progress = Progress(listener=self._changed)
+
+    def _changed(self):
+        # Progress may be updated from pipeline worker threads
+        for event in list(self._subscribers):
+            self._loop.call_soon_threadsafe(event.set)
+
+    def subscribe(self) -> asyncio.Event:
+        event = asyncio.Event()
+        event.set()  # Emit the current state immediately
+        self._subscribers.append(event)
+        return event
+
+    def unsubscribe(self, event: asyncio.Event):
+        if event in self._subscribers:
+            self._subscribers.remove(event)
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        now = self.finished_at or time.time()
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "git_url": self.request.git_url,
+            "commit": self.commit,
+            "created_at": self.created_at,
+            "elapsed_sec": round(now - (self.started_at or now), 3),
+            **self.progress.snapshot(),
+        }
+        if self.error is not None:
+            data["error"] = self.error
+            data["status_code"] = self.status_code
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """Runs analysis jobs on a pool of background workers, deduplicating identical in-flight requests"""
+
+    def __init__(self, workers: int = JOB_WORKERS, ttl: int = JOB_TTL, max_finished: int = JOB_MAX_FINISHED):
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.max_finished = max(0, max_finished)
+        self.jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        finished = sorted((job for job in self.jobs.values() if job.status in FINISHED), key=lambda job: job.finished_at)
+        excess = len(finished) - self.max_finished
+        for index, job in enumerate(finished):
+            if index < excess or job.finished_at < cutoff:
+                del self.jobs[job.id]
+
+    async def close(self):
+        """Cancel the workers (and the analyses they are running); called on application shutdown"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, request: PlantUMLTreeRequest) -> Tuple[Job, bool]:
+        """Queue an analysis; returns the job and whether an identical queued or running job was reused.
+
+        Nothing is awaited before the job is queued: the worker resolves the
+        commit. Finished jobs are not shared since the repository may have moved
+        on; repeating the analysis of an unchanged commit hits the result cache.
+        """
+        self._start()
+        self._prune()
+        # Every option changes the result (and the token decides who may share it), so all fields are part of the key
+        key = cache_key("job", dict(request.model_dump(), language=request.language.lower()))
+        existing = self._by_key.get(key)
+        if existing is not None:
+            logger.info(f"Deduplicated analysis request onto job {existing.id}")
+            return existing, True
+        job = Job(request, key)
+        self.jobs[job.id] = job
+        self._by_key[key] = job
+        self._queue.put_nowait(job)
+        return job, False
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        from app.services.pipeline import AnalysisError, analyze_repository
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            job._changed()
+            try:
+                # The commit is resolved here, in the "resolve" stage, rather than before queueing
+                job.result = await analyze_repository(job.request, job.progress)
+                job.commit = job.result["metadata"]["commit"]
+                job.status = "succeeded"
+            except AnalysisError as e:
+                job.status, job.error, job.status_code = "failed", e.message, e.status_code
+            except asyncio.CancelledError:
+                job.status, job.error, job.status_code = "failed", "Service is shutting down", 503
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {e}")
+                job.status, job.error, job.status_code = "failed", f"Analysis failed: {str(e)}", 500
+            finally:
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+                job.finished_at = time.time()
+                job._changed()
+
+
+job_manager = JobManager()
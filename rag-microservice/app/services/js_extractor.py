@@ -0,0 +1,236 @@
+import threading
+import warnings
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from tree_sitter_languages import get_parser
+except ImportError:  # pragma: no cover - depends on the installed wheels
+    get_parser = None
+
+# Grammar per file extension; the javascript grammar also understands JSX
+GRAMMARS = {".ts": "typescript", ".tsx": "tsx", ".mts": "typescript", ".cts": "typescript"}
+DEFAULT_GRAMMAR = "javascript"
+
+NAMED_FUNCTION_NODES = {"function_declaration", "generator_function_declaration"}
+FUNCTION_EXPRESSION_NODES = {"function", "function_expression", "generator_function", "arrow_function"}
+CLASS_NODES = {"class_declaration", "class", "abstract_class_declaration"}
+JSX_ELEMENT_NODES = {"jsx_opening_element", "jsx_self_closing_element"}
+JSX_NODES = {"jsx_element", "jsx_self_closing_element", "jsx_fragment"}
+
+_local = threading.local()
+
+
+def available() -> bool:
+    return get_parser is not None
+
+
+def _parser(grammar: str):
+    # Parsers are not thread-safe; keep one per thread and grammar
+    parsers = getattr(_local, "parsers", None)
+    if parsers is None:
+        parsers = _local.parsers = {}
+    if grammar not in parsers:
+        with warnings.catch_warnings():
+            # tree-sitter-languages still uses the deprecated Language(path, name) constructor
+            warnings.simplefilter("ignore", FutureWarning)
+            parsers[grammar] = get_parser(grammar)
+    return parsers[grammar]
+
+
+def _grammar(filename: str) -> str:
+    for ext, grammar in GRAMMARS.items():
+        if filename.endswith(ext):
+            return grammar
+    return DEFAULT_GRAMMAR
+
+
+class _Scope:
+    __slots__ = ("record", "calls", "seen", "has_jsx")
+
+    def __init__(self, record: Dict):
+        self.record = record
+        self.calls: List[str] = []
+        self.seen = set()
+        self.has_jsx = False
+
+
+def _imports(node, text, imports: Dict[str, List[str]]):
+    """Record `import a, { b as c } from "m"` as {"a": ["m", "default"], "c": ["m", "b"]}"""
+    source = node.child_by_field_name("source")
+    if source is None:
+        return
+    module = text(source).strip("'\"`")
+    for clause in node.named_children:
+        if clause.type != "import_clause":
+            continue
+        for child in clause.named_children:
+            if child.type == "identifier":
+                imports[text(child)] = [module, "default"]
+            elif child.type == "named_imports":
+                for spec in child.named_children:
+                    name = spec.child_by_field_name("name")
+                    alias = spec.child_by_field_name("alias")
+                    if name is not None:
+                        imports[text(alias if alias is not None else name)] = [module, text(name)]
+
+
+def extract_functions(code: str, filename: str) -> List[Dict]:
+    """Extract functions, methods, classes and components with the calls made in their own bodies"""
+    return extract(code, filename)[0]
+
+
+def extract(code: str, filename: str) -> Tuple[List[Dict], Dict[str, List[str]]]:
+    """Extract functions, methods, classes and components with their calls, plus imported names.
+
+    A single iterative pass over the tree-sitter syntax tree: each call is
+    attributed to the innermost named function enclosing it (anonymous
+    callbacks count towards their parent), so cost is linear in file size.
+    """
+    source = code.encode("utf-8", errors="ignore")
+    tree = _parser(_grammar(filename)).parse(source)
+
+    def text(node) -> str:
+        return source[node.start_byte:node.end_byte].decode("utf-8", errors="ignore")
+
+    functions: List[Dict] = []
+    imports: Dict[str, List[str]] = {}
+    scopes: List[_Scope] = []
+    classes: List[str] = []
+
+    def open_scope(node, name: str, kind: str, class_name: Optional[str] = None):
+        parent = node.parent
+        record = {
+            "name": name,
+            "file": filename,
+            "calls": [],
+            "line": node.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1,
+            "type": kind,
+            "class": class_name,
+            "exported": parent is not None and (
+                parent.type == "export_statement"
+                or (parent.type == "variable_declarator" and parent.parent is not None
+                    and parent.parent.parent is not None and parent.parent.parent.type == "export_statement")
+            ),
+        }
+        functions.append(record)
+        scopes.append(_Scope(record))
+
+    def close_scope():
+        scope = scopes.pop()
+        scope.record["calls"] = scope.calls
+        if scope.has_jsx and scope.record["name"][:1].isupper() and scope.record["type"] != "class":
+            scope.record["type"] = "component"
+
+    def add_call(name: Optional[str]):
+        if not name or not scopes:
+            return
+        scope = scopes[-1]
+        if name != scope.record["name"] and name not in scope.seen:
+            scope.seen.add(name)
+            scope.calls.append(name)
+
+    def expression_name(node) -> Optional[str]:
+        """Name given to a function expression by its surrounding declaration, if any"""
+        parent = node.parent
+        if parent is None:
+            return None
+        if parent.type == "variable_declarator":
+            name = parent.child_by_field_name("name")
+            return text(name) if name is not None and name.type == "identifier" else None
+        if parent.type == "assignment_expression":
+            left = parent.child_by_field_name("left")
+            if left is not None and left.type == "member_expression":
+                left = left.child_by_field_name("property")
+            return text(left) if left is not None else None
+        if parent.type in ("pair", "public_field_definition", "field_definition"):
+            key = parent.child_by_field_name("key") or parent.child_by_field_name("name") \
+                or parent.child_by_field_name("property")
+            return text(key) if key is not None else None
+        if parent.type == "export_statement":
+            return "default"
+        if node.type != "arrow_function":
+            name = node.child_by_field_name("name")
+            return text(name) if name is not None else None
+        return None
+
+    # Iterative DFS; a None entry closes the scope opened by the node pushed before it
+    stack = [tree.root_node]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            close_scope()
+            continue
+        if isinstance(node, str):
+            classes.pop()
+            continue
+
+        kind = node.type
+        opened = False
+        if kind in NAMED_FUNCTION_NODES:
+            name = node.child_by_field_name("name")
+            if name is not None:
+                open_scope(node, text(name), "function_declaration")
+                opened = True
+        elif kind in FUNCTION_EXPRESSION_NODES:
+            name = expression_name(node)
+            if name:
+                in_class = node.parent is not None and node.parent.type in ("public_field_definition", "field_definition")
+                open_scope(node, name, "method_definition" if in_class else
+                           "arrow_function" if kind == "arrow_function" else "function_expression",
+                           classes[-1] if in_class and classes else None)
+                opened = True
+        elif kind == "method_definition":
+            name = node.child_by_field_name("name")
+            if name is not None:
+                in_class = node.parent is not None and node.parent.type == "class_body"
+                open_scope(node, text(name), "method_definition", classes[-1] if in_class and classes else None)
+                opened = True
+        elif kind in CLASS_NODES:
+            name = node.child_by_field_name("name")
+            class_name = text(name) if name is not None else expression_name(node)
+            if class_name:
+                open_scope(node, class_name, "class")
+                opened = True
+            classes.append(class_name or "")
+            stack.append("class")
+        elif kind == "call_expression":
+            target = node.child_by_field_name("function")
+            if target is not None:
+                if target.type == "identifier":
+                    add_call(text(target))
+                elif target.type == "member_expression":
+                    obj = target.child_by_field_name("object")
+                    # Only a bare identifier can be `console`; slicing a long call chain's text would be quadratic
+                    if obj is None or obj.type != "identifier" or text(obj) != "console":
+                        prop = target.child_by_field_name("property")
+                        add_call(text(prop) if prop is not None else None)
+        elif kind == "new_expression":
+            target = node.child_by_field_name("constructor")
+            if target is not None and target.type == "identifier":
+                add_call(text(target))
+        elif kind in JSX_ELEMENT_NODES:
+            target = node.child_by_field_name("name")
+            if target is not None:
+                if target.type in ("member_expression", "nested_identifier") and target.named_children:
+                    target = target.named_children[-1]
+                name = text(target)
+                # Lower-case JSX tags are DOM elements, upper-case ones are component usages
+                if name[:1].isupper():
+                    add_call(name)
+        elif kind == "import_statement":
+            _imports(node, text, imports)
+            continue
+
+        if kind in JSX_NODES and scopes:
+            scopes[-1].has_jsx = True
+        if opened:
+            stack.append(None)
+        stack.extend(reversed(node.children))
+
+    while scopes:
+        close_scope()
+    return functions, imports
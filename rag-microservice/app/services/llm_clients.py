@@ -0,0 +1,97 @@
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by every OpenAI chat and embeddings call in this worker
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "32"))
+# Seconds an idle keep-alive connection is kept open
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "90"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# Open a connection to the API at startup so the first request skips the TLS handshake
+LLM_PREWARM = os.getenv("LLM_PREWARM", "true").lower() in ("1", "true", "yes")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+_lock = threading.Lock()
+_http: Optional[Tuple[object, object]] = None
+_chat_models: Dict[Tuple[str, float], object] = {}
+_embeddings = None
+
+
+def http_clients():
+    """(sync, async) httpx clients with the shared keep-alive pool; created on first use"""
+    global _http
+    with _lock:
+        if _http is None:
+            import httpx
+            limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                                  keepalive_expiry=LLM_KEEPALIVE_EXPIRY)
+            timeout = httpx.Timeout(LLM_TIMEOUT, connect=10.0)
+            _http = (httpx.Client(limits=limits, timeout=timeout),
+                     httpx.AsyncClient(limits=limits, timeout=timeout))
+        return _http
+
+
+def chat_model(model: str, temperature: float = 0.1):
+    """Process-wide ChatOpenAI client for a model; all of them share one connection pool"""
+    key = (model, temperature)
+    client = _chat_models.get(key)
+    if client is None:
+        from langchain_openai import ChatOpenAI
+        sync_client, async_client = http_clients()
+        with _lock:
+            client = _chat_models.get(key)
+            if client is None:
+                client = _chat_models[key] = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    openai_api_key=os.getenv("OPENAI_API_KEY"),
+                    http_client=sync_client,
+                    http_async_client=async_client
+                )
+    return client
+
+
+def embeddings():
+    """Process-wide embeddings client for the configured provider (see embeddings.create_embeddings)"""
+    global _embeddings
+    if _embeddings is None:
+        from app.services.embeddings import create_embeddings
+        client = create_embeddings()
+        with _lock:
+            if _embeddings is None:
+                _embeddings = client
+    return _embeddings
+
+
+async def warm_up(models: Iterable[str]):
+    """Create the clients ahead of the first request, then open a pooled connection to the API"""
+    from app.utils.process import run_blocking
+
+    for model in models:
+        await run_blocking(chat_model, model)
+    await run_blocking(embeddings)
+    api_key = os.getenv("OPENAI_API_KEY")
+    if LLM_PREWARM and api_key:
+        try:
+            _, async_client = http_clients()
+            await async_client.get(f"{OPENAI_BASE_URL}/models", headers={"Authorization": f"Bearer {api_key}"})
+        except Exception as e:
+            logger.warning(f"Could not pre-open a connection to {OPENAI_BASE_URL}: {e}")
+    logger.info("LLM clients ready")
+
+
+async def close():
+    """Close the shared connection pool (application shutdown)"""
+    global _http, _embeddings
+    with _lock:
+        http, _http = _http, None
+        _chat_models.clear()
+        _embeddings = None
+    if http is not None:
+        sync_client, async_client = http
+        sync_client.close()
+        await async_client.aclose()
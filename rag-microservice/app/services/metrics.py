@@ -0,0 +1,38 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram
+
+# Prometheus text exposition format served by /metrics
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Analyses and LLM calls take far longer than the client's default buckets cover
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "agamify_http_request_duration_seconds", "HTTP request latency by route and status code",
+    ["method", "route", "status"], buckets=DEFAULT_BUCKETS)
+ANALYSES = Counter(
+    "agamify_analyses_total", "Repository analyses by outcome (computed, cached or failed)", ["outcome"])
+ANALYSES_ACTIVE = Gauge(
+    "agamify_analyses_active", "Analyses currently running in this worker")
+ANALYSES_QUEUED = Gauge(
+    "agamify_analyses_queued", "Analyses waiting for a slot in this worker")
+STAGE_SECONDS = Histogram(
+    "agamify_stage_duration_seconds", "Duration of analysis pipeline stages", ["stage", "status"],
+    buckets=DEFAULT_BUCKETS)
+FILES = Counter(
+    "agamify_files_total", "Source files seen by static analysis (parsed, cached or unchanged)", ["result"])
+FUNCTIONS = Counter(
+    "agamify_functions_extracted_total", "Functions and classes in analyzed repositories")
+LLM_CALLS = Counter(
+    "agamify_llm_calls_total", "Completed LLM calls by purpose (summary, refine or migrate)", ["purpose"])
+LLM_RETRIES = Counter(
+    "agamify_llm_retries_total", "Retried LLM and embedding calls by purpose", ["purpose"])
+LLM_TOKENS = Counter(
+    "agamify_llm_tokens_total", "LLM tokens by purpose and kind (prompt or completion)", ["purpose", "kind"])
+LLM_CALL_SECONDS = Histogram(
+    "agamify_llm_call_duration_seconds", "LLM call latency including retries", ["purpose"], buckets=DEFAULT_BUCKETS)
+EMBEDDED_CHUNKS = Counter(
+    "agamify_embedded_chunks_total", "Chunks embedded (code and summaries)")
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "agamify_embedding_batch_duration_seconds", "Embedding batch latency including retries", buckets=DEFAULT_BUCKETS)
+CACHE_REQUESTS = Counter(
+    "agamify_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ["cache", "result"])
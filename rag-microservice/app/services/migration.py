@@ -0,0 +1,507 @@
+import asyncio
+import bisect
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from langchain.prompts import PromptTemplate
+from app.models.schemas import MigrationRequest
+from app.services import llm_clients
+from app.services.analysis import CodeAnalyzer
+from app.services.cache import DiskLRUCache, cache_key, content_hash, get_cache
+from app.services.call_graph import CallGraph, Imports
+from app.services.git_mirror import fetch_source
+from app.services.metrics import CACHE_REQUESTS, LLM_CALL_SECONDS, LLM_CALLS, LLM_RETRIES, LLM_TOKENS
+from app.services.pipeline import (ANALYSIS_CACHE_VERSION, EXCLUDED_DIRS, AnalysisError, limiter, source_extensions,
+                                   source_path)
+from app.services.static_analysis import analyze_files, discover_files
+from app.services.summarizer import with_retries
+from app.utils.git import authenticated_url, resolve_remote_head
+from app.utils.process import run_blocking
+from app.utils.tokens import count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when the prompt or the answer parsing changes so cached translations are ignored
+MIGRATION_CACHE_VERSION = 1
+MIGRATION_MODEL = os.getenv("MIGRATION_MODEL", "gpt-4o")
+# Translations in flight at once, across all levels and target frameworks of a migration
+MIGRATION_CONCURRENCY = int(os.getenv("MIGRATION_CONCURRENCY", "8"))
+MIGRATION_MAX_RETRIES = int(os.getenv("MIGRATION_MAX_RETRIES", "3"))
+# Tokens of already translated dependencies included as context; components above MIGRATION_MAX_TOKENS are kept as-is
+MIGRATION_CONTEXT_TOKENS = int(os.getenv("MIGRATION_CONTEXT_TOKENS", "6000"))
+MIGRATION_MAX_TOKENS = int(os.getenv("MIGRATION_MAX_TOKENS", "12000"))
+# Largest repository (source files in code_folder) migrated in one request
+MIGRATION_MAX_FILES = int(os.getenv("MIGRATION_MAX_FILES", "500"))
+
+MODULE = "<module>"
+
+# Parser used for a single source_code snippet, by source framework
+FRAMEWORK_EXTENSIONS = {
+    "react": ".jsx", "nextjs": ".jsx", "preact": ".jsx", "solid": ".jsx",
+    "angular": ".ts", "typescript": ".ts", "nestjs": ".ts",
+    "python": ".py", "django": ".py", "flask": ".py", "fastapi": ".py",
+}
+
+FENCE = re.compile(r"```[\w+#.-]*\n(.*?)```", re.DOTALL)
+
+TRANSLATION_PROMPT = PromptTemplate(
+    template="""
+You are an expert software engineer migrating a codebase from {source} to {target}.
+
+Translate the component below to idiomatic {target}.
+- {structure}
+- {comments}
+- It uses the components listed under "Dependencies", already translated to {target}. Refer to them by their translated names and APIs; do not translate or repeat them.
+
+Dependencies:
+{context}
+
+Component {name}:
+```
+{code}
+```
+
+Reply with the translated code in a single code block. After the code block, add one line "DEPENDENCY: <package>" for every package the translation needs, and one line "WARNING: <text>" for anything that could not be translated faithfully.
+""",
+    input_variables=["source", "target", "structure", "comments", "context", "name", "code"]
+)
+
+
+class Component:
+    """A unit of translation: a source file, or a top-level definition of a single snippet"""
+
+    __slots__ = ("id", "code", "line", "deps", "context_deps", "hash")
+
+    def __init__(self, component_id: str, code: str, line: int = 0):
+        self.id = component_id
+        self.code = code
+        self.line = line
+        self.deps: List[str] = []
+        # Dependencies outside the component's own cycle, translated at earlier levels (set by dependency_levels)
+        self.context_deps: List[str] = []
+        self.hash = ""
+
+
+def _add_call_edges(components: Dict[str, Component], graph: CallGraph, owner: List[Optional[str]]):
+    """Component a -> b when a function of a calls a function of b; owner maps call graph nodes to components"""
+    edges = {component_id: set() for component_id in components}
+    for i in range(len(graph)):
+        source = owner[i]
+        if source is None:
+            continue
+        for target in graph.callees(i):
+            if owner[target] is not None and owner[target] != source:
+                edges[source].add(owner[target])
+    for component_id, deps in edges.items():
+        components[component_id].deps = sorted(deps | set(components[component_id].deps))
+
+
+def components_from_files(files: Dict[str, str], functions: List[Dict], imports: Imports) -> Dict[str, Component]:
+    """One component per source file, depending on the files whose functions it calls"""
+    components = {path: Component(path, code) for path, code in files.items()}
+    graph = CallGraph(functions, imports)
+    owner = [func["file"] if func["file"] in components else None for func in graph.functions]
+    _add_call_edges(components, graph, owner)
+    return components
+
+
+def components_from_source(code: str, filename: str) -> Dict[str, Component]:
+    """Split a snippet into its top-level functions and classes plus the remaining module code.
+
+    Methods and nested functions stay with their top-level definition. Module
+    code (imports, constants) becomes a component every definition depends on,
+    so it is translated first and its translation is context for the rest.
+    """
+    functions, imports = CodeAnalyzer.analyze_file(code, filename)
+    lines = code.splitlines(keepends=True)
+    spans = sorted((func for func in functions if func.get("line") and func.get("end_line")),
+                   key=lambda func: (func["line"], -func["end_line"]))
+    top_level: List[Dict] = []
+    for func in spans:
+        if not top_level or func["line"] > top_level[-1]["end_line"]:
+            top_level.append(func)
+    if not top_level:
+        return {MODULE: Component(MODULE, code, 1)}
+
+    components: Dict[str, Component] = {}
+    covered = set()
+    for func in top_level:
+        name = func["name"]
+        component_id = name if name not in components else f"{name}:{func['line']}"
+        components[component_id] = Component(component_id, "".join(lines[func["line"] - 1:func["end_line"]]),
+                                             func["line"])
+        covered.update(range(func["line"] - 1, func["end_line"]))
+    module_code = "".join(line for number, line in enumerate(lines) if number not in covered).strip()
+    if module_code:
+        components[MODULE] = Component(MODULE, module_code + "\n", 1)
+        for component in components.values():
+            if component.id != MODULE:
+                component.deps.append(MODULE)
+
+    graph = CallGraph(functions, {filename: imports})
+    starts = [func["line"] for func in top_level]
+    ids = [component_id for component_id in components if component_id != MODULE]
+    owner = []
+    for func in graph.functions:
+        # The top-level definition containing the function (they are disjoint and sorted)
+        position = bisect.bisect_right(starts, func.get("line") or 0) - 1
+        owner.append(ids[position] if position >= 0 else None)
+    _add_call_edges(components, graph, owner)
+    return components
+
+
+def _strongly_connected(components: Dict[str, Component]) -> List[List[str]]:
+    """Tarjan's algorithm (iterative); components are returned dependencies first"""
+    index: Dict[str, int] = {}
+    low: Dict[str, int] = {}
+    stack: List[str] = []
+    on_stack = set()
+    result = []
+    for root in components:
+        if root in index:
+            continue
+        work = [(root, iter(components[root].deps))]
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, deps = work[-1]
+            advanced = False
+            for dep in deps:
+                if dep not in index:
+                    index[dep] = low[dep] = len(index)
+                    stack.append(dep)
+                    on_stack.add(dep)
+                    work.append((dep, iter(components[dep].deps)))
+                    advanced = True
+                    break
+                if dep in on_stack:
+                    low[node] = min(low[node], index[dep])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index[node]:
+                group = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    group.append(member)
+                    if member == node:
+                        break
+                result.append(sorted(group))
+    return result
+
+
+def dependency_levels(components: Dict[str, Component]) -> Tuple[List[List[str]], List[List[str]]]:
+    """Group components into leaf-to-root levels and hash each one together with what it depends on.
+
+    Level 0 holds components without dependencies; every other component sits
+    one level above its deepest dependency, so each level only needs the
+    translations of earlier levels. Members of a dependency cycle share a level
+    and are translated without each other's translations.
+    A component's hash covers its code and the hashes of its dependencies, so a
+    cached translation is reused only while everything it was written against is
+    unchanged. Returns the levels and the cycles found.
+    """
+    level: Dict[str, int] = {}
+    cycles = []
+    for group in _strongly_connected(components):
+        members = set(group)
+        if len(group) > 1:
+            cycles.append(group)
+        outside = sorted({dep for member in group for dep in components[member].deps if dep not in members})
+        depth = 1 + max((level[dep] for dep in outside), default=-1)
+        # Members of a cycle depend on each other's code and on everything the cycle depends on
+        shared = content_hash(*(components[member].code for member in group), *(components[dep].hash for dep in outside))
+        for member in group:
+            level[member] = depth
+            component = components[member]
+            component.context_deps = [dep for dep in component.deps if dep not in members]
+            if len(group) > 1:
+                component.hash = content_hash(component.code, shared)
+            else:
+                component.hash = content_hash(component.code, *(components[dep].hash for dep in component.deps))
+    levels: List[List[str]] = [[] for _ in range(max(level.values(), default=-1) + 1)]
+    for component_id in sorted(level, key=lambda c: (components[c].line, c)):
+        levels[level[component_id]].append(component_id)
+    return levels, cycles
+
+
+def parse_translation(reply: str) -> Tuple[str, List[str], List[str]]:
+    """(code, dependencies, warnings) from a translation answer"""
+    dependencies, warnings, rest = [], [], []
+    for line in reply.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DEPENDENCY:"):
+            dependencies.append(stripped.split(":", 1)[1].strip())
+        elif stripped.upper().startswith("WARNING:"):
+            warnings.append(stripped.split(":", 1)[1].strip())
+        else:
+            rest.append(line)
+    text = "\n".join(rest)
+    match = FENCE.search(reply)
+    code = match.group(1) if match else text.strip() + "\n"
+    return code, [d for d in dependencies if d], [w for w in warnings if w]
+
+
+class MigrationResult:
+    def __init__(self, levels: List[List[str]], targets: List[str]):
+        self.levels = levels
+        self.translations: Dict[str, Dict[str, str]] = {target: {} for target in targets}
+        self.dependencies: Dict[str, set] = {target: set() for target in targets}
+        self.warnings: List[str] = []
+        self.translated = 0
+        self.cached = 0
+        self.failed = 0
+        self.llm_calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.elapsed = 0.0
+
+    @property
+    def confidence(self) -> float:
+        """Share of component translations that came from the model (fresh or cached) rather than a fallback"""
+        total = self.translated + self.cached + self.failed
+        return round((self.translated + self.cached) / total, 3) if total else 0.0
+
+    def dependency_changes(self) -> List[str]:
+        return [f"{target}: {package}" for target, packages in self.dependencies.items() for package in sorted(packages)]
+
+    def stats(self) -> Dict:
+        return {
+            "components": sum(len(level) for level in self.levels),
+            "levels": len(self.levels),
+            "widest_level": max((len(level) for level in self.levels), default=0),
+            "translated": self.translated,
+            "cached": self.cached,
+            "failed": self.failed,
+            "llm_calls": self.llm_calls,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "elapsed_sec": round(self.elapsed, 3),
+        }
+
+
+class MigrationEngine:
+    """Translates components leaf to root, one dependency level at a time.
+
+    Components of a level are independent of each other and are translated
+    concurrently, and every target framework proceeds through the levels in
+    parallel, so wall time grows with the depth of the dependency graph rather
+    than the number of components. Each translation sees the translations of
+    the components it depends on as context.
+    """
+
+    def __init__(self, llm, cache: Optional[DiskLRUCache] = None, concurrency: int = MIGRATION_CONCURRENCY,
+                 max_retries: int = MIGRATION_MAX_RETRIES, backoff_base: float = 1.0):
+        self.llm = llm
+        self.cache = cache
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    def _prompt(self, component: Component, done: Dict[str, str], source: str, target: str,
+                preserve_structure: bool, include_comments: bool) -> str:
+        context, budget = [], MIGRATION_CONTEXT_TOKENS
+        # Not component.deps: whether a member of the same cycle is already done depends on scheduling
+        for dep in component.context_deps:
+            block = f"--- {dep} ---\n{done[dep]}"
+            tokens = count_tokens(block)
+            if tokens > budget:
+                context.append(f"--- {dep} --- (omitted, over the context budget)")
+                continue
+            budget -= tokens
+            context.append(block)
+        return TRANSLATION_PROMPT.format(
+            source=source, target=target, name=component.id, code=component.code,
+            context="\n".join(context) or "(none)",
+            structure="Keep the same structure, names and file layout." if preserve_structure
+            else "Restructure freely where the target framework has a more idiomatic pattern.",
+            comments="Keep and translate the comments." if include_comments else "Leave out comments.",
+        )
+
+    async def _translate(self, component: Component, done: Dict[str, str], source: str, target: str,
+                         options: Tuple[bool, bool], semaphore: asyncio.Semaphore, result: MigrationResult):
+        # The prompt includes the translations of the dependencies, so a changed (or failed) dependency
+        # translation invalidates the translations built against it
+        context = content_hash(*(f"{dep}\n{done[dep]}" for dep in component.context_deps))
+        key = cache_key("translation", MIGRATION_CACHE_VERSION, MIGRATION_MODEL, component.hash, context,
+                        source.lower(), target.lower(), *options)
+        if self.cache is not None:
+            cached = await run_blocking(self.cache.get, key)
+            CACHE_REQUESTS.labels(cache="translations", result="hit" if cached is not None else "miss").inc()
+            if cached is not None:
+                result.cached += 1
+                result.dependencies[target].update(cached["dependencies"])
+                result.warnings.extend(f"{target} {component.id}: {w}" for w in cached["warnings"])
+                done[component.id] = cached["code"]
+                return
+
+        prompt = self._prompt(component, done, source, target, *options)
+        prompt_tokens = count_tokens(prompt)
+        if prompt_tokens > MIGRATION_MAX_TOKENS:
+            result.failed += 1
+            result.warnings.append(f"{target} {component.id}: too large to translate ({prompt_tokens} tokens), kept as-is")
+            done[component.id] = component.code
+            return
+
+        def count_retry():
+            result.retries += 1
+            LLM_RETRIES.labels(purpose="migrate").inc()
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                message = await with_retries(lambda: self.llm.ainvoke(prompt), f"Translation of {component.id} to {target}",
+                                             self.max_retries, self.backoff_base, count_retry)
+            except Exception as e:
+                logger.warning(f"Translation of {component.id} to {target} failed, keeping the source: {e}")
+                result.failed += 1
+                result.warnings.append(f"{target} {component.id}: translation failed ({e}), kept as-is")
+                done[component.id] = component.code
+                return
+            finally:
+                LLM_CALL_SECONDS.labels(purpose="migrate").observe(time.perf_counter() - started)
+        usage = getattr(message, "usage_metadata", None) or {}
+        code, dependencies, warnings = parse_translation(message.content)
+        completion_tokens = usage.get("output_tokens") or count_tokens(message.content)
+        prompt_tokens = usage.get("input_tokens") or prompt_tokens
+        result.llm_calls += 1
+        result.translated += 1
+        result.prompt_tokens += prompt_tokens
+        result.completion_tokens += completion_tokens
+        LLM_CALLS.labels(purpose="migrate").inc()
+        LLM_TOKENS.labels(purpose="migrate", kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(purpose="migrate", kind="completion").inc(completion_tokens)
+        result.dependencies[target].update(dependencies)
+        result.warnings.extend(f"{target} {component.id}: {w}" for w in warnings)
+        done[component.id] = code
+        if self.cache is not None:
+            await run_blocking(self.cache.set, key, {"code": code, "dependencies": dependencies, "warnings": warnings})
+
+    async def _migrate(self, components: Dict[str, Component], levels: List[List[str]], source: str, target: str,
+                       options: Tuple[bool, bool], semaphore: asyncio.Semaphore, result: MigrationResult):
+        done = result.translations[target]
+        for level in levels:
+            await asyncio.gather(*(
+                self._translate(components[component_id], done, source, target, options, semaphore, result)
+                for component_id in level
+            ))
+
+    async def run(self, components: Dict[str, Component], levels: List[List[str]], source: str,
+                  targets: Iterable[str], preserve_structure: bool = True, include_comments: bool = True
+                  ) -> MigrationResult:
+        targets = list(dict.fromkeys(targets))
+        result = MigrationResult(levels, targets)
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        options = (preserve_structure, include_comments)
+        await asyncio.gather(*(
+            self._migrate(components, levels, source, target, options, semaphore, result) for target in targets
+        ))
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+def _assemble(components: Dict[str, Component], translations: Dict[str, str], files: bool) -> str:
+    """Translated components in source order; files are separated by a header line with their path"""
+    ordered = sorted(components.values(), key=lambda component: (component.line, component.id))
+    if files:
+        return "\n".join(f"// ===== {component.id} =====\n{translations[component.id]}" for component in ordered)
+    return "\n\n".join(translations[component.id].strip("\n") for component in ordered) + "\n"
+
+
+async def _load_repository(request: MigrationRequest, temp_dir: str) -> Tuple[Dict[str, str], List[Dict], Imports, str]:
+    """Check out the repository and return (file contents, functions, imports, commit) of its code folder"""
+    clone_url = authenticated_url(request.git_url, request.auth_token)
+    remote_commit = await resolve_remote_head(clone_url)
+    code_path = source_path(temp_dir, request.code_folder or "")
+    source = await fetch_source(request.git_url, clone_url, remote_commit, request.code_folder or "", temp_dir)
+    source.release()  # Only the exported files are read
+    paths = list(discover_files(code_path, source_extensions(request.language or request.source_framework),
+                                EXCLUDED_DIRS))
+    if len(paths) > MIGRATION_MAX_FILES:
+        raise AnalysisError(f"Repository has {len(paths)} source files, more than the {MIGRATION_MAX_FILES} "
+                            f"that can be migrated at once; narrow code_folder", status_code=400)
+
+    def analyze() -> Tuple[Dict[str, str], List[Dict], Imports]:
+        files, functions, imports = {}, [], {}
+        functions_cache = get_cache("functions")
+        for result in analyze_files(((path, file_path, None) for path, file_path in paths),
+                                    functions_cache.root, ANALYSIS_CACHE_VERSION):
+            if result.error is not None:
+                logger.warning(f"Error processing {result.path}: {result.error}")
+                continue
+            if not result.cached:
+                functions_cache.set(cache_key("functions", ANALYSIS_CACHE_VERSION, result.hash),
+                                    {"functions": result.functions, "imports": result.imports})
+            functions.extend(result.functions)
+            imports[result.path] = result.imports
+        for path, file_path in paths:
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                files[path] = f.read()
+        return files, functions, imports
+
+    files, functions, imports = await run_blocking(analyze)
+    return files, functions, imports, source.commit
+
+
+async def run_migration(request: MigrationRequest) -> Dict:
+    """Translate source_code, or the code folder of git_url, to every target framework.
+
+    Returns the MigrationResponse fields, plus the translation of every file for
+    repositories, the dependency levels and statistics.
+    """
+    targets = [target for target in request.target_frameworks if target.strip()]
+    if not targets:
+        raise AnalysisError("target_frameworks must not be empty", status_code=400)
+    if bool(request.source_code) == bool(request.git_url):
+        raise AnalysisError("Provide either source_code or git_url", status_code=400)
+
+    commit = None
+    started = time.perf_counter()
+    if request.source_code:
+        filename = request.filename or "component" + FRAMEWORK_EXTENSIONS.get(request.source_framework.lower(), ".js")
+        components = await run_blocking(components_from_source, request.source_code, filename)
+    else:
+        async with limiter:
+            temp_dir = tempfile.mkdtemp()
+            try:
+                files, functions, imports, commit = await _load_repository(request, temp_dir)
+            except subprocess.CalledProcessError as e:
+                raise AnalysisError(f"Repository processing failed: {str(e)}")
+            finally:
+                await run_blocking(shutil.rmtree, temp_dir, ignore_errors=True)
+        if not files:
+            raise AnalysisError("No source files found in the code folder", status_code=400)
+        components = await run_blocking(components_from_files, files, functions, imports)
+    levels, cycles = await run_blocking(dependency_levels, components)
+    analysis_sec = time.perf_counter() - started
+    logger.info(f"Migrating {len(components)} components in {len(levels)} levels to {', '.join(targets)}")
+
+    engine = MigrationEngine(llm_clients.chat_model(MIGRATION_MODEL), get_cache("translations"))
+    result = await engine.run(components, levels, request.source_framework, targets,
+                              request.preserve_structure, request.include_comments)
+    warnings = [f"Dependency cycle translated without each other's translations: {', '.join(cycle)}"
+                for cycle in cycles] + result.warnings
+    response = {
+        "translated_code": {target: _assemble(components, result.translations[target], bool(request.git_url))
+                            for target in result.translations},
+        "dependency_changes": result.dependency_changes(),
+        "warnings": warnings,
+        "confidence_score": result.confidence,
+        "levels": levels,
+        "stats": dict(result.stats(), analysis_sec=round(analysis_sec, 3), commit=commit),
+    }
+    if request.git_url:
+        response["translated_files"] = result.translations
+    return response
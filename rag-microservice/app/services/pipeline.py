@@ -0,0 +1,441 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from langchain_community.vectorstores import FAISS
+from app.models.schemas import PlantUMLTreeRequest
+from app.services.analysis import CodeAnalyzer
+from app.services.build import build_project
+from app.services.call_graph import CallGraph
+from app.services.chunking import file_summary, span_label
+from app.services import llm_clients
+from app.services.embeddings import embedding_id
+from app.services.cache import get_cache, cache_key, content_hash
+from app.services.metrics import ANALYSES, ANALYSES_ACTIVE, ANALYSES_QUEUED, CACHE_REQUESTS, FILES, FUNCTIONS
+from app.services.progress import Progress
+from app.services.refinement import REFINE_MODEL, RefinementEngine, plan_refinement
+from app.services.static_analysis import analyze_files, discover_files
+from app.services.summarizer import SummarizationPipeline, SummaryJob, Chunk
+from app.services.repo_state import RepoState, RepoStateStore, repo_state_key
+from app.services.search_index import export_vector_store, search_index_key, search_indexes
+from app.services.git_mirror import SourceCheckout, fetch_source, normalize_folder
+from app.utils.git import authenticated_url, resolve_remote_head, changed_files
+from app.utils.process import run_blocking
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction, summarization or diagram generation changes so stale cache entries are ignored
+ANALYSIS_CACHE_VERSION = 5
+SUMMARY_MODEL = "gpt-3.5-turbo"
+
+# Analyses allowed to run at once in this worker, and how many more may wait for a slot
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "4"))
+ANALYSIS_MAX_QUEUED = int(os.getenv("ANALYSIS_MAX_QUEUED", "32"))
+
+JS_LANGUAGES = ["js", "javascript", "ts", "typescript", "node", "nextjs"]
+EXCLUDED_DIRS = {"node_modules", ".next", "dist", "build", ".git", "__pycache__", ".venv", "venv"}
+
+class AnalysisError(Exception):
+    """An analysis failure that maps to an HTTP error response"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class AnalysisLimiter:
+    """Bounds concurrent analyses per worker; excess requests queue, and are rejected once the queue is full"""
+
+    def __init__(self, limit: int, max_queued: int):
+        self.limit = max(1, limit)
+        self.max_queued = max_queued
+        self.active = 0
+        self.queued = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            raise AnalysisError("Analysis queue is full, retry later", status_code=503)
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        self.active += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.active -= 1
+        self._semaphore.release()
+
+
+limiter = AnalysisLimiter(ANALYSIS_CONCURRENCY, ANALYSIS_MAX_QUEUED)
+ANALYSES_ACTIVE.set_function(lambda: limiter.active)
+ANALYSES_QUEUED.set_function(lambda: limiter.queued)
+
+
+def source_extensions(language: str) -> List[str]:
+    """File extensions analyzed for a request language"""
+    return {
+        "python": [".py"],
+        "javascript": [".js", ".jsx"],
+        "typescript": [".ts", ".tsx"],
+        "nextjs": [".js", ".jsx", ".ts", ".tsx"]
+    }.get(language.lower(), [".js", ".ts", ".jsx", ".tsx", ".py"])
+
+
+def source_path(temp_dir: str, code_folder: str) -> str:
+    """Directory of code_folder in a checkout under temp_dir, resolved like the fetched pathspec"""
+    folder = normalize_folder(code_folder)
+    if folder == ".." or folder.startswith("../"):
+        raise AnalysisError("code_folder must be inside the repository", status_code=400)
+    return os.path.join(temp_dir, folder)
+
+
+def result_key(request: PlantUMLTreeRequest, commit: str) -> str:
+    return cache_key("result", ANALYSIS_CACHE_VERSION, commit, request.code_folder,
+                     request.language.lower(), request.max_depth, request.include_external)
+
+
+def cached_result(request: PlantUMLTreeRequest, commit: Optional[str]) -> Optional[Dict]:
+    if not request.use_cache or not commit:
+        return None
+    cached = get_cache("results").get(result_key(request, commit))
+    if cached is None:
+        return None
+    logger.info(f"Result cache hit for commit {commit}")
+    cached["metadata"]["cached"] = True
+    return cached
+
+
+def summary_prompt(code: str, relative_path: str, span: str) -> str:
+    return f"""
+Summarize the following code for semantic search and retrieval. Focus on describing its purpose, key functions, and relationships. Be concise and accurate.\n\nFile: {relative_path}\nDefinition: {span}\n\nCode:\n{code}\n"""
+
+
+def summary_key(prompt: str) -> str:
+    return cache_key("chunk-summary", SUMMARY_MODEL, content_hash(prompt))
+
+
+def extract_files(request: PlantUMLTreeRequest, code_path: str, commit: str, previous: Optional[RepoState],
+                  changed: Optional[Set[str]], progress: Progress
+                  ) -> Tuple[RepoState, Set[str], List[Chunk], List[SummaryJob], Dict[str, Dict]]:
+    """Walk the code folder, run static analysis on new or changed files and chunk them (blocking).
+
+    Files are parsed and chunked in batches across the static analysis process
+    pool while discovery continues; results are merged in discovery order.
+    Returns the new state, the set of files that differ from `previous`, the
+    code chunks of those files, summary jobs for their spans that need one
+    (already answered from the summary cache where possible) and the metadata
+    of each summary by job key.
+    """
+    file_extensions = source_extensions(request.language)
+    functions_cache = get_cache("functions")
+    summary_cache = get_cache("summaries")
+    entries = {}
+    order = []  # Discovery order, so the state does not depend on which worker finished first
+    stale_files = set()  # Files whose vectors differ from the previous state
+    chunks = []
+    summary_jobs = []
+    summary_metadata = {}
+
+    def tasks():
+        for relative_path, file_path in discover_files(code_path, file_extensions, EXCLUDED_DIRS):
+            order.append(relative_path)
+            entry = previous.files.get(relative_path) if previous else None
+            # Entries saved without a hash (their summaries failed) are analyzed again even if unchanged
+            if entry is not None and entry["hash"] and changed is not None and relative_path not in changed:
+                # Unchanged according to git: reuse without reading the file
+                entries[relative_path] = entry
+                FILES.labels(result="unchanged").inc()
+                progress.add(files_parsed=1)
+                continue
+            yield relative_path, file_path, entry["hash"] if entry else None
+
+    functions_root = functions_cache.root if request.use_cache else None
+    for result in analyze_files(tasks(), functions_root, ANALYSIS_CACHE_VERSION):
+        relative_path = result.path
+        if result.error is not None:
+            logger.warning(f"Error processing {relative_path}: {result.error}")
+            FILES.labels(result="failed").inc()
+            continue
+        if result.functions is None:
+            # Same content as the previous analysis
+            entries[relative_path] = previous.files[relative_path]
+            FILES.labels(result="unchanged").inc()
+        else:
+            FILES.labels(result="cached" if result.cached else "parsed").inc()
+            if functions_root:
+                CACHE_REQUESTS.labels(cache="functions", result="hit" if result.cached else "miss").inc()
+            functions_key = cache_key("functions", ANALYSIS_CACHE_VERSION, result.hash)
+            if result.cached:
+                functions_cache.touch(functions_key)
+            else:
+                functions_cache.set(functions_key, {"functions": result.functions, "imports": result.imports})
+            entries[relative_path] = {"hash": result.hash, "functions": result.functions, "imports": result.imports}
+            stale_files.add(relative_path)
+            chunks.extend(result.chunks)
+            for job_key, metadata, code in result.pending_summaries:
+                prompt = summary_prompt(code, relative_path, span_label(metadata))
+                summary = summary_cache.get(summary_key(prompt)) if request.use_cache else None
+                summary_jobs.append(SummaryJob(job_key, prompt=None if summary is not None else prompt, summary=summary))
+                summary_metadata[job_key] = metadata
+        progress.add(files_parsed=1)
+
+    state = RepoState(commit, {path: entries[path] for path in order if path in entries}, ANALYSIS_CACHE_VERSION)
+    return state, stale_files, chunks, summary_jobs, summary_metadata
+
+
+def load_vector_store(index_dir: Optional[str], embeddings) -> Optional[FAISS]:
+    if not index_dir:
+        return None
+    try:
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    except Exception as e:
+        logger.warning(f"Could not load previous FAISS index, rebuilding: {e}")
+        return None
+
+
+def remove_vectors(vector_store: FAISS, doc_ids: List[str]):
+    indexed_ids = set(vector_store.index_to_docstore_id.values())
+    obsolete_ids = [doc_id for doc_id in doc_ids if doc_id in indexed_ids]
+    if obsolete_ids:
+        vector_store.delete(obsolete_ids)
+
+
+def store_vectors(vector_store: Optional[FAISS], embeddings, chunks: List[Chunk], vectors: List[List[float]]) -> FAISS:
+    """Create or extend the vector store from precomputed embeddings"""
+    text_embeddings = [(text, vector) for (_, text, _), vector in zip(chunks, vectors)]
+    chunk_metadata = [metadata for _, _, metadata in chunks]
+    chunk_ids = [doc_id for doc_id, _, _ in chunks]
+    if vector_store is None:
+        return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=chunk_metadata, ids=chunk_ids)
+    if text_embeddings:
+        vector_store.add_embeddings(text_embeddings, metadatas=chunk_metadata, ids=chunk_ids)
+    return vector_store
+
+
+def publish_search_index(request: PlantUMLTreeRequest, commit: str, vector_store: FAISS):
+    """Schedule replacing the repository's /search index with the vectors of this analysis (blocking).
+
+    The index is rebuilt in the background; the analysis result does not depend on it.
+    """
+    space = embedding_id()
+    key = search_index_key(request.git_url, request.code_folder, request.language, space)
+    _, live = search_indexes.current(key)
+    if live and live["commit"] == commit and live["count"] == vector_store.index.ntotal:
+        return
+    info = {"repo": request.git_url, "code_folder": request.code_folder, "language": request.language.lower(),
+            "commit": commit, "embedding": space}
+
+    def publish():
+        vectors, docs = export_vector_store(vector_store)
+        search_indexes.publish(key, info, vectors, docs)
+
+    search_indexes.schedule(key, publish)
+
+
+def build_call_graph(state: RepoState) -> CallGraph:
+    functions = [func for entry in state.files.values() for func in entry["functions"]]
+    return CallGraph(functions, {path: entry.get("imports", {}) for path, entry in state.files.items()})
+
+
+def stage_timings(progress: Progress, total: float) -> Dict[str, float]:
+    timings = {name: stage["elapsed_sec"] for name, stage in progress.snapshot()["stages"].items()}
+    timings["total_sec"] = round(total, 3)
+    return timings
+
+
+async def analyze_repository(request: PlantUMLTreeRequest, progress: Optional[Progress] = None) -> Dict:
+    """Run the full clone -> extract -> summarize -> embed -> refine pipeline and return the response body.
+
+    Subprocesses run through asyncio and blocking work through a thread pool, so
+    the event loop keeps serving other requests while an analysis is running.
+    Stage timings and counters are reported through `progress` when given, and
+    added to the response metadata when the request sets include_timings.
+    """
+    progress = progress or Progress()
+    started = time.perf_counter()
+    try:
+        result = await _analyze_or_reuse(request, progress)
+    except Exception:
+        ANALYSES.labels(outcome="failed").inc()
+        raise
+    ANALYSES.labels(outcome="cached" if result["metadata"]["cached"] else "computed").inc()
+    timings = stage_timings(progress, time.perf_counter() - started)
+    logger.info(f"Analysis timings for {request.git_url}: {json.dumps(timings)}")
+    if request.include_timings:
+        result["metadata"]["timings"] = timings
+    return result
+
+
+async def _analyze_or_reuse(request: PlantUMLTreeRequest, progress: Progress) -> Dict:
+    # Step 1: Resolve the commit; an unchanged repository is answered from the result cache
+    clone_url = authenticated_url(request.git_url, request.auth_token)
+    with progress.stage("resolve"):
+        remote_commit = await resolve_remote_head(clone_url)
+        hit = cached_result(request, remote_commit)
+    if hit:
+        return hit
+
+    async with limiter:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            return await _analyze(request, clone_url, remote_commit, temp_dir, progress)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Git/Build error: {e}")
+            raise AnalysisError(f"Repository processing failed: {str(e)}")
+        finally:
+            # Cleanup
+            await run_blocking(shutil.rmtree, temp_dir, ignore_errors=True)
+
+
+async def _analyze(request: PlantUMLTreeRequest, clone_url: str, remote_commit: Optional[str], temp_dir: str,
+                   progress: Progress) -> Dict:
+    code_path = source_path(temp_dir, request.code_folder)
+    logger.info(f"Fetching repository: {request.git_url}")
+    with progress.stage("fetch"):
+        source = await fetch_source(request.git_url, clone_url, remote_commit, request.code_folder, temp_dir)
+    try:
+        return await _analyze_source(request, source, remote_commit, temp_dir, code_path, progress)
+    finally:
+        # The mirror is kept from eviction while its history is diffed
+        source.release()
+
+
+async def _analyze_source(request: PlantUMLTreeRequest, source: SourceCheckout, remote_commit: Optional[str],
+                          temp_dir: str, code_path: str, progress: Progress) -> Dict:
+    state_store = RepoStateStore(get_cache("repos"))
+    commit = source.commit
+    if remote_commit is None:
+        hit = cached_result(request, commit)
+        if hit:
+            return hit
+
+    # Step 2: Build project if requested (static analysis only reads sources, so this is opt-in)
+    if request.build_project and request.language.lower() in JS_LANGUAGES:
+        with progress.stage("build"):
+            await build_project(code_path)
+
+    # Step 3: Extract, analyze and chunk code, reusing per-file state and vectors from the last analyzed commit
+    embeddings = llm_clients.embeddings()
+    repo_key = repo_state_key(request.git_url, request.code_folder, request.language, embedding_id())
+    with progress.stage("index_load"):
+        previous, previous_index = None, None
+        if request.use_cache:
+            previous, previous_index = await run_blocking(state_store.load, repo_key, ANALYSIS_CACHE_VERSION)
+        vector_store = await run_blocking(load_vector_store, previous_index, embeddings) if previous else None
+        if vector_store is None:
+            # Chunks of unchanged files only live in the index, so without it every file is re-chunked
+            previous = None
+
+    logger.info("Extracting and analyzing code files")
+    with progress.stage("extract"):
+        changed = None
+        if previous and previous.commit:
+            changed = await changed_files(source.repo_dir, previous.commit, commit)
+            if changed is not None:
+                changed = {os.path.relpath(os.path.join(temp_dir, path), code_path) for path in changed}
+        state, stale_files, chunks, summary_jobs, summary_metadata = await run_blocking(
+            extract_files, request, code_path, commit, previous, changed, progress
+        )
+
+    removed_files = set(previous.files) - set(state.files) if previous else set()
+    if previous:
+        logger.info(f"Incremental analysis: {len(stale_files)} changed, {len(removed_files)} removed "
+                    f"since commit {previous.commit}")
+        # Drop vectors of changed/removed files; only the changed ones are embedded again
+        await run_blocking(remove_vectors, vector_store, previous.doc_ids(stale_files | removed_files))
+
+    if not any(entry["functions"] for entry in state.files.values()):
+        raise AnalysisError("No functions found in the codebase", status_code=400)
+
+    # Step 4: Embed code chunks directly; summarize only the spans too large to embed whole
+    logger.info(f"Embedding {len(chunks)} code chunks, summarizing {len(summary_jobs)} large spans")
+
+    def chunk_summary(job_key: str, summary: str) -> List[Chunk]:
+        metadata = summary_metadata[job_key]
+        header = f"{metadata['file']} | summary of {metadata['kind']} {span_label(metadata)} | " \
+                 f"lines {metadata['start_line']}-{metadata['end_line']}"
+        return [(job_key, f"{header}\n{summary}", metadata)]
+
+    # LLM for code summarization before embedding
+    pipeline = SummarizationPipeline(llm_clients.chat_model(SUMMARY_MODEL), embeddings, chunk_summary)
+    with progress.stage("summarize"):
+        summarization = await pipeline.run(summary_jobs, progress, chunks)
+    summary_cache = get_cache("summaries")
+    span_summaries = {}
+    for job in summary_jobs:
+        summary = summarization.summaries.get(job.key)
+        if summary is None:
+            continue
+        if job.prompt is not None:
+            summary_cache.set(summary_key(job.prompt), summary)
+        metadata = summary_metadata[job.key]
+        span_summaries.setdefault(metadata["file"], []).append((metadata, summary))
+
+    # Files missing a summary are re-analyzed by the next request instead of being reused as they are
+    incomplete_files = {summary_metadata[job_key]["file"] for job_key in summarization.errors}
+    if incomplete_files:
+        logger.warning(f"Summarization failed for {len(incomplete_files)} files, they are not cached")
+
+    doc_ids = {}
+    for doc_id, _, metadata in summarization.chunks:
+        doc_ids.setdefault(metadata["file"], []).append(doc_id)
+    for path in stale_files:
+        entry = state.files[path]
+        state.files[path] = dict(entry, summary=file_summary(entry["functions"], span_summaries.get(path, [])),
+                                 doc_ids=doc_ids.get(path, []))
+        if path in incomplete_files:
+            # Keep the doc ids so the vectors of the file are replaced next time
+            state.files[path]["hash"] = None
+
+    with progress.stage("index"):
+        vector_store = await run_blocking(store_vectors, vector_store, embeddings, summarization.chunks, summarization.vectors)
+        await run_blocking(state_store.save, repo_key, state, vector_store, temp_dir)
+        await run_blocking(publish_search_index, request, commit, vector_store)
+
+    all_functions = [func for entry in state.files.values() for func in entry["functions"]]
+    summaries = {path: entry["summary"] for path, entry in state.files.items()}
+
+    # Step 5: Build the call graph and split it into token-budgeted partitions
+    logger.info("Building function call graph")
+    with progress.stage("tree"):
+        graph = await run_blocking(build_call_graph, state)
+        plan = await run_blocking(plan_refinement, graph, summaries, request.max_depth)
+
+    # Step 6: LLM Enhancement (each partition's structure + semantic context, refined concurrently)
+    logger.info(f"Refining {len(plan.partitions)} call graph partitions with LLM analysis")
+    with progress.stage("refine"):
+        refinement = await RefinementEngine(llm_clients.chat_model(REFINE_MODEL)).run(plan, progress)
+    enhanced_plantuml = refinement.plantuml
+    # Post-process to fix common issues
+    enhanced_plantuml = CodeAnalyzer.post_process_plantuml(enhanced_plantuml, all_functions)
+    logger.info("Analysis complete")
+    result = {
+        "plantuml": enhanced_plantuml,
+        "metadata": {
+            "total_functions": len(all_functions),
+            "total_files": len(state.files),
+            "language": request.language,
+            "entry_points": len(graph.entry_points),
+            "commit": commit,
+            "cached": False,
+            "incremental": previous is not None,
+            "changed_files": len(stale_files) + len(removed_files),
+            "summarization": summarization.stats(),
+            "refinement": refinement.stats()
+        }
+    }
+    FUNCTIONS.inc(len(all_functions))
+    if not incomplete_files:
+        await run_blocking(get_cache("results").set, result_key(request, commit), result)
+    return result
@@ -0,0 +1,59 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+from app.services.metrics import STAGE_SECONDS
+
+
+class Progress:
+    """Stage timings and counters for one analysis run.
+
+    Safe to update from worker threads; `listener` is called after every change
+    (from whichever thread made it) so subscribers can push updates to clients.
+    Stage durations are also recorded in the process-wide stage histogram.
+    """
+
+    def __init__(self, listener: Optional[Callable[[], None]] = None):
+        self.listener = listener
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _notify(self):
+        if self.listener:
+            self.listener()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage, recording it as running, done or failed"""
+        started = time.perf_counter()
+        with self._lock:
+            self.stages[name] = {"status": "running", "elapsed_sec": 0.0}
+        self._notify()
+        status = "failed"
+        try:
+            yield
+            status = "done"
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stages[name] = {"status": status, "elapsed_sec": round(elapsed, 3)}
+            STAGE_SECONDS.labels(stage=name, status=status).observe(elapsed)
+            self._notify()
+
+    def add(self, **counters: float):
+        """Increment counters, e.g. progress.add(files_parsed=1)"""
+        with self._lock:
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+        self._notify()
+
+    def set(self, **counters: float):
+        with self._lock:
+            self.counters.update(counters)
+        self._notify()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {"stages": {name: dict(stage) for name, stage in self.stages.items()},
+                    "counters": dict(self.counters)}
@@ -0,0 +1,332 @@
+import asyncio
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+from langchain.prompts import PromptTemplate
+from app.services.analysis import PlantUMLGenerator
+from app.services.call_graph import CallGraph
+from app.services.metrics import LLM_CALL_SECONDS, LLM_CALLS, LLM_RETRIES, LLM_TOKENS
+from app.services.progress import Progress
+from app.services.summarizer import with_retries
+from app.utils.tokens import count_tokens
+import logging
+
+logger = logging.getLogger(__name__)
+
+REFINE_MODEL = os.getenv("REFINE_MODEL", "gpt-4o")
+# Prompt tokens allowed per partition: instructions, diagram fragment and file summaries
+REFINE_PROMPT_TOKENS = int(os.getenv("REFINE_PROMPT_TOKENS", "12000"))
+REFINE_CONCURRENCY = int(os.getenv("REFINE_CONCURRENCY", "8"))
+REFINE_MAX_RETRIES = int(os.getenv("REFINE_MAX_RETRIES", "3"))
+LABEL_PROPAGATION_ROUNDS = 10
+
+RELATION = re.compile(r"\s(-->|\.\.>|o-->|->)\s")
+
+PARTITION_PROMPT = PromptTemplate(
+    template="""
+You are an expert software architect. Your task is to refine part {part} of {parts} of a PlantUML call graph so that it accurately represents ONLY the real, code-based relationships (calls, uses, imports, data flow) between the functions, components, hooks, utilities, and APIs in this part of the codebase.
+
+Inputs:
+- PlantUML fragment for this part: {fragment}
+- Elements declared in other parts that this part uses: {external}
+- Semantic code summaries of the files in this part: {summaries}
+
+Instructions:
+- Focus on actual relationships: function calls, component usage, hook invocation, utility usage, API handler connections, and data flow as found in the code and context.
+- Do NOT invent or hallucinate any relationships. Only include what is supported by the code or summaries.
+- Keep every element alias exactly as given, and do not declare the elements from other parts; only reference them in relationships.
+- Use PlantUML syntax: @startuml ... @enduml, with --> for calls/uses, ..> for data flow, o--> for optional.
+- Group by file/module if possible, but prioritize showing relationships.
+- Output only the PlantUML diagram for this part, no extra explanation.
+""",
+    input_variables=["part", "parts", "fragment", "external", "summaries"]
+)
+
+
+class Partition:
+    """Files whose part of the call graph is refined together in one LLM call"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.files: List[str] = []
+        self.cost = 0  # Packing estimate: fragment plus summaries of the files
+        self.initial = ""  # Static diagram fragment, also the fallback when refinement fails
+        self.prompt: Optional[str] = None  # None when even the bare fragment exceeds the budget
+        self.prompt_tokens = 0
+        self.dropped_summaries = 0
+
+
+class RefinementPlan:
+    """Token-budgeted partitions of a call graph with their prompts and static fragments"""
+
+    def __init__(self, partitions: List[Partition], budget: int):
+        self.partitions = partitions
+        self.budget = budget
+
+    def initial_plantuml(self) -> str:
+        return merge_fragments([partition.initial for partition in self.partitions])
+
+
+def _communities(files: List[str], weights: Dict[Tuple[int, int], int]) -> List[List[str]]:
+    """Group files by deterministic label propagation over the file-level call graph"""
+    neighbors: List[Dict[int, int]] = [{} for _ in files]
+    for (a, b), weight in weights.items():
+        neighbors[a][b] = neighbors[a].get(b, 0) + weight
+        neighbors[b][a] = neighbors[b].get(a, 0) + weight
+    labels = list(range(len(files)))
+    for _ in range(LABEL_PROPAGATION_ROUNDS):
+        changed = False
+        for f in range(len(files)):
+            if not neighbors[f]:
+                continue
+            scores: Dict[int, int] = {}
+            for g, weight in neighbors[f].items():
+                scores[labels[g]] = scores.get(labels[g], 0) + weight
+            # Heaviest neighbouring label wins; ties go to the smallest label so the result is stable
+            best = min(scores, key=lambda label: (-scores[label], label))
+            if best != labels[f]:
+                labels[f] = best
+                changed = True
+        if not changed:
+            break
+    groups: Dict[int, List[str]] = {}
+    for f, label in enumerate(labels):
+        groups.setdefault(label, []).append(files[f])
+    return list(groups.values())
+
+
+def plan_refinement(graph: CallGraph, summaries: Dict[str, Optional[str]], max_depth: int,
+                    budget: int = REFINE_PROMPT_TOKENS, model: str = REFINE_MODEL) -> RefinementPlan:
+    """Partition the call graph into communities of files that each fit the prompt token budget (blocking)"""
+    files: List[str] = []
+    file_nodes: Dict[str, List[int]] = {}
+    for i, func in enumerate(graph.functions):
+        if func["file"] not in file_nodes:
+            files.append(func["file"])
+            file_nodes[func["file"]] = []
+        file_nodes[func["file"]].append(i)
+    file_index = {file: f for f, file in enumerate(files)}
+
+    file_edges: Dict[str, List[Tuple[int, int]]] = {file: [] for file in files}
+    weights: Dict[Tuple[int, int], int] = {}
+    for caller, callee in graph.edges(max_depth):
+        source, target = file_index[graph.functions[caller]["file"]], file_index[graph.functions[callee]["file"]]
+        file_edges[files[source]].append((caller, callee))
+        if source != target:
+            pair = (min(source, target), max(source, target))
+            weights[pair] = weights.get(pair, 0) + 1
+
+    def summary_line(file: str) -> str:
+        return f"{file}: {summaries[file]}" if summaries.get(file) else ""
+
+    costs = {}
+    for file in files:
+        lines = PlantUMLGenerator.declaration_lines(graph, file_nodes[file])
+        lines.extend(PlantUMLGenerator.edge_lines(graph, file_edges[file]))
+        costs[file] = count_tokens("\n".join(lines), model) + count_tokens(summary_line(file), model)
+
+    instructions = count_tokens(PARTITION_PROMPT.format(part="", parts="", fragment="", external="", summaries=""), model)
+    # Leave room for the list of elements referenced in other partitions
+    capacity = max(1, int((budget - instructions) * 0.9))
+    partitions: List[Partition] = []
+
+    def place(group: List[str], cost: int):
+        if not partitions or (partitions[-1].files and partitions[-1].cost + cost > capacity):
+            partitions.append(Partition(len(partitions)))
+        partitions[-1].files.extend(group)
+        partitions[-1].cost += cost
+
+    for community in _communities(files, weights):
+        cost = sum(costs[file] for file in community)
+        if cost <= capacity:
+            place(community, cost)
+        else:
+            for file in community:
+                place([file], costs[file])
+
+    for partition in partitions:
+        members = set(partition.files)
+        nodes = [i for file in partition.files for i in file_nodes[file]]
+        edges = [edge for file in partition.files for edge in file_edges[file]]
+        external = sorted({graph.alias(callee) for _, callee in edges if graph.functions[callee]["file"] not in members})
+        partition.initial = PlantUMLGenerator.fragment_to_plantuml(graph, nodes, edges)
+        external_text = ", ".join(external) or "none"
+        remaining = budget - instructions - count_tokens(partition.initial, model) - count_tokens(external_text, model)
+        if remaining < 0:
+            logger.info(f"Partition {partition.index} exceeds the refinement budget, keeping the static diagram")
+            continue
+        summary_lines = []
+        for file in partition.files:
+            line = summary_line(file)
+            if not line:
+                continue
+            tokens = count_tokens(line, model)
+            if tokens > remaining:
+                partition.dropped_summaries += 1
+                continue
+            remaining -= tokens
+            summary_lines.append(line)
+        partition.prompt = PARTITION_PROMPT.format(
+            part=partition.index + 1,
+            parts=len(partitions),
+            fragment=partition.initial,
+            external=external_text,
+            summaries="\n\n".join(summary_lines) or "none"
+        )
+        partition.prompt_tokens = count_tokens(partition.prompt, model)
+    return RefinementPlan(partitions, budget)
+
+
+def _body_lines(plantuml: str) -> List[str]:
+    """Lines between @startuml and @enduml without theme and skinparam settings"""
+    lines = []
+    inside = False
+    skip_block = False
+    for line in plantuml.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith("@startuml"):
+            inside = True
+            continue
+        if stripped.startswith("@enduml"):
+            break
+        if not inside:
+            continue
+        if skip_block:
+            skip_block = stripped != "}"
+            continue
+        if stripped.startswith("skinparam"):
+            skip_block = stripped.endswith("{")
+            continue
+        if stripped.startswith("!theme"):
+            continue
+        lines.append(line.rstrip())
+    return lines
+
+
+def merge_fragments(fragments: List[str]) -> str:
+    """Concatenate partition diagrams in partition order under one header, dropping repeated relationships"""
+    plantuml_lines = PlantUMLGenerator.header_lines()
+    relations = set()
+    for fragment in fragments:
+        for line in _body_lines(fragment):
+            if RELATION.search(line):
+                key = line.strip()
+                if key in relations:
+                    continue
+                relations.add(key)
+            if line or (plantuml_lines and plantuml_lines[-1]):
+                plantuml_lines.append(line)
+    plantuml_lines.append("@enduml")
+    return "\n".join(plantuml_lines)
+
+
+def _usable(refined: str, initial: str) -> bool:
+    """Reject empty answers, and answers that lost every relationship the static fragment had"""
+    body = [line for line in _body_lines(refined) if line.strip()]
+    if not body:
+        return False
+    had_relations = any(RELATION.search(line) for line in _body_lines(initial))
+    return not had_relations or any(RELATION.search(line) for line in body)
+
+
+class RefinementResult:
+    def __init__(self, plan: RefinementPlan):
+        self.plan = plan
+        self.fragments: List[str] = [partition.initial for partition in plan.partitions]
+        self.refined = 0
+        self.fallbacks = 0
+        self.llm_calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.slowest = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def plantuml(self) -> str:
+        return merge_fragments(self.fragments)
+
+    def stats(self) -> Dict:
+        partitions = self.plan.partitions
+        return {
+            "partitions": len(partitions),
+            "refined": self.refined,
+            "fallbacks": self.fallbacks,
+            "llm_calls": self.llm_calls,
+            "oversized": sum(1 for partition in partitions if partition.prompt is None),
+            "dropped_summaries": sum(partition.dropped_summaries for partition in partitions),
+            "token_budget": self.plan.budget,
+            "largest_prompt_tokens": max((partition.prompt_tokens for partition in partitions), default=0),
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "slowest_partition_sec": round(self.slowest, 3),
+            "elapsed_sec": round(self.elapsed, 3),
+        }
+
+
+class RefinementEngine:
+    """Map-reduce refinement: each partition is refined by the LLM concurrently, then merged deterministically.
+
+    Latency is bounded by the slowest partition rather than the size of the
+    repository; a partition whose call fails or returns an unusable diagram keeps
+    its static fragment.
+    """
+
+    def __init__(self, llm, concurrency: int = REFINE_CONCURRENCY, max_retries: int = REFINE_MAX_RETRIES,
+                 backoff_base: float = 1.0):
+        self.llm = llm
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+
+    async def _refine(self, partition: Partition, semaphore: asyncio.Semaphore, result: RefinementResult,
+                      progress: Optional[Progress]):
+        def count_retry():
+            result.retries += 1
+            LLM_RETRIES.labels(purpose="refine").inc()
+
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                message = await with_retries(lambda: self.llm.ainvoke(partition.prompt),
+                                             f"Refinement of partition {partition.index}",
+                                             self.max_retries, self.backoff_base, count_retry)
+            except Exception as e:
+                logger.warning(f"Refinement of partition {partition.index} failed, keeping the static diagram: {e}")
+                result.fallbacks += 1
+                return
+            finally:
+                elapsed = time.perf_counter() - started
+                result.slowest = max(result.slowest, elapsed)
+                LLM_CALL_SECONDS.labels(purpose="refine").observe(elapsed)
+        usage = getattr(message, "usage_metadata", None) or {}
+        content = message.content.strip()
+        prompt_tokens = usage.get("input_tokens") or partition.prompt_tokens
+        completion_tokens = usage.get("output_tokens") or count_tokens(content)
+        result.llm_calls += 1
+        result.prompt_tokens += prompt_tokens
+        result.completion_tokens += completion_tokens
+        LLM_CALLS.labels(purpose="refine").inc()
+        LLM_TOKENS.labels(purpose="refine", kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(purpose="refine", kind="completion").inc(completion_tokens)
+        if progress:
+            progress.add(partitions_refined=1, tokens_used=prompt_tokens + completion_tokens)
+        if _usable(content, partition.initial):
+            result.fragments[partition.index] = content
+            result.refined += 1
+        else:
+            logger.info(f"Partition {partition.index} refinement was unusable, keeping the static diagram")
+            result.fallbacks += 1
+
+    async def run(self, plan: RefinementPlan, progress: Optional[Progress] = None) -> RefinementResult:
+        result = RefinementResult(plan)
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(
+            self._refine(partition, semaphore, result, progress)
+            for partition in plan.partitions if partition.prompt is not None
+        ))
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,89 @@
+import json
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+from app.services.cache import DiskLRUCache, cache_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of state.json changes
+REPO_STATE_VERSION = 3
+
+
+def repo_state_key(git_url: str, code_folder: str, language: str, embedding_space: str) -> str:
+    """Identify the analysis state of one folder of one repository, per embedding space of its index"""
+    return cache_key("repo-state", REPO_STATE_VERSION, git_url, code_folder, language.lower(), embedding_space)
+
+
+class RepoState:
+    """Last analyzed commit of a repository plus the per-file artifacts derived from it.
+
+    ``files`` maps a path (relative to the analyzed folder) to its content hash,
+    extracted functions and imports, summary and the ids of its vectors in the
+    FAISS index. ``analysis_version`` is the version of the extractors that
+    produced the artifacts; states of another version are not reused.
+    """
+
+    def __init__(self, commit: Optional[str] = None, files: Optional[Dict[str, Dict]] = None,
+                 analysis_version: Optional[int] = None):
+        self.commit = commit
+        self.files = files or {}
+        self.analysis_version = analysis_version
+
+    def doc_ids(self, paths) -> List[str]:
+        """Return the vector ids belonging to the given files"""
+        ids = []
+        for path in paths:
+            ids.extend(self.files.get(path, {}).get("doc_ids", []))
+        return ids
+
+    def to_dict(self) -> Dict:
+        return {"version": REPO_STATE_VERSION, "analysis_version": self.analysis_version, "commit": self.commit,
+                "files": self.files}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> Optional["RepoState"]:
+        if data.get("version") != REPO_STATE_VERSION:
+            return None
+        return cls(data.get("commit"), data.get("files"), data.get("analysis_version"))
+
+
+class RepoStateStore:
+    """Persists a RepoState together with its FAISS index in a size-bounded cache"""
+
+    STATE_FILE = "state.json"
+    INDEX_DIR = "index"
+
+    def __init__(self, cache: DiskLRUCache):
+        self.cache = cache
+
+    def load(self, key: str, analysis_version: Optional[int] = None) -> Tuple[Optional[RepoState], Optional[str]]:
+        """Return the stored state and the path of its saved FAISS index, if any.
+
+        With analysis_version, a state produced by other extractors is ignored.
+        """
+        state_dir = self.cache.get_dir(key)
+        if not state_dir:
+            return None, None
+        try:
+            with open(os.path.join(state_dir, self.STATE_FILE), "r", encoding="utf-8") as f:
+                state = RepoState.from_dict(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable repository state: {e}")
+            return None, None
+        if state is not None and analysis_version is not None and state.analysis_version != analysis_version:
+            logger.info(f"Ignoring repository state from analysis version {state.analysis_version}")
+            return None, None
+        index_dir = os.path.join(state_dir, self.INDEX_DIR)
+        return state, index_dir if os.path.isdir(index_dir) else None
+
+    def save(self, key: str, state: RepoState, vector_store, work_dir: str):
+        """Write the state and index to work_dir, then move them into the cache atomically"""
+        state_dir = os.path.join(work_dir, ".repo_state")
+        shutil.rmtree(state_dir, ignore_errors=True)
+        os.makedirs(state_dir)
+        with open(os.path.join(state_dir, self.STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state.to_dict(), f)
+        vector_store.save_local(os.path.join(state_dir, self.INDEX_DIR))
+        self.cache.put_dir(key, state_dir)
@@ -0,0 +1,346 @@
+import bisect
+import fcntl
+import json
+import math
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+from app.services.cache import cache_key
+import logging
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_DIR = os.getenv("SEARCH_INDEX_DIR", "./data/search")
+# Indexes kept open (mapped) at once; the least recently searched one is closed first
+SEARCH_OPEN_INDEXES = int(os.getenv("SEARCH_OPEN_INDEXES", "32"))
+# Smaller indexes are a single inverted list, i.e. exact search
+SEARCH_IVF_MIN_VECTORS = int(os.getenv("SEARCH_IVF_MIN_VECTORS", "20000"))
+SEARCH_NPROBE = int(os.getenv("SEARCH_NPROBE", "16"))
+TRAIN_POINTS_PER_LIST = 64
+# File-filtered queries matching at most this many vectors are scored exactly from the stored matrix
+EXACT_SCAN_ROWS = 50000
+
+# Bump when the on-disk layout of a published index changes
+SEARCH_INDEX_VERSION = 1
+
+INDEX_FILE = "index.faiss"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.jsonl"
+OFFSETS_FILE = "docs.offsets.npy"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+
+
+def normalize_repo(git_url: str) -> str:
+    """Compare repositories by URL regardless of a trailing slash, `.git` suffix or case"""
+    url = git_url.strip().rstrip("/").lower()
+    return url[:-4] if url.endswith(".git") else url
+
+
+def search_index_key(git_url: str, code_folder: str, language: str, embedding_space: str) -> str:
+    return cache_key("search-index", SEARCH_INDEX_VERSION, normalize_repo(git_url), code_folder,
+                     language.lower(), embedding_space)
+
+
+def export_vector_store(vector_store) -> Tuple[np.ndarray, List[Dict]]:
+    """Vectors and per-vector documents (id, text and metadata) of a LangChain FAISS store"""
+    count = vector_store.index.ntotal
+    vectors = vector_store.index.reconstruct_n(0, count) if count else np.zeros((0, vector_store.index.d), "float32")
+    docs = []
+    for position in range(count):
+        doc_id = vector_store.index_to_docstore_id[position]
+        document = vector_store.docstore.search(doc_id)
+        docs.append(dict(document.metadata, id=doc_id, text=document.page_content))
+    return vectors, docs
+
+
+def build_index(vectors: np.ndarray, centroids: Optional[np.ndarray] = None) -> faiss.Index:
+    """Inner-product IVF index over L2-normalized vectors (cosine similarity).
+
+    IVF rather than HNSW because its inverted lists can be memory-mapped and it
+    builds in seconds; below SEARCH_IVF_MIN_VECTORS there is one list, so small
+    repositories get exact results. The centroids of the previous generation
+    are reused while their number still suits the vector count, which skips
+    k-means, the bulk of the build time.
+    """
+    count, dim = vectors.shape
+    nlist = 1 if count < SEARCH_IVF_MIN_VECTORS else int(2 * math.sqrt(count))
+    quantizer = faiss.IndexFlatIP(dim)
+    if centroids is not None and centroids.shape[1] == dim and nlist / 2 <= len(centroids) <= nlist * 2:
+        quantizer.add(centroids)
+        index = faiss.IndexIVFFlat(quantizer, dim, len(centroids), faiss.METRIC_INNER_PRODUCT)
+        index.add(vectors)
+        return index
+    index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    index.cp.min_points_per_centroid = 1  # A single list needs no real clustering
+    sample = vectors
+    if count > nlist * TRAIN_POINTS_PER_LIST:
+        rows = np.random.default_rng(0).choice(count, nlist * TRAIN_POINTS_PER_LIST, replace=False)
+        sample = vectors[np.sort(rows)]
+    index.train(sample)
+    index.add(vectors)
+    return index
+
+
+class OpenIndex:
+    """One published index: the IVF lists, vectors and document offsets are memory-mapped, documents are read on demand"""
+
+    def __init__(self, directory: str, manifest: Dict):
+        self.manifest = manifest
+        self.index = faiss.read_index(os.path.join(directory, INDEX_FILE), faiss.IO_FLAG_MMAP)
+        self.vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._docs = open(os.path.join(directory, DOCS_FILE), "rb")
+        self.files: List[str] = manifest["files"]
+        self.file_offsets: List[int] = manifest["file_offsets"]
+
+    def file_range(self, prefix: str) -> Tuple[int, int]:
+        """Vector id range of the files starting with prefix (vectors are stored sorted by file)"""
+        first = bisect.bisect_left(self.files, prefix)
+        last = first
+        while last < len(self.files) and self.files[last].startswith(prefix):
+            last += 1
+        return self.file_offsets[first], self.file_offsets[last]
+
+    def doc(self, row: int) -> Dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(os.pread(self._docs.fileno(), end - start, start))
+
+    def search(self, query: np.ndarray, top_k: int, file: Optional[str] = None) -> List[Tuple[float, Dict]]:
+        nlist = self.index.nlist
+        nprobe = min(SEARCH_NPROBE, nlist)
+        params = faiss.SearchParametersIVF(nprobe=nprobe)
+        if file:
+            start, end = self.file_range(file)
+            if start == end:
+                return []
+            if end - start <= EXACT_SCAN_ROWS:
+                scores = self.vectors[start:end] @ query[0]
+                top = np.argsort(-scores, kind="stable")[:top_k]
+                return [(float(scores[row]), self.doc(start + int(row))) for row in top]
+            # Probe proportionally more lists the fewer vectors the filter keeps
+            nprobe = min(nlist, math.ceil(nprobe * self.index.ntotal / (end - start)))
+            params = faiss.SearchParametersIVF(nprobe=nprobe, sel=faiss.IDSelectorRange(start, end))
+        scores, rows = self.index.search(query, top_k, params=params)
+        return [(float(score), self.doc(int(row))) for score, row in zip(scores[0], rows[0]) if row >= 0]
+
+
+class SearchIndexStore:
+    """Published similarity-search indexes, one per repository folder, language and embedding space.
+
+    Each index lives in ``<root>/<key>/<generation>/``; ``<key>/CURRENT`` names
+    the live generation and is replaced atomically, so searches never see a
+    half-written index. Older generations are deleted on publish; mappings that
+    are still open stay valid until they are closed.
+
+    Analyses publish through `schedule`, which builds indexes one at a time on
+    a background thread: a rebuild costs O(repository) even when one file
+    changed, so it stays off the request path, and a publish still waiting for
+    its turn is replaced by a newer one for the same key.
+    """
+
+    def __init__(self, root: str = SEARCH_INDEX_DIR, max_open: int = SEARCH_OPEN_INDEXES):
+        self.root = root
+        self.max_open = max(1, max_open)
+        self._open: "OrderedDict[Tuple[str, str], OpenIndex]" = OrderedDict()
+        self._manifests: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Callable[[], None]] = {}
+        self._publisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search-publish")
+
+    @contextmanager
+    def _file_lock(self, key: str):
+        with open(os.path.join(self.root, key, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def schedule(self, key: str, job: Callable[[], None]):
+        """Run job (which publishes key) in the background, after any publish already running"""
+        with self._lock:
+            queued = key in self._pending
+            self._pending[key] = job
+        if not queued:
+            self._publisher.submit(self._run_pending, key)
+
+    def _run_pending(self, key: str):
+        with self._lock:
+            job = self._pending.pop(key)
+        try:
+            job()
+        except Exception as e:
+            logger.warning(f"Could not publish search index {key[:12]}: {e}")
+
+    def flush(self):
+        """Wait for the scheduled publishes (blocking)"""
+        self._publisher.submit(lambda: None).result()
+
+    def _centroids(self, key: str, dim: int) -> Optional[np.ndarray]:
+        """Coarse centroids of the live generation of key, if it has one of this dimension"""
+        generation, manifest = self.current(key)
+        if manifest is None or manifest["dim"] != dim:
+            return None
+        try:
+            index = faiss.read_index(os.path.join(self.root, key, generation, INDEX_FILE), faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            return None
+        return faiss.downcast_index(faiss.extract_index_ivf(index).quantizer).reconstruct_n(0, index.nlist)
+
+    def publish(self, key: str, info: Dict, vectors: np.ndarray, docs: Sequence[Dict]):
+        """Build and atomically replace the index for key (blocking).
+
+        `info` (repo, code_folder, language, commit, embedding) is stored in the
+        manifest and used for filtering; every doc needs a "file".
+        """
+        if not len(docs):
+            return
+        order = sorted(range(len(docs)), key=lambda row: (docs[row]["file"], row))
+        vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32)[order])
+        faiss.normalize_L2(vectors)
+        docs = [docs[row] for row in order]
+        files, file_offsets = [], []
+        for row, doc in enumerate(docs):
+            if not files or files[-1] != doc["file"]:
+                files.append(doc["file"])
+                file_offsets.append(row)
+        file_offsets.append(len(docs))
+        index = build_index(vectors, self._centroids(key, vectors.shape[1]))
+
+        key_dir = os.path.join(self.root, key)
+        os.makedirs(key_dir, exist_ok=True)
+        with self._file_lock(key):
+            generation = os.urandom(8).hex()
+            directory = os.path.join(key_dir, generation)
+            os.makedirs(directory)
+            faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+            np.save(os.path.join(directory, VECTORS_FILE), vectors)
+            offsets = [0]
+            with open(os.path.join(directory, DOCS_FILE), "wb") as f:
+                for doc in docs:
+                    line = json.dumps(doc).encode("utf-8") + b"\n"
+                    f.write(line)
+                    offsets.append(offsets[-1] + len(line))
+            np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+            manifest = dict(info, version=SEARCH_INDEX_VERSION, count=len(docs), dim=int(vectors.shape[1]),
+                            nlist=index.nlist, files=files, file_offsets=file_offsets)
+            with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f)
+            current = os.path.join(key_dir, CURRENT_FILE)
+            with open(current + ".tmp", "w", encoding="utf-8") as f:
+                f.write(generation)
+            os.replace(current + ".tmp", current)
+            for name in os.listdir(key_dir):
+                path = os.path.join(key_dir, name)
+                if name != generation and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Published search index {key[:12]} ({len(docs)} vectors, {index.nlist} lists)")
+
+    def _manifest(self, key: str, generation: str) -> Optional[Dict]:
+        with self._lock:
+            manifest = self._manifests.get((key, generation))
+        if manifest is None:
+            try:
+                with open(os.path.join(self.root, key, generation, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                return None
+            if manifest.get("version") != SEARCH_INDEX_VERSION:
+                return None
+            with self._lock:
+                self._manifests[(key, generation)] = manifest
+        return manifest
+
+    def current(self, key: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """Live generation and manifest of key, if it has been published"""
+        try:
+            with open(os.path.join(self.root, key, CURRENT_FILE), "r", encoding="utf-8") as f:
+                generation = f.read().strip()
+        except OSError:
+            return None, None
+        return generation, self._manifest(key, generation)
+
+    def catalog(self) -> List[Tuple[str, str, Dict]]:
+        """(key, live generation, manifest) of every published index"""
+        try:
+            keys = os.listdir(self.root)
+        except OSError:
+            return []
+        entries = []
+        for key in sorted(keys):
+            generation, manifest = self.current(key)
+            if manifest is not None:
+                entries.append((key, generation, manifest))
+        return entries
+
+    def _get(self, key: str, generation: str, manifest: Dict) -> OpenIndex:
+        with self._lock:
+            index = self._open.get((key, generation))
+            if index is not None:
+                self._open.move_to_end((key, generation))
+                return index
+        # Map outside the lock; a concurrent open of the same index just loses the race
+        index = OpenIndex(os.path.join(self.root, key, generation), manifest)
+        with self._lock:
+            index = self._open.setdefault((key, generation), index)
+            self._open.move_to_end((key, generation))
+            for stale in [k for k in self._open if k[0] == key and k[1] != generation]:
+                del self._open[stale]
+                self._manifests.pop(stale, None)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return index
+
+    def repos(self, embedding: str, repo: Optional[str] = None) -> List[str]:
+        """URLs (as analyzed) of the repositories with a published index in one embedding space (blocking)"""
+        urls = {}
+        for _, _, manifest in self.catalog():
+            if manifest["embedding"] != embedding:
+                continue
+            if repo and normalize_repo(manifest["repo"]) != normalize_repo(repo):
+                continue
+            urls.setdefault(normalize_repo(manifest["repo"]), manifest["repo"])
+        return list(urls.values())
+
+    def search(self, query: Sequence[float], embedding: str, top_k: int = 10, repo: Optional[str] = None,
+               file: Optional[str] = None, language: Optional[str] = None,
+               repos: Optional[Collection[str]] = None) -> Dict:
+        """Top matches across the published indexes of one embedding space, optionally filtered (blocking).
+
+        `repos` restricts the search to these repository URLs, e.g. the ones the
+        caller has access to.
+        """
+        vector = np.asarray([query], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        allowed = {normalize_repo(url) for url in repos} if repos is not None else None
+        matches = []
+        searched = 0
+        for key, generation, manifest in self.catalog():
+            if manifest["embedding"] != embedding or manifest["dim"] != vector.shape[1]:
+                continue
+            if repo and normalize_repo(manifest["repo"]) != normalize_repo(repo):
+                continue
+            if allowed is not None and normalize_repo(manifest["repo"]) not in allowed:
+                continue
+            if language and manifest["language"] != language.lower():
+                continue
+            searched += 1
+            for score, doc in self._get(key, generation, manifest).search(vector, top_k, file):
+                matches.append((score, manifest, doc))
+        matches.sort(key=lambda match: -match[0])
+        results = [
+            dict(doc, score=round(score, 6), repo=manifest["repo"], code_folder=manifest["code_folder"],
+                 language=manifest["language"], commit=manifest["commit"])
+            for score, manifest, doc in matches[:top_k]
+        ]
+        return {"results": results, "indexes_searched": searched}
+
+
+search_indexes = SearchIndexStore()
@@ -0,0 +1,181 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from app.services.analysis import CodeAnalyzer
+from app.services.cache import cache_key, content_hash, read_entry
+from app.services.chunking import SpanSummary, chunk_file
+from app.services.summarizer import Chunk
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Processes used for parsing (default: one per CPU); 1 runs everything inline in the calling thread
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS") or os.cpu_count() or 1)
+# Files are shipped to workers in batches bounded by count and total size
+ANALYSIS_BATCH_FILES = int(os.getenv("ANALYSIS_BATCH_FILES", "64"))
+ANALYSIS_BATCH_BYTES = int(os.getenv("ANALYSIS_BATCH_BYTES", str(4 * 1024 * 1024)))
+
+# (relative path, absolute path, hash recorded by the previous analysis or None)
+FileTask = Tuple[str, str, Optional[str]]
+
+
+class FileResult:
+    """Static analysis and chunks of one file; `functions` is None when the hash matches the previous analysis"""
+
+    __slots__ = ("path", "hash", "functions", "imports", "cached", "chunks", "pending_summaries", "error")
+
+    def __init__(self, path: str, file_hash: Optional[str] = None, functions: Optional[List[Dict]] = None,
+                 imports: Optional[Dict[str, List[str]]] = None, cached: bool = False,
+                 chunks: Optional[List[Chunk]] = None, pending_summaries: Optional[List[SpanSummary]] = None,
+                 error: Optional[str] = None):
+        self.path = path
+        self.hash = file_hash
+        self.functions = functions
+        self.imports = imports
+        self.cached = cached
+        self.chunks = chunks
+        self.pending_summaries = pending_summaries
+        self.error = error
+
+
+def discover_files(code_path: str, extensions: Iterable[str], excluded_dirs: Set[str]) -> Iterator[Tuple[str, str]]:
+    """Yield (relative path, absolute path) of source files in a deterministic (sorted) order"""
+    extensions = tuple(extensions)
+    for root, dirs, files in os.walk(code_path):
+        # Skip dependencies, build output and VCS metadata
+        dirs[:] = sorted(d for d in dirs if d not in excluded_dirs)
+        for file in sorted(files):
+            if file.endswith(extensions):
+                file_path = os.path.join(root, file)
+                yield os.path.relpath(file_path, code_path), file_path
+
+
+def analyze_batch(tasks: List[FileTask], functions_cache_root: Optional[str], cache_version: int) -> List[FileResult]:
+    """Read, hash, parse and chunk a batch of files; runs inside pool worker processes.
+
+    Workers only read the functions cache; the parent process owns writes and
+    LRU bookkeeping.
+    """
+    results = []
+    for relative_path, file_path, previous_hash in tasks:
+        try:
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
+            file_hash = content_hash(relative_path, content)
+            if file_hash == previous_hash:
+                results.append(FileResult(relative_path, file_hash))
+                continue
+            analysis = None
+            if functions_cache_root:
+                analysis = read_entry(functions_cache_root, cache_key("functions", cache_version, file_hash))
+            cached = analysis is not None
+            if cached:
+                functions, imports = analysis["functions"], analysis["imports"]
+            else:
+                functions, imports = CodeAnalyzer.analyze_file(content, relative_path)
+            chunks, pending_summaries = chunk_file(content, relative_path, functions)
+            results.append(FileResult(relative_path, file_hash, functions, imports, cached, chunks, pending_summaries))
+        except Exception as e:
+            results.append(FileResult(relative_path, error=str(e)))
+    return results
+
+
+def _batches(tasks: Iterable[FileTask], max_files: int, max_bytes: int) -> Iterator[List[FileTask]]:
+    batch, size = [], 0
+    for task in tasks:
+        try:
+            size += os.path.getsize(task[1])
+        except OSError:
+            pass
+        batch.append(task)
+        if len(batch) >= max_files or size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by all concurrent analyses in this server process"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking a process that runs an event loop and thread pools is unsafe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    """Stop the shared worker processes (they are started again on the next analysis)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def analyze_files(tasks: Iterable[FileTask], functions_cache_root: Optional[str], cache_version: int,
+                  workers: int = ANALYSIS_WORKERS, batch_files: int = ANALYSIS_BATCH_FILES,
+                  batch_bytes: int = ANALYSIS_BATCH_BYTES) -> Iterator[FileResult]:
+    """Stream static analysis results for tasks, fanning batches out over a shared process pool.
+
+    At most two batches per worker are in flight, so memory stays bounded however
+    many files are discovered. Results arrive in completion order; callers merge
+    them by path. If a worker dies the unfinished batches are analyzed inline.
+    """
+    batches = _batches(tasks, batch_files, batch_bytes)
+    first = next(batches, None)
+    second = next(batches, None) if first is not None else None
+    if workers <= 1 or second is None:
+        # Small repositories fit in one batch: starting processes would cost more than parsing
+        for batch in filter(None, (first, second)):
+            yield from analyze_batch(batch, functions_cache_root, cache_version)
+        for batch in batches:
+            yield from analyze_batch(batch, functions_cache_root, cache_version)
+        return
+    batches = itertools.chain((first, second), batches)
+
+    pool = _get_pool(workers)
+    pending: Dict[Future, List[FileTask]] = {}
+    unsent: List[List[FileTask]] = []
+    try:
+        for batch in batches:
+            unsent = [batch]
+            pending[pool.submit(analyze_batch, batch, functions_cache_root, cache_version)] = batch
+            unsent = []
+            while len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results = future.result()
+                    del pending[future]
+                    yield from results
+        while pending:
+            future = next(iter(pending))
+            results = future.result()
+            del pending[future]
+            yield from results
+    except BrokenProcessPool as e:
+        logger.warning(f"Static analysis worker pool failed, continuing inline: {e}")
+        _discard_pool(pool)
+        for batch in list(pending.values()) + unsent + list(batches):
+            yield from analyze_batch(batch, functions_cache_root, cache_version)
@@ -0,0 +1,256 @@
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.services.metrics import (EMBEDDED_CHUNKS, EMBEDDING_BATCH_SECONDS, LLM_CALL_SECONDS, LLM_CALLS,
+                                   LLM_RETRIES, LLM_TOKENS)
+from app.services.progress import Progress
+import logging
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "8"))
+SUMMARY_REQUESTS_PER_MINUTE = float(os.getenv("SUMMARY_REQUESTS_PER_MINUTE", "3000"))
+SUMMARY_TOKENS_PER_MINUTE = float(os.getenv("SUMMARY_TOKENS_PER_MINUTE", "1000000"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "5"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Embedding requests in flight at once
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+# (chunk id, text, metadata) of one vector: a code chunk or a summary
+Chunk = Tuple[str, str, Dict]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate limiting"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Async token bucket: refills at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        # Requests larger than the bucket would never fit; let them drain it instead
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+# Request timeout, conflict and rate limit; any 5xx is retried as well
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether a failed LLM or embedding call may succeed when repeated.
+
+    Rate limits, timeouts, connection failures and 5xx responses are; errors
+    such as 400 or 401 and local failures are permanent.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    import httpx  # Loaded with the LLM clients already
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    import openai
+    return isinstance(error, openai.APIConnectionError)  # Includes APITimeoutError
+
+
+async def with_retries(call, what: str, max_retries: int, backoff_base: float = 1.0,
+                       on_retry: Optional[Callable[[], None]] = None):
+    """Await call() again with jittered exponential backoff while it fails transiently, up to max_retries times"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            if attempt == max_retries or not is_transient(e):
+                raise
+            delay = backoff_base * (2 ** attempt) * (1 + random.random())
+            if on_retry:
+                on_retry()
+            logger.warning(f"{what} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+class SummaryJob:
+    """One chunk to summarize; `summary` is set up front when it is already known (cache hit)"""
+
+    def __init__(self, key: str, prompt: Optional[str] = None, summary: Optional[str] = None, embed: bool = True):
+        self.key = key
+        self.prompt = prompt
+        self.summary = summary
+        self.embed = embed
+
+
+class PipelineResult:
+    def __init__(self):
+        self.summaries: Dict[str, str] = {}
+        self.errors: Dict[str, str] = {}
+        self.chunks: List[Chunk] = []
+        self.vectors: List[List[float]] = []
+        self.llm_calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.embedding_batches = 0
+        self.embedding_sec = 0.0  # Summed over batches, which run concurrently with summarization
+        self.elapsed = 0.0
+
+    def stats(self) -> Dict:
+        elapsed = self.elapsed or 1e-9
+        tokens = self.prompt_tokens + self.completion_tokens
+        return {
+            "chunks_summarized": self.llm_calls,
+            "failed": len(self.errors),
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "embedded_chunks": len(self.chunks),
+            "embedding_batches": self.embedding_batches,
+            "embedding_sec": round(self.embedding_sec, 3),
+            "elapsed_sec": round(self.elapsed, 3),
+            "summaries_per_sec": round(self.llm_calls / elapsed, 2),
+            "tokens_per_sec": round(tokens / elapsed, 2),
+        }
+
+
+class SummarizationPipeline:
+    """Summarizes chunks concurrently under rate limits and embeds the summaries in batches as they complete.
+
+    Chunks that need no summary (code embedded as-is) can be passed to `run` and
+    are embedded in the same batches while summaries are being generated.
+
+    `llm` needs an async `ainvoke(prompt)` returning a message with `content`, and
+    `embeddings` an async `aembed_documents(texts)`; any LangChain chat model and
+    embeddings class fits, as do the offline fakes in app.services.fakes.
+    """
+
+    def __init__(self, llm, embeddings, chunker: Callable[[str, str], List[Chunk]],
+                 concurrency: int = SUMMARY_CONCURRENCY,
+                 requests_per_minute: float = SUMMARY_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = SUMMARY_TOKENS_PER_MINUTE,
+                 max_retries: int = SUMMARY_MAX_RETRIES,
+                 batch_size: int = EMBEDDING_BATCH_SIZE,
+                 embedding_concurrency: int = EMBEDDING_CONCURRENCY,
+                 backoff_base: float = 1.0):
+        self.llm = llm
+        self.embeddings = embeddings
+        self.chunker = chunker
+        self.concurrency = max(1, concurrency)
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60))
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute / 60)
+        self.max_retries = max_retries
+        self.batch_size = max(1, batch_size)
+        self.embedding_concurrency = max(1, embedding_concurrency)
+        self.backoff_base = backoff_base
+
+    async def _with_retries(self, result: PipelineResult, call, what: str, purpose: str):
+        def count_retry():
+            result.retries += 1
+            LLM_RETRIES.labels(purpose=purpose).inc()
+
+        return await with_retries(call, what, self.max_retries, self.backoff_base, count_retry)
+
+    async def _summarize(self, job: SummaryJob, semaphore: asyncio.Semaphore, result: PipelineResult,
+                         progress: Optional[Progress]) -> str:
+        async with semaphore:
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate_tokens(job.prompt))
+            with LLM_CALL_SECONDS.labels(purpose="summary").time():
+                message = await self._with_retries(result, lambda: self.llm.ainvoke(job.prompt),
+                                                   f"Summary of {job.key}", "summary")
+        result.llm_calls += 1
+        usage = getattr(message, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens") or estimate_tokens(job.prompt)
+        completion_tokens = usage.get("output_tokens") or estimate_tokens(message.content)
+        result.prompt_tokens += prompt_tokens
+        result.completion_tokens += completion_tokens
+        LLM_CALLS.labels(purpose="summary").inc()
+        LLM_TOKENS.labels(purpose="summary", kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(purpose="summary", kind="completion").inc(completion_tokens)
+        if progress:
+            progress.add(summaries_done=1, tokens_used=prompt_tokens + completion_tokens)
+        return message.content.strip()
+
+    async def _embed_worker(self, queue: asyncio.Queue, result: PipelineResult, progress: Optional[Progress]):
+        done = False
+        while not done:
+            item = await queue.get()
+            batch = []
+            # Take what is queued up to a full batch; None (one per worker) means no more chunks
+            while item is not None:
+                batch.append(item)
+                if len(batch) == self.batch_size or queue.empty():
+                    break
+                item = queue.get_nowait()
+            done = item is None
+            if not batch:
+                continue
+            texts = [text for _, text, _ in batch]
+            started = time.perf_counter()
+            vectors = await self._with_retries(
+                result, lambda: self.embeddings.aembed_documents(texts), f"Embedding batch of {len(texts)}", "embedding"
+            )
+            elapsed = time.perf_counter() - started
+            EMBEDDING_BATCH_SECONDS.observe(elapsed)
+            EMBEDDED_CHUNKS.inc(len(batch))
+            result.embedding_sec += elapsed
+            result.embedding_batches += 1
+            result.chunks.extend(batch)
+            result.vectors.extend(vectors)
+            if progress:
+                progress.add(chunks_embedded=len(batch))
+
+    async def run(self, jobs: List[SummaryJob], progress: Optional[Progress] = None,
+                  chunks: Iterable[Chunk] = ()) -> PipelineResult:
+        result = PipelineResult()
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in chunks:
+            queue.put_nowait(chunk)
+        embedders = [asyncio.create_task(self._embed_worker(queue, result, progress))
+                     for _ in range(self.embedding_concurrency)]
+
+        async def process(job: SummaryJob):
+            try:
+                summary = job.summary if job.summary is not None else await self._summarize(job, semaphore, result, progress)
+            except Exception as e:
+                logger.warning(f"Error summarizing {job.key}: {e}")
+                result.errors[job.key] = str(e)
+                return
+            result.summaries[job.key] = summary
+            if job.embed:
+                for chunk in self.chunker(job.key, summary):
+                    queue.put_nowait(chunk)
+
+        try:
+            await asyncio.gather(*(process(job) for job in jobs))
+            for _ in embedders:
+                queue.put_nowait(None)
+            await asyncio.gather(*embedders)
+        finally:
+            for embedder in embedders:
+                if not embedder.done():
+                    embedder.cancel()
+        result.elapsed = time.perf_counter() - started
+        return result
@@ -0,0 +1,167 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+VECTOR_CACHE_MAX_MB = int(os.getenv("VECTOR_CACHE_MAX_MB", "1024"))
+
+DIGEST_SIZE = 32  # sha256
+INITIAL_ROWS = 1024
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).digest()
+
+
+class VectorCache:
+    """Content-hash -> embedding cache backed by a memory-mapped float32 matrix.
+
+    `vectors-<generation>.f32` holds one row per cached text and
+    `keys-<generation>.bin` the sha256 digest of each row's text, appended only
+    after the row is written so readers never see a key without its vector.
+    Appends are serialized across processes with flock; other workers' rows are
+    picked up when the keys file grows. When the matrix would exceed max_bytes a
+    new generation starts; files are replaced rather than truncated so mappings
+    held by other workers stay valid.
+    """
+
+    def __init__(self, root: str, max_bytes: int = VECTOR_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._count = 0
+        self._keys_size = 0
+        self._generation = None
+        self._array: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._meta_path = os.path.join(root, "meta.json")
+        self._lock_path = os.path.join(root, ".lock")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.root, f"keys-{self._generation}.bin")
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.root, f"vectors-{self._generation}.f32")
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Optional[Dict]:
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _map(self):
+        rows = os.path.getsize(self._vectors_path) // (4 * self.dim)
+        self._array = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim)) if rows else None
+
+    def _sync(self):
+        """Pick up rows appended by other processes (or a reset) since the last call"""
+        meta = self._read_meta()
+        if meta is None:
+            return
+        if meta["generation"] != self._generation:
+            self._generation = meta["generation"]
+            self.dim = meta["dim"]
+            self._rows.clear()
+            self._count = self._keys_size = 0
+            self._array = None
+        try:
+            size = os.path.getsize(self._keys_path)
+        except OSError:
+            return
+        if size == self._keys_size:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_size)
+            data = f.read(size - self._keys_size)
+        for offset in range(0, len(data) - DIGEST_SIZE + 1, DIGEST_SIZE):
+            self._rows.setdefault(data[offset:offset + DIGEST_SIZE], self._count)
+            self._count += 1
+        self._keys_size += len(data) - len(data) % DIGEST_SIZE
+        if self._array is None or self._array.shape[0] < self._count:
+            self._map()
+
+    def _reset(self, dim: int):
+        old_paths = (self._keys_path, self._vectors_path) if self._generation else ()
+        generation = os.urandom(8).hex()
+        for name in (f"keys-{generation}.bin", f"vectors-{generation}.f32"):
+            with open(os.path.join(self.root, name), "wb"):
+                pass
+        with open(self._meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "generation": generation}, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+        for path in old_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._sync()
+
+    def get_many(self, digests: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for the given text digests (None for misses)"""
+        with self._lock:
+            self._sync()
+            if self._array is None:
+                return [None] * len(digests)
+            return [np.array(self._array[self._rows[d]]) if d in self._rows else None for d in digests]
+
+    def put_many(self, digests: Sequence[bytes], vectors: Sequence[Sequence[float]]):
+        """Append vectors for digests that are not cached yet"""
+        if not digests:
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._sync()
+            if self.dim != matrix.shape[1] or (self._count + len(digests)) * matrix.shape[1] * 4 > self.max_bytes:
+                logger.info(f"Starting a new vector cache generation in {self.root}")
+                self._reset(matrix.shape[1])
+            new = []
+            try:
+                for digest, row in zip(digests, matrix):
+                    if digest not in self._rows:
+                        self._rows[digest] = -1  # Placeholder so duplicates within one call are written once
+                        new.append((digest, row))
+                if not new:
+                    return
+                needed = self._count + len(new)
+                capacity = self._array.shape[0] if self._array is not None else 0
+                if needed > capacity:
+                    capacity = max(needed, capacity * 2, INITIAL_ROWS)
+                    with open(self._vectors_path, "r+b") as f:
+                        f.truncate(capacity * self.dim * 4)
+                    self._map()
+                for offset, (digest, row) in enumerate(new):
+                    self._array[self._count + offset] = row
+                self._array.flush()
+                with open(self._keys_path, "ab") as f:
+                    f.write(b"".join(digest for digest, _ in new))
+            finally:
+                # Also after a failed write: a leftover placeholder would read row -1 and never be written
+                for digest, _ in new:
+                    del self._rows[digest]
+            self._sync()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._count
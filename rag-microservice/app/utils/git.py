@@ -0,0 +1,79 @@
+import os
+import re
+import subprocess
+from typing import List, Optional, Set
+from app.utils.process import run_command
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def authenticated_url(git_url: str, auth_token: Optional[str] = None) -> str:
+    """Embed an access token into an https clone URL"""
+    if auth_token:
+        return git_url.replace('https://', f'https://{auth_token}@')
+    return git_url
+
+
+_CREDENTIALS = re.compile(r"(\w+://)[^/@\s]+@")
+
+
+def redact(text: str) -> str:
+    """Mask credentials embedded in URLs (see authenticated_url) before text is logged or returned"""
+    return _CREDENTIALS.sub(r"\1***@", text)
+
+
+async def git_command(args: List[str], cwd: Optional[str] = None, remote_url: Optional[str] = None,
+                      timeout: Optional[float] = None) -> subprocess.CompletedProcess:
+    """Run a git command; remote_url is supplied as origin for this call only so credentials are never written to disk"""
+    config = ["-c", f"remote.origin.url={remote_url}"] if remote_url else []
+    # Never wait for interactive credentials: a missing or rejected token fails the command
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    try:
+        return await run_command(["git", *config, *args], cwd=cwd, timeout=timeout, env=env)
+    except subprocess.CalledProcessError as e:
+        # Errors end up in logs and responses, so they must not carry the token of the URL
+        raise subprocess.CalledProcessError(e.returncode, [redact(arg) for arg in e.cmd], redact(e.stdout or ""),
+                                            redact(e.stderr or "")) from None
+    except subprocess.TimeoutExpired as e:
+        raise subprocess.TimeoutExpired([redact(arg) for arg in e.cmd], e.timeout) from None
+
+
+async def resolve_remote_head(clone_url: str, timeout: int = 60) -> Optional[str]:
+    """Resolve the commit SHA of the remote HEAD without cloning, or None if it cannot be determined"""
+    try:
+        result = await git_command(["ls-remote", clone_url, "HEAD"], timeout=timeout)
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError) as e:
+        logger.warning(f"Could not resolve remote HEAD: {e}")
+        return None
+    for line in result.stdout.splitlines():
+        sha, _, ref = line.partition("\t")
+        if ref == "HEAD" and sha:
+            return sha
+    return None
+
+
+async def head_commit(repo_dir: str) -> str:
+    """Return the commit SHA of HEAD in a local repository (bare or not)"""
+    result = await git_command(["rev-parse", "HEAD"], cwd=repo_dir)
+    return result.stdout.strip()
+
+
+async def has_commit(repo_dir: str, commit: str) -> bool:
+    try:
+        await git_command(["cat-file", "-e", f"{commit}^{{commit}}"], cwd=repo_dir)
+    except subprocess.CalledProcessError:
+        return False
+    return True
+
+
+async def changed_files(repo_dir: str, old_commit: str, new_commit: str) -> Optional[Set[str]]:
+    """Return repo-relative paths that differ between two commits, or None if old_commit is unavailable"""
+    if old_commit == new_commit:
+        return set()
+    try:
+        result = await git_command(["diff", "--name-only", "--no-renames", old_commit, new_commit], cwd=repo_dir)
+    except subprocess.CalledProcessError as e:
+        logger.info(f"Cannot diff against {old_commit}, falling back to content hashes: {e}")
+        return None
+    return {line for line in result.stdout.splitlines() if line}
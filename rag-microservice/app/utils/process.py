@@ -0,0 +1,46 @@
+import asyncio
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Thread pool for blocking filesystem, parsing and FAISS work so the event loop stays responsive
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", str(min(32, (os.cpu_count() or 1) + 4))))
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="analysis")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable in the shared thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_pool, partial(func, *args, **kwargs))
+
+
+async def run_command(args: List[str], cwd: Optional[str] = None, timeout: Optional[float] = None,
+                      check: bool = True, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """Run a subprocess without blocking the event loop.
+
+    Mirrors ``subprocess.run(..., capture_output=True, text=True)``: raises
+    CalledProcessError when check is set and TimeoutExpired (after killing the
+    process) when the timeout elapses.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args, cwd=cwd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(args, timeout)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    stdout = stdout.decode("utf-8", errors="replace")
+    stderr = stderr.decode("utf-8", errors="replace")
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
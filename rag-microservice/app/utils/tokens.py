@@ -0,0 +1,38 @@
+import threading
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+    tiktoken = None
+
+_encodings: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    with _lock:
+        if model not in _encodings:
+            encoding = None
+            if tiktoken is not None:
+                try:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception as e:
+                    # tiktoken downloads its BPE files on first use; offline hosts fall back to the estimate
+                    logger.warning(f"Tokenizer for {model} unavailable, estimating token counts: {e}")
+            _encodings[model] = encoding
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count tokens locally with the model's tokenizer, or estimate (~4 characters per token) if unavailable"""
+    encoding = _encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,100 @@
+"""Benchmark: call graph construction and depth-limited traversal on large synthetic graphs.
+
+Functions are spread over modules that import from each other; every function
+calls a few others (same file, imported and global names). The legacy name-keyed
+implementation is quadratic in the number of functions and is only run up to
+--legacy-max.
+
+    python -m benchmarks.call_graph --functions 1000 10000 100000
+"""
+import argparse
+import random
+import time
+from app.services.analysis import PlantUMLGenerator
+from app.services.call_graph import CallGraph
+
+
+def synthetic_graph(num_functions: int, per_file: int = 20, fan_out: int = 4, seed: int = 0):
+    """Return (functions, imports) shaped like extractor output"""
+    rng = random.Random(seed)
+    num_files = max(1, num_functions // per_file)
+    functions, imports = [], {}
+    for i in range(num_functions):
+        file_index = i // per_file
+        path = f"pkg{file_index % 50}/module_{file_index}.py"
+        calls = []
+        for _ in range(fan_out):
+            kind = rng.random()
+            if kind < 0.5:
+                calls.append(f"f{file_index * per_file + rng.randrange(per_file)}")
+            else:
+                target_file = rng.randrange(num_files)
+                name = f"f{target_file * per_file + rng.randrange(per_file)}"
+                calls.append(name)
+                imports.setdefault(path, {})[name] = [f"pkg{target_file % 50}.module_{target_file}", name]
+        # Common helper names shared by many files, resolved through imports or left ambiguous
+        calls.append("helper")
+        functions.append({"name": f"f{i}", "file": path, "calls": calls, "line": i % per_file, "type": "function"})
+        if i % per_file == 0:
+            functions.append({"name": "helper", "file": path, "calls": [], "line": 0, "type": "function"})
+    return functions, imports
+
+
+def legacy_plantuml(functions, max_depth: int) -> int:
+    """The previous name-keyed build_call_tree + tree_to_plantuml lookups, for comparison"""
+    func_map = {f["name"]: f for f in functions}
+    visited = set()
+
+    def build(name, depth=0):
+        if depth >= max_depth or name in visited or name not in func_map:
+            return {}
+        visited.add(name)
+        node = {"name": name, "children": {}}
+        for call in func_map[name]["calls"]:
+            if call in func_map:
+                node["children"][call] = build(call, depth + 1)
+        return node
+
+    all_calls = set()
+    for func in functions:
+        all_calls.update(func["calls"])
+    tree = {}
+    for entry in [f["name"] for f in functions if f["name"] not in all_calls][:10]:
+        tree[entry] = build(entry)
+    # tree_to_plantuml looked every declared function up with a linear scan
+    found = sum(1 for func in functions if next((f for f in functions if f["name"] == func["name"]), None))
+    return found + len(tree)
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main(args):
+    print(f"{'functions':>10}{'edges':>10}{'build ms':>10}{'tree ms':>9}{'plantuml ms':>13}{'entries':>9}{'legacy ms':>11}")
+    for size in args.functions:
+        functions, imports = synthetic_graph(size, fan_out=args.fan_out)
+        graph, build = timed(CallGraph, functions, imports)
+        tree, walk = timed(PlantUMLGenerator.build_call_tree, functions, args.max_depth, graph)
+        _, render = timed(PlantUMLGenerator.tree_to_plantuml, tree, graph)
+        legacy = "-"
+        if size <= args.legacy_max:
+            legacy = f"{timed(legacy_plantuml, functions, args.max_depth)[1] * 1000:.0f}"
+        print(f"{len(graph):>10}{graph.edge_count:>10}{build * 1000:>10.0f}{walk * 1000:>9.1f}"
+              f"{render * 1000:>13.0f}{len(graph.entry_points):>9}{legacy:>11}")
+    if args.full_walk:
+        # Traverse the whole graph from every entry point without a depth limit
+        _, elapsed = timed(lambda: sum(1 for _ in graph.walk(graph.entry_points or [0], len(graph) + 1)))
+        print(f"full walk of {len(graph)} nodes: {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--fan-out", type=int, default=4)
+    parser.add_argument("--max-depth", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=10000)
+    parser.add_argument("--full-walk", action="store_true", help="also time an unlimited-depth walk of the largest graph")
+    main(parser.parse_args())
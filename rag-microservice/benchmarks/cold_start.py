@@ -0,0 +1,95 @@
+"""Benchmark: worker cold start and first-request latency.
+
+Each sample runs in a fresh interpreter and measures importing app.main,
+application startup (lifespan) until /health answers, and the first and
+second /plantuml-tree requests on a small local repository with the fake
+models. The first request is sent right after startup, while the background
+warm-up may still be loading the analysis modules.
+
+Client setup is measured separately with real (unused) OpenAI clients: the
+first llm_clients.chat_model()/embeddings() calls against later ones.
+
+    python -m benchmarks.cold_start --samples 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def sample(files: int) -> dict:
+    """One cold start; runs in its own process"""
+    root = tempfile.mkdtemp(prefix="bench-cold-")
+    os.environ["CACHE_DIR"] = os.path.join(root, "cache")
+    os.environ["SEARCH_INDEX_DIR"] = os.path.join(root, "search")
+    started = time.perf_counter()
+    from app.main import app
+    imported = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from benchmarks.common import make_repo, use_fake_models
+
+    use_fake_models()
+    git_url = "file://" + make_repo("python", files, root=root)
+    request = {"git_url": git_url, "language": "python", "code_folder": "src", "use_cache": False}
+    timings = {"import_sec": imported - started}
+    began = time.perf_counter()
+    with TestClient(app) as client:
+        client.get("/health").raise_for_status()
+        timings["health_sec"] = time.perf_counter() - began
+        for name in ("first_request_sec", "second_request_sec"):
+            began = time.perf_counter()
+            client.post("/plantuml-tree", json=request).raise_for_status()
+            timings[name] = time.perf_counter() - began
+    return timings
+
+
+def client_setup() -> dict:
+    """First vs. repeated client acquisition with real OpenAI clients (no network calls are made)"""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["VECTOR_CACHE"] = "false"
+    # Import up front so the timings below measure client construction only, not module loading
+    from app.services import llm_clients, pipeline  # noqa: F401 - pipeline is imported for its import time only
+    from langchain_openai import ChatOpenAI, OpenAIEmbeddings  # noqa: F401 - imported for their import time only
+    timings = {}
+    for name in ("first_clients_sec", "reused_clients_sec"):
+        began = time.perf_counter()
+        llm_clients.chat_model("gpt-3.5-turbo")
+        llm_clients.chat_model("gpt-4")
+        llm_clients.embeddings()
+        timings[name] = time.perf_counter() - began
+    return timings
+
+
+def spawn(*args: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.cold_start", *args],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True, capture_output=True, text=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    if args.child == "sample":
+        print(json.dumps(sample(args.files)))
+        return
+    if args.child == "clients":
+        print(json.dumps(client_setup()))
+        return
+    samples = [spawn("--child", "sample", "--files", str(args.files)) for _ in range(args.samples)]
+    samples += [spawn("--child", "clients") for _ in range(args.samples)]
+    for key in ("import_sec", "health_sec", "first_request_sec", "second_request_sec",
+                "first_clients_sec", "reused_clients_sec"):
+        values = [s[key] for s in samples if key in s]
+        print(f"{key:<20} median {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--child", choices=["sample", "clients"], help=argparse.SUPPRESS)
+    main(parser.parse_args())
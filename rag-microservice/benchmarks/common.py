@@ -0,0 +1,118 @@
+import os
+import random
+import subprocess
+import tempfile
+from typing import Dict, List, Set, Tuple
+from app.services import fakes, llm_clients
+
+EXTENSIONS = {"python": ".py", "javascript": ".js", "typescript": ".ts"}
+# Body lines of a "large" function: well over CHUNK_MAX_CHARS, so it is windowed and summarized
+LARGE_BODY_LINES = 200
+
+
+def git(repo_dir: str, *args: str):
+    subprocess.run(
+        ["git", "-c", "user.email=bench@example.com", "-c", "user.name=bench", *args],
+        cwd=repo_dir, check=True, capture_output=True
+    )
+
+
+def _python_module(i: int, functions: List[str], calls: Dict[str, List[Tuple[int, str]]], large: Set[str]) -> str:
+    imports = sorted({(module, name) for name in functions for module, name in calls[name] if module != i})
+    lines = [f"from module_{module} import {name}" for module, name in imports]
+    for name in functions:
+        lines += ["", "", f"def {name}(value):", f'    """Synthetic function {name}"""']
+        lines += [f"    value = value * {n} + {n}" for n in range(LARGE_BODY_LINES if name in large else 2)]
+        lines += [f"    value += {target}(value)" for _, target in calls[name]]
+        lines.append("    return value")
+    lines += ["", "", f"class Service{i}:", "    def run(self, value):", f"        return {functions[0]}(value)"]
+    return "\n".join(lines) + "\n"
+
+
+def _js_module(i: int, functions: List[str], calls: Dict[str, List[Tuple[int, str]]], large: Set[str],
+               typed: bool) -> str:
+    imports: Dict[int, Set[str]] = {}
+    for name in functions:
+        for module, target in calls[name]:
+            if module != i:
+                imports.setdefault(module, set()).add(target)
+    lines = [f"import {{ {', '.join(sorted(names))} }} from './module_{module}';" for module, names in sorted(imports.items())]
+    param, result = ("value: number", ": number") if typed else ("value", "")
+    for name in functions:
+        lines += ["", f"/** Synthetic function {name} */", f"export function {name}({param}){result} {{"]
+        lines += [f"  value = value * {n} + {n};" for n in range(LARGE_BODY_LINES if name in large else 2)]
+        lines += [f"  value += {target}(value);" for _, target in calls[name]]
+        lines += ["  return value;", "}"]
+    lines += ["", f"export class Service{i} {{", f"  run({param}){result} {{", f"    return {functions[0]}(value);",
+              "  }", "}"]
+    return "\n".join(lines) + "\n"
+
+
+def make_repo(language: str, num_files: int, functions_per_file: int = 2, fan_out: int = 1, large_every: int = 0,
+              root: str = None, seed: int = 0) -> str:
+    """Create a bare git repository of num_files inter-calling modules and return its path.
+
+    language is "python", "javascript" or "typescript". Every function calls
+    fan_out others, the first in the next module and the rest picked at random
+    (imported when they live in another module). Every large_every-th function
+    gets a body long enough to be split into several chunks and summarized.
+    """
+    rng = random.Random(seed)
+    root = root or tempfile.mkdtemp(prefix="bench-")
+    work_dir = os.path.join(root, "work")
+    bare_dir = os.path.join(root, "repo.git")
+    os.makedirs(os.path.join(work_dir, "src"))
+    git(work_dir, "init", "-q")
+    names = [[f"func_{i}_{j}" for j in range(functions_per_file)] for i in range(num_files)]
+    calls: Dict[str, List[Tuple[int, str]]] = {}
+    for i in range(num_files):
+        for j, name in enumerate(names[i]):
+            targets = [((i + 1) % num_files, j)]
+            targets += [(rng.randrange(num_files), rng.randrange(functions_per_file)) for _ in range(fan_out - 1)]
+            calls[name] = [(module, names[module][index]) for module, index in targets
+                           if names[module][index] != name][:fan_out]
+    flat = [name for module in names for name in module]
+    large = set(flat[large_every - 1::large_every]) if large_every else set()
+    extension = EXTENSIONS[language]
+    for i in range(num_files):
+        if language == "python":
+            source = _python_module(i, names[i], calls, large)
+        else:
+            source = _js_module(i, names[i], calls, large, typed=language == "typescript")
+        with open(os.path.join(work_dir, "src", f"module_{i}{extension}"), "w") as f:
+            f.write(source)
+    git(work_dir, "add", ".")
+    git(work_dir, "commit", "-qm", "synthetic repository")
+    git(root, "clone", "-q", "--bare", work_dir, bare_dir)
+    git(work_dir, "remote", "add", "origin", bare_dir)
+    return bare_dir
+
+
+def make_python_repo(num_files: int, root: str = None) -> str:
+    """Create a bare git repository with num_files small, inter-calling Python modules and return its path"""
+    return make_repo("python", num_files, root=root)
+
+
+def commit_change(bare_dir: str, language: str, module: int = 0) -> str:
+    """Append a function to one module of a make_repo repository and push it; returns the changed path"""
+    work_dir = os.path.join(os.path.dirname(bare_dir), "work")
+    path = os.path.join("src", f"module_{module}{EXTENSIONS[language]}")
+    with open(os.path.join(work_dir, path), "a") as f:
+        if language == "python":
+            f.write("\n\ndef added_function(value):\n    return value + 1\n")
+        else:
+            f.write("\nexport function addedFunction(value) {\n  return value + 1;\n}\n")
+    git(work_dir, "commit", "-qam", "change one module")
+    git(work_dir, "push", "-q", "origin", "HEAD")
+    return path
+
+
+def use_fake_models(latency: float = 0.0):
+    """Route the pipeline's chat and embedding clients to the offline fakes"""
+    def chat_model(model: str, temperature: float = 0.1):
+        from app.services.refinement import REFINE_MODEL
+        # The refinement model hands back the diagram fragment it was given
+        return fakes.FakeChatModel(echo_plantuml=model == REFINE_MODEL, latency=latency)
+
+    llm_clients.chat_model = chat_model
+    llm_clients.embeddings = lambda: fakes.FakeEmbeddings(latency=latency)
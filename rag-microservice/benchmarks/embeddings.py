@@ -0,0 +1,58 @@
+"""Benchmark: embedding throughput vs. batch size, and the vector cache on a second pass.
+
+The first pass embeds every chunk through the provider; the second pass over
+the same chunks should be served from the memory-mapped vector cache.
+
+    python -m benchmarks.embeddings --provider local --chunks 2000 --batch-sizes 16 32 64 128
+    python -m benchmarks.embeddings --provider fake
+"""
+import argparse
+import tempfile
+import time
+from app.services import embeddings
+from app.services.embeddings import CachedEmbeddings, LocalEmbeddings
+from app.services.fakes import FakeEmbeddings
+from app.services.vector_cache import VectorCache
+
+
+def code_chunks(count: int) -> list:
+    """Function-sized snippets, each distinct so nothing is cached on the first pass"""
+    return [
+        f"def handler_{i}(request, db):\n    user = db.get_user(request.user_id)\n"
+        f"    items = [serialize(item) for item in db.items_for(user, limit={i % 50 + 1})]\n"
+        f"    return render('page_{i}.html', user=user, items=items)\n"
+        for i in range(count)
+    ]
+
+
+def provider(name: str, batch_size: int):
+    if name == "fake":
+        return FakeEmbeddings(size=384)
+    return LocalEmbeddings(embeddings.LOCAL_EMBEDDING_MODEL, batch_size=batch_size)
+
+
+def timed(func, texts) -> float:
+    started = time.perf_counter()
+    func(texts)
+    return time.perf_counter() - started
+
+
+def main(args):
+    if args.provider == "local" and embeddings.SentenceTransformer is None:
+        raise SystemExit("sentence-transformers is not installed")
+    texts = code_chunks(args.chunks)
+    print(f"{'batch':>6}{'cold chunks/s':>15}{'cached chunks/s':>17}{'hits':>7}")
+    for batch_size in args.batch_sizes:
+        with tempfile.TemporaryDirectory() as root:
+            cached = CachedEmbeddings(provider(args.provider, batch_size), VectorCache(root))
+            cold = timed(cached.embed_documents, texts)
+            warm = timed(cached.embed_documents, texts)
+            print(f"{batch_size:>6}{len(texts) / cold:>15.0f}{len(texts) / warm:>17.0f}{cached.hits:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--provider", choices=["local", "fake"], default="local")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 32, 64, 128])
+    main(parser.parse_args())
@@ -0,0 +1,153 @@
+"""End-to-end benchmark: the full /plantuml-tree pipeline on synthetic repositories of increasing size.
+
+Each (language, size) case runs in a fresh process with its own cache directory,
+fully offline with the fake chat/embedding models. A case analyzes a generated
+local git repository three times through FastAPI's TestClient:
+
+- cold:        empty caches, every file parsed, chunked and embedded
+- incremental: after a commit that changes one module
+- cached:      the same commit again (served from the result cache)
+
+and reports per-stage timings of the cold run, throughput and peak RSS
+(the server process and the static analysis workers).
+
+    python -m benchmarks.end_to_end --languages python javascript --files 50 200 1000 --latency 0.05
+    python -m benchmarks.end_to_end --files 200 --json current.json --baseline previous.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+STAGES = ["fetch", "index_load", "extract", "summarize", "index", "tree", "refine"]
+
+
+def peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def run_case(language: str, files: int, args) -> Dict:
+    """Analyze one synthetic repository cold, incrementally and cached; runs in its own process"""
+    root = tempfile.mkdtemp(prefix="bench-e2e-")
+    os.environ["CACHE_DIR"] = os.path.join(root, "cache")
+    os.environ["SEARCH_INDEX_DIR"] = os.path.join(root, "search")
+    os.environ["CHUNK_SUMMARIES"] = args.summaries
+    # Imported after the environment is set: settings are read at import time
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import static_analysis
+    from benchmarks.common import commit_change, make_repo, use_fake_models
+
+    use_fake_models(args.latency)
+    bare_dir = make_repo(language, files, functions_per_file=args.functions, fan_out=args.fan_out,
+                         large_every=args.large_every, root=root)
+    request = {"git_url": "file://" + bare_dir, "language": language, "code_folder": "src", "include_timings": True}
+    runs = {}
+    with TestClient(app) as client:
+        for run in ("cold", "incremental", "cached"):
+            if run == "incremental":
+                commit_change(bare_dir, language)
+            started = time.perf_counter()
+            response = client.post("/plantuml-tree", json=request)
+            elapsed = time.perf_counter() - started
+            response.raise_for_status()
+            runs[run] = dict(response.json()["metadata"], wall_sec=round(elapsed, 3))
+    static_analysis.shutdown_pool()
+
+    cold = runs["cold"]
+    summarization = cold["summarization"]
+    return {
+        "language": language,
+        "files": cold["total_files"],
+        "functions": cold["total_functions"],
+        "stages": {stage: cold["timings"].get(stage, 0.0) for stage in STAGES},
+        "cold_sec": cold["wall_sec"],
+        "incremental_sec": runs["incremental"]["wall_sec"],
+        "cached_sec": runs["cached"]["wall_sec"],
+        "files_per_sec": round(cold["total_files"] / cold["wall_sec"], 1),
+        "chunks_per_sec": round(summarization["embedded_chunks"] / cold["wall_sec"], 1),
+        "llm_calls": summarization["chunks_summarized"] + cold["refinement"]["llm_calls"],
+        "incremental_changed": runs["incremental"]["changed_files"],
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "workers_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def spawn_case(language: str, files: int, args) -> Dict:
+    """Run a case in a child process so caches, pools and peak RSS do not carry over between cases"""
+    options = ["--functions", args.functions, "--fan-out", args.fan_out, "--large-every", args.large_every,
+               "--summaries", args.summaries, "--latency", args.latency]
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.end_to_end", "--case", f"{language}:{files}", *map(str, options)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True, capture_output=True, text=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_results(results: List[Dict]):
+    print(f"{'language':<12}{'files':>7}{'funcs':>7}" + "".join(f"{stage:>11}" for stage in STAGES)
+          + f"{'cold s':>9}{'incr s':>8}{'cached s':>10}{'files/s':>9}{'chunks/s':>10}{'llm':>6}{'rss MB':>8}{'workers MB':>12}")
+    for r in results:
+        print(f"{r['language']:<12}{r['files']:>7}{r['functions']:>7}"
+              + "".join(f"{r['stages'][stage]:>11.3f}" for stage in STAGES)
+              + f"{r['cold_sec']:>9.2f}{r['incremental_sec']:>8.2f}{r['cached_sec']:>10.3f}{r['files_per_sec']:>9.1f}"
+              f"{r['chunks_per_sec']:>10.1f}{r['llm_calls']:>6}{r['peak_rss_mb']:>8.0f}{r['workers_peak_rss_mb']:>12.0f}")
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> bool:
+    """Print cold/incremental time ratios against a previous --json run; False if any case regressed"""
+    with open(baseline_path) as f:
+        baseline = {(r["language"], r["files"]): r for r in json.load(f)}
+    ok = True
+    for r in results:
+        previous = baseline.get((r["language"], r["files"]))
+        if previous is None:
+            continue
+        for key in ("cold_sec", "incremental_sec"):
+            ratio = r[key] / max(previous[key], 1e-9)
+            regressed = ratio > 1 + tolerance
+            ok = ok and not regressed
+            print(f"{r['language']}/{r['files']} {key}: {previous[key]:.2f}s -> {r[key]:.2f}s "
+                  f"({ratio:.2f}x){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main(args):
+    if args.case:
+        language, files = args.case.split(":")
+        print(json.dumps(run_case(language, int(files), args)))
+        return
+    results = []
+    for language in args.languages:
+        for files in args.files:
+            results.append(spawn_case(language, files, args))
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--languages", nargs="+", default=["python", "javascript", "typescript"],
+                        choices=["python", "javascript", "typescript"])
+    parser.add_argument("--files", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--functions", type=int, default=5, help="functions per file")
+    parser.add_argument("--fan-out", type=int, default=3, help="calls per function")
+    parser.add_argument("--large-every", type=int, default=20,
+                        help="every Nth function is long enough to be split and summarized (0: none)")
+    parser.add_argument("--summaries", default="large", choices=["large", "all", "none"], help="CHUNK_SUMMARIES")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated LLM/embedding latency (s)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of a previous --json run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --baseline")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,68 @@
+"""Benchmark: monolithic PlantUML vs. NDJSON streaming and paged diagrams on large call graphs.
+
+For each size, reports the size and render time of the single diagram
+tree_to_plantuml builds for the whole graph, the total size, largest line and
+time of the NDJSON stream, and the size and time of the first page in both
+partition modes (after the one-off pagination, whose time is listed separately).
+Peak Python memory of each output is measured with tracemalloc.
+
+    python -m benchmarks.graph_export --functions 10000 50000 --page-size 500
+"""
+import argparse
+import time
+import tracemalloc
+from app.services.analysis import PlantUMLGenerator
+from app.services.call_graph import CallGraph
+from app.services.graph_export import StoredGraph
+from benchmarks.call_graph import synthetic_graph
+
+
+def measured(func, *args):
+    """(result, seconds, peak MB of memory allocated while running)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def stream(stored: StoredGraph):
+    total = largest = 0
+    for line in stored.ndjson():
+        total += len(line)
+        largest = max(largest, len(line))
+    return total, largest
+
+
+def main(args):
+    print(f"{'functions':>10}{'edges':>9}{'diagram MB':>12}{'s':>7}{'peak MB':>9}"
+          f"{'ndjson MB':>11}{'max line KB':>13}{'s':>7}{'peak MB':>9}"
+          f"{'partition':>11}{'paginate s':>12}{'pages':>7}{'page KB':>9}{'page ms':>9}")
+    for size in args.functions:
+        functions, imports = synthetic_graph(size)
+        graph = CallGraph(functions, imports)
+        stored = StoredGraph(graph, None)
+
+        def monolithic():
+            tree = PlantUMLGenerator.build_call_tree(functions, args.max_depth, graph)
+            return len(PlantUMLGenerator.tree_to_plantuml(tree, graph))
+
+        diagram, diagram_sec, diagram_peak = measured(monolithic)
+        (total, largest), stream_sec, stream_peak = measured(stream, stored)
+        for partition in ("package", "subtree"):
+            pagination, paginate_sec, _ = measured(stored.pagination, partition, args.page_size)
+            page, page_sec, _ = measured(stored.page, partition, args.page_size, 0, "?page={page}")
+            print(f"{len(graph):>10}{graph.edge_count:>9}{diagram / 1e6:>12.2f}{diagram_sec:>7.2f}{diagram_peak:>9.1f}"
+                  f"{total / 1e6:>11.2f}{largest / 1024:>13.1f}{stream_sec:>7.2f}{stream_peak:>9.1f}"
+                  f"{partition:>11}{paginate_sec:>12.2f}{len(pagination.pages):>7}"
+                  f"{len(page['plantuml']) / 1024:>9.1f}{page_sec * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--max-depth", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,64 @@
+"""Benchmark: JavaScript extraction time vs. file size for generated and minified sources.
+
+The tree-sitter extractor should scale linearly (constant µs/KB); the legacy
+regex extractor is quadratic and is only run up to --regex-max-kb.
+
+    python -m benchmarks.js_extractor --sizes 16 64 256 1024 4096
+"""
+import argparse
+import re
+import time
+from app.services import js_extractor
+from app.services.analysis import CodeAnalyzer
+
+
+def generated_source(target_kb: int) -> str:
+    """Readable generated code: components, classes and helpers calling each other"""
+    parts, i = [], 0
+    while sum(len(p) for p in parts) < target_kb * 1024:
+        parts.append(
+            f"export function helper{i}(a, b) {{\n  const v = compute{i}(a);\n  return format(v, b);\n}}\n\n"
+            f"export const Widget{i} = ({{ items }}) => {{\n  const data = useData{i}(items);\n"
+            f"  return <List rows={{data.map(x => render(x))}}><Item{i} /></List>;\n}};\n\n"
+            f"class Service{i} {{\n  fetch(id) {{ return this.client.get(id).then(parse); }}\n"
+            f"  save = (obj) => validate(obj) && store(obj);\n}}\n\n"
+        )
+        i += 1
+    return "".join(parts)
+
+
+def minify(source: str) -> str:
+    return re.sub(r"\s*\n\s*", "", source)
+
+
+def timed(func, code: str, filename: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(code, filename)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(args):
+    if not js_extractor.available():
+        raise SystemExit("tree-sitter-languages is not installed")
+    print(f"{'kind':<10}{'size KB':>9}{'tree-sitter ms':>16}{'µs/KB':>8}{'regex ms':>12}")
+    for kind in ("generated", "minified"):
+        for size in args.sizes:
+            code = generated_source(size)
+            if kind == "minified":
+                code = minify(code)
+            kb = len(code) / 1024
+            ts = timed(js_extractor.extract_functions, code, "bench.jsx")
+            regex = "-"
+            if kb <= args.regex_max_kb:
+                regex = f"{timed(CodeAnalyzer.extract_functions_javascript_regex, code, 'bench.jsx', 1) * 1000:.1f}"
+            print(f"{kind:<10}{kb:>9.0f}{ts * 1000:>16.1f}{ts * 1e6 / kb:>8.0f}{regex:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256, 1024, 4096])
+    parser.add_argument("--regex-max-kb", type=float, default=300)
+    main(parser.parse_args())
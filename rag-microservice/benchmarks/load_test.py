@@ -0,0 +1,66 @@
+"""Load test: N concurrent /plantuml-tree requests against a local bare repository.
+
+Runs fully offline with the fake chat/embedding models. While the analyses run,
+/health is polled to show the event loop stays responsive.
+
+    python -m benchmarks.load_test --requests 8 --files 100 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import httpx
+
+_root = tempfile.mkdtemp(prefix="bench-load-")
+os.environ.setdefault("CACHE_DIR", os.path.join(_root, "cache"))
+os.environ.setdefault("SEARCH_INDEX_DIR", os.path.join(_root, "search"))
+
+from app.main import app  # noqa: E402
+from benchmarks.common import make_python_repo, use_fake_models  # noqa: E402
+
+
+async def analyze(client: httpx.AsyncClient, git_url: str) -> float:
+    started = time.perf_counter()
+    response = await client.post("/plantuml-tree", json={
+        "git_url": git_url, "language": "python", "code_folder": "src", "use_cache": False
+    })
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def poll_health(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.05)
+
+
+async def main(args):
+    use_fake_models(args.latency)
+    git_url = "file://" + make_python_repo(args.files)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        single = await analyze(client, git_url)
+
+        stop, health = asyncio.Event(), []
+        poller = asyncio.create_task(poll_health(client, stop, health))
+        started = time.perf_counter()
+        durations = await asyncio.gather(*(analyze(client, git_url) for _ in range(args.requests)))
+        wall = time.perf_counter() - started
+        stop.set()
+        await poller
+
+    print(f"single request:        {single:.2f}s")
+    print(f"{args.requests} concurrent requests: {wall:.2f}s wall "
+          f"(serial would be ~{single * args.requests:.2f}s, slowest {max(durations):.2f}s)")
+    print(f"/health during load:   max {max(health) * 1000:.1f}ms over {len(health)} probes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated LLM/embedding latency (s)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""Benchmark: /search index latency on a large published index.
+
+Publishes one synthetic index of --vectors clustered vectors, republishes it
+(as after an incremental analysis, which reuses the trained centroids), reopens
+it the way the service does (memory-mapped, through the open-index LRU) and
+reports query latency percentiles with and without a file filter.
+
+    python -m benchmarks.search_index --vectors 1000000 --dim 384 --queries 2000
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from app.services.search_index import SearchIndexStore
+
+SPACE = "bench:random"
+
+
+def clustered_vectors(count: int, dim: int, clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    """Vectors around random centers, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100000):
+        end = min(count, start + 100000)
+        vectors[start:end] = centers[rng.integers(0, clusters, end - start)]
+        vectors[start:end] += 0.3 * rng.standard_normal((end - start, dim), dtype=np.float32)
+    return vectors
+
+
+def percentiles(samples) -> str:
+    p50, p99 = np.percentile(np.asarray(samples) * 1000, [50, 99])
+    return f"p50 {p50:.2f} ms  p99 {p99:.2f} ms"
+
+
+def main(args):
+    vectors = clustered_vectors(args.vectors, args.dim)
+    docs = [{"id": f"doc-{i}", "file": f"src/pkg_{i % 100}/module_{i % args.files}.py", "type": "function"}
+            for i in range(args.vectors)]
+    with tempfile.TemporaryDirectory() as root:
+        store = SearchIndexStore(root)
+        info = {"repo": "https://example.com/bench.git", "code_folder": "src", "language": "python",
+                "commit": "0" * 40, "embedding": SPACE}
+        for label in ("publish", "republish"):
+            started = time.perf_counter()
+            store.publish("bench", info, vectors, docs)
+            print(f"{label} {args.vectors} x {args.dim}: {time.perf_counter() - started:.1f}s")
+        del vectors
+
+        queries = clustered_vectors(args.queries, args.dim, seed=1)
+        started = time.perf_counter()
+        store.search(queries[0], SPACE, args.top_k)
+        print(f"first query (opens the index): {(time.perf_counter() - started) * 1000:.1f} ms")
+        for label, filters in (("unfiltered", {}), ("file filter", {"file": "src/pkg_7/"}),
+                               ("repo + language", {"repo": "https://example.com/bench", "language": "python"})):
+            samples = []
+            for query in queries:
+                started = time.perf_counter()
+                store.search(query, SPACE, args.top_k, **filters)
+                samples.append(time.perf_counter() - started)
+            print(f"{label:<16}{percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--top-k", type=int, default=10)
+    main(parser.parse_args())
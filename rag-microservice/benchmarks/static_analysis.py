@@ -0,0 +1,63 @@
+"""Benchmark: static analysis throughput (files/sec) vs. number of worker processes.
+
+Generates a corpus of Python and JSX files and parses it with the process pool
+at each worker count, without the functions cache. Pool start-up is excluded
+by warming each pool on a throwaway run first.
+
+    python -m benchmarks.static_analysis --files 2000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from app.services import static_analysis
+from app.services.pipeline import EXCLUDED_DIRS
+from benchmarks.js_extractor import generated_source
+
+
+def make_corpus(root: str, num_files: int, file_kb: int):
+    """Write num_files source files alternating between Python and JSX"""
+    python_source = "".join(
+        f"class Model{i}:\n    def load(self, key):\n        return fetch_{i}(key) or self.parse(key)\n\n\n"
+        f"def fetch_{i}(key):\n    return helper(key, {i})\n\n\n"
+        for i in range(max(1, file_kb * 1024 // 150))
+    )
+    jsx_source = generated_source(file_kb)
+    for i in range(num_files):
+        package = os.path.join(root, f"pkg_{i % 20}")
+        os.makedirs(package, exist_ok=True)
+        ext, source = (".py", python_source) if i % 2 else (".jsx", jsx_source)
+        with open(os.path.join(package, f"module_{i}{ext}"), "w") as f:
+            f.write(source)
+
+
+def run(root: str, workers: int) -> int:
+    tasks = ((rel, path, None) for rel, path in static_analysis.discover_files(root, (".py", ".jsx"), EXCLUDED_DIRS))
+    return sum(1 for _ in static_analysis.analyze_files(tasks, None, 0, workers=workers))
+
+
+def main(args):
+    root = tempfile.mkdtemp(prefix="bench-static-")
+    try:
+        make_corpus(root, args.files, args.file_kb)
+        print(f"{args.files} files of ~{args.file_kb} KB, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8}{'seconds':>10}{'files/sec':>12}{'speedup':>9}")
+        baseline = None
+        for workers in args.workers:
+            run(root, workers)  # Warm up the pool
+            started = time.perf_counter()
+            count = run(root, workers)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            print(f"{workers:>8}{elapsed:>10.2f}{count / elapsed:>12.0f}{baseline / elapsed:>9.2f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--file-kb", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    main(parser.parse_args())
@@ -1,17 +1,37 @@
-from langchain.vectorstores import FAISS
-from langchain.embeddings import OpenAIEmbeddings
+"""Publish a saved LangChain FAISS index (e.g. a repository state's `index` directory) for /search.
+
+    python scripts/create_faiss_index.py ./data/embeddings --repo https://github.com/your/repo.git \
+        --language python --code-folder src
+
+The index must have been built with the configured EMBEDDING_PROVIDER/EMBEDDING_MODEL,
+and every document needs a "file" metadata field.
+"""
+import argparse
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import FAISS
+from app.services.embeddings import create_embeddings, embedding_id
+from app.services.search_index import export_vector_store, search_index_key, search_indexes
+
+
+def main(args):
+    vector_store = FAISS.load_local(args.index_dir, create_embeddings(), allow_dangerous_deserialization=True)
+    vectors, docs = export_vector_store(vector_store)
+    space = embedding_id()
+    info = {"repo": args.repo, "code_folder": args.code_folder, "language": args.language.lower(),
+            "commit": args.commit, "embedding": space}
+    search_indexes.publish(search_index_key(args.repo, args.code_folder, args.language, space), info, vectors, docs)
+    print(f"Published {len(docs)} vectors for {args.repo} under {search_indexes.root}")
+
 
-# Example documents for the initial index (replace with your real docs)
-docs = [
-    "def main():\n    funcA()\n    funcB()",
-    "def funcA():\n    funcC()",
-    "def funcB():\n    funcD()",
-    "def funcC():\n    pass",
-    "def funcD():\n    pass"
-]
-
-embeddings = OpenAIEmbeddings(openai_api_key=os.getenv("OPENAI_API_KEY"))
-vector_store = FAISS.from_texts(docs, embeddings)
-vector_store.save_local("./data/embeddings")
-print("FAISS index created at ./data/embeddings")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("index_dir")
+    parser.add_argument("--repo", required=True, help="git_url the index belongs to")
+    parser.add_argument("--language", required=True)
+    parser.add_argument("--code-folder", default="")
+    parser.add_argument("--commit", default=None)
+    main(parser.parse_args())
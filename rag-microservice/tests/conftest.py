@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+# Settings are read when the app modules are imported: keep every cache and index of the test run in a temp dir
+_data_dir = tempfile.mkdtemp(prefix="agamify-tests-")
+os.environ["CACHE_DIR"] = os.path.join(_data_dir, "cache")
+os.environ["SEARCH_INDEX_DIR"] = os.path.join(_data_dir, "search")
+os.environ["LLM_PREWARM"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import fakes, llm_clients, pipeline  # noqa: E402
+from benchmarks import common  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def caches(tmp_path, monkeypatch):
+    """Fresh caches per test, so no test is answered from the results of another"""
+    from app.services import cache, git_mirror
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(cache, "_caches", {})
+    monkeypatch.setattr(git_mirror, "_mirrors", None)
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Route the chat and embedding clients to the offline fakes; returns every chat model handed out"""
+    from app.services.refinement import REFINE_MODEL
+    created = []
+
+    def chat_model(model: str, temperature: float = 0.1):
+        # The refinement model hands back the diagram fragment it was given
+        created.append(fakes.FakeChatModel(echo_plantuml=model == REFINE_MODEL))
+        return created[-1]
+
+    monkeypatch.setattr(llm_clients, "chat_model", chat_model)
+    monkeypatch.setattr(llm_clients, "embeddings", lambda: fakes.FakeEmbeddings())
+    return created
+
+
+@pytest.fixture
+def client(fake_models, monkeypatch):
+    # Each TestClient runs its own event loop; the limiter's semaphore must not outlive it
+    monkeypatch.setattr(pipeline, "limiter", pipeline.AnalysisLimiter(pipeline.ANALYSIS_CONCURRENCY,
+                                                                      pipeline.ANALYSIS_MAX_QUEUED))
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def make_repo(tmp_path):
+    """Build a synthetic bare repository (see benchmarks.common.make_repo) and return its file:// URL"""
+    count = 0
+
+    def make(language: str = "python", num_files: int = 5, **kwargs) -> str:
+        nonlocal count
+        count += 1
+        return "file://" + common.make_repo(language, num_files, root=str(tmp_path / f"repo-{count}"), **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def request_for():
+    """Build a /plantuml-tree request body for a repository"""
+    def build(git_url: str, **options) -> dict:
+        return dict({"git_url": git_url, "language": "python", "code_folder": "src"}, **options)
+
+    return build
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import subprocess
+from app.services import build
+from app.services.build import dependencies_key, install_dependencies, package_manager
+from app.services.cache import get_cache
+
+
+def write(path, content: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def fake_npm(monkeypatch):
+    """Replace npm with a stub that writes node_modules; returns the recorded commands"""
+    commands = []
+
+    async def run_command(args, cwd=None, timeout=None, check=True):
+        commands.append(args)
+        write(os.path.join(cwd, "node_modules", "left-pad", "index.js"), "module.exports = 1\n")
+        return subprocess.CompletedProcess(args, 0, "", "")
+
+    monkeypatch.setattr(build, "run_command", run_command)
+    return commands
+
+
+def test_key_follows_the_lockfile(tmp_path):
+    assert dependencies_key(str(tmp_path)) is None
+    write(str(tmp_path / "package.json"), '{"name": "app"}')
+    manifest_key = dependencies_key(str(tmp_path))
+    write(str(tmp_path / "package-lock.json"), '{"lockfileVersion": 3}')
+    lock_key = dependencies_key(str(tmp_path))
+    assert manifest_key and lock_key != manifest_key
+    # Only the lockfile matters once there is one
+    write(str(tmp_path / "package.json"), '{"name": "app", "version": "2.0.0"}')
+    assert dependencies_key(str(tmp_path)) == lock_key
+    write(str(tmp_path / "package-lock.json"), '{"lockfileVersion": 3, "packages": {}}')
+    assert dependencies_key(str(tmp_path)) != lock_key
+
+
+def test_installed_modules_are_cached_and_restored(tmp_path, monkeypatch):
+    commands = fake_npm(monkeypatch)
+    for project in ("first", "second"):
+        write(str(tmp_path / project / "package.json"), '{"name": "app"}')
+        write(str(tmp_path / project / "package-lock.json"), '{"lockfileVersion": 3}')
+        asyncio.run(install_dependencies(str(tmp_path / project)))
+        assert (tmp_path / project / "node_modules" / "left-pad" / "index.js").exists()
+    assert commands == [["npm", "ci"]]
+    assert get_cache("node_modules").stats()["entries"] == 1
+    # Build output written into the restored copy does not reach the cache entry
+    write(str(tmp_path / "second" / "node_modules" / "left-pad" / "index.js"), "corrupted\n")
+    write(str(tmp_path / "third" / "package.json"), '{"name": "app"}')
+    write(str(tmp_path / "third" / "package-lock.json"), '{"lockfileVersion": 3}')
+    asyncio.run(install_dependencies(str(tmp_path / "third")))
+    assert (tmp_path / "third" / "node_modules" / "left-pad" / "index.js").read_text() == "module.exports = 1\n"
+
+
+def test_restore_replaces_a_committed_node_modules(tmp_path, monkeypatch):
+    commands = fake_npm(monkeypatch)
+    for project in ("first", "second"):
+        write(str(tmp_path / project / "package.json"), '{"name": "app"}')
+        write(str(tmp_path / project / "package-lock.json"), '{"lockfileVersion": 3}')
+    write(str(tmp_path / "second" / "node_modules" / "stale" / "index.js"), "module.exports = 0\n")
+    asyncio.run(install_dependencies(str(tmp_path / "first")))
+    asyncio.run(install_dependencies(str(tmp_path / "second")))
+    assert commands == [["npm", "ci"]]
+    assert os.listdir(tmp_path / "second" / "node_modules") == ["left-pad"]
+
+
+def test_failed_restore_falls_back_to_install(tmp_path, monkeypatch):
+    commands = fake_npm(monkeypatch)
+    for project in ("first", "second"):
+        write(str(tmp_path / project / "package.json"), '{"name": "app"}')
+        write(str(tmp_path / project / "package-lock.json"), '{"lockfileVersion": 3}')
+    asyncio.run(install_dependencies(str(tmp_path / "first")))
+
+    def restore_tree(src, dst):
+        write(os.path.join(dst, "partial.js"), "")
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(build, "restore_tree", restore_tree)
+    asyncio.run(install_dependencies(str(tmp_path / "second")))
+    assert commands == [["npm", "ci"], ["npm", "ci"]]
+    assert os.listdir(tmp_path / "second" / "node_modules") == ["left-pad"]
+
+
+def test_package_manager_follows_the_lockfile(tmp_path, monkeypatch):
+    assert package_manager(str(tmp_path)) == (["npm", "install"], ["npm", "run"])
+    write(str(tmp_path / "yarn.lock"), "# yarn lockfile v1\n")
+    assert package_manager(str(tmp_path))[0] == ["yarn", "install", "--frozen-lockfile"]
+    commands = fake_npm(monkeypatch)
+    write(str(tmp_path / "package.json"), '{"name": "app"}')
+    asyncio.run(build.build_project(str(tmp_path)))
+    assert commands == [["yarn", "install", "--frozen-lockfile"], ["yarn", "run", "build"]]
+
+
+def test_projects_without_package_json_are_skipped(tmp_path, monkeypatch):
+    commands = fake_npm(monkeypatch)
+    asyncio.run(install_dependencies(str(tmp_path)))
+    assert commands == []
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import subprocess
+import time
+import pytest
+from app.services.cache import CACHE_TMP_MAX_AGE, DiskLRUCache, cache_key, content_hash, get_cache
+from app.utils.git import authenticated_url, git_command, redact, resolve_remote_head
+
+
+def test_keys_are_stable_and_order_sensitive():
+    assert cache_key("result", {"b": 1, "a": 2}) == cache_key("result", {"a": 2, "b": 1})
+    assert cache_key("a", "b") != cache_key("b", "a")
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+
+
+def test_values_and_directories_round_trip(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "lru"), max_bytes=10 ** 6)
+    assert cache.get("missing") is None
+    cache.set("value", {"functions": [1, 2]})
+    assert cache.get("value") == {"functions": [1, 2]}
+    source = tmp_path / "artifact"
+    source.mkdir()
+    (source / "index.faiss").write_text("data")
+    cached = cache.put_dir("dir", str(source))
+    assert cache.get_dir("dir") == cached
+    assert open(os.path.join(cached, "index.faiss")).read() == "data"
+    assert cache.stats()["entries"] == 2
+
+
+def test_lru_entry_is_evicted_first(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "lru"), max_bytes=250)
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.set("c", "x" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["bytes"] <= 250
+
+
+def test_pinned_entry_survives_eviction(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "lru"), max_bytes=250)
+    cache.set("a", "x" * 100)
+    cache.pin("a")
+    cache.set("b", "x" * 100)
+    cache.set("c", "x" * 100)
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    cache.unpin("a")
+    cache.set("d", "x" * 100)  # Evicts "c": "a" was used more recently
+    cache.set("e", "x" * 100)
+    assert cache.get("a") is None
+
+
+def test_newest_entry_is_kept_even_over_quota(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "lru"), max_bytes=10)
+    cache.set("big", "x" * 100)
+    assert cache.get("big") is not None
+
+
+def test_only_stale_temporary_entries_are_removed(tmp_path):
+    root = tmp_path / "lru"
+    root.mkdir()
+    stale, fresh = root / ".tmp-stale", root / ".tmp-fresh"
+    stale.mkdir()
+    fresh.mkdir()
+    old = time.time() - CACHE_TMP_MAX_AGE - 60
+    os.utime(stale, (old, old))
+    DiskLRUCache(str(root), max_bytes=1000)
+    assert not stale.exists()
+    assert fresh.exists()
+
+
+def test_reopened_cache_keeps_entries_and_recency(tmp_path):
+    root = str(tmp_path / "lru")
+    cache = DiskLRUCache(root, max_bytes=250)
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    os.utime(os.path.join(root, "a"), (time.time() - 60, time.time() - 60))
+    reopened = DiskLRUCache(root, max_bytes=250)
+    reopened.set("c", "x" * 100)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == "x" * 100
+
+
+def test_namespaces_have_their_own_cache(tmp_path):
+    assert get_cache("results") is get_cache("results")
+    assert get_cache("results").root != get_cache("functions").root
+    assert get_cache("results").root.startswith(str(tmp_path))
+
+
+def test_remote_head_is_resolved_without_cloning(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git = ["git", "-c", "user.email=test@example.com", "-c", "user.name=test"]
+    subprocess.run([*git, "init", "-q"], cwd=repo, check=True)
+    subprocess.run([*git, "commit", "-q", "--allow-empty", "-m", "first"], cwd=repo, check=True)
+    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, check=True, capture_output=True, text=True)
+    assert asyncio.run(resolve_remote_head(f"file://{repo}")) == head.stdout.strip()
+    assert asyncio.run(resolve_remote_head(f"file://{tmp_path}/missing")) is None
+
+
+def test_tokens_are_embedded_in_https_urls():
+    assert authenticated_url("https://github.com/o/r.git", "tok") == "https://tok@github.com/o/r.git"
+    assert authenticated_url("https://github.com/o/r.git") == "https://github.com/o/r.git"
+
+
+def test_tokens_are_redacted_from_git_errors(tmp_path):
+    assert redact("fatal: unable to access 'https://tok@github.com/o/r.git/'") == \
+        "fatal: unable to access 'https://***@github.com/o/r.git/'"
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        asyncio.run(git_command(["ls-remote", "https://secret-token@127.0.0.1:9/o/r.git"], timeout=30))
+    assert "secret-token" not in str(error.value) + error.value.stderr
@@ -0,0 +1,115 @@
+from app.services.call_graph import CallGraph, qualified_id
+
+
+def func(file, name, calls=(), cls=None):
+    return {"file": file, "name": name, "class": cls, "calls": list(calls)}
+
+
+def edges_by_id(graph):
+    return {(graph.ids[i], graph.ids[j]) for i in range(len(graph)) for j in graph.callees(i)}
+
+
+def test_qualified_ids_keep_same_named_functions_apart():
+    graph = CallGraph([func("a.py", "run", ["helper"]), func("a.py", "helper"),
+                       func("b.py", "run", ["helper"]), func("b.py", "helper"),
+                       func("b.py", "run", cls="Job")])
+    assert len(graph) == 5
+    assert qualified_id(graph.functions[4]) == "b.py::Job::run"
+    assert edges_by_id(graph) == {("a.py::run", "a.py::helper"), ("b.py::run", "b.py::helper")}
+    assert graph.stats["resolved_local"] == 2
+
+
+def test_methods_resolve_within_their_class_first():
+    graph = CallGraph([func("a.py", "save", ["validate"], cls="User"), func("a.py", "validate", cls="User"),
+                       func("a.py", "validate")])
+    assert edges_by_id(graph) == {("a.py::User::save", "a.py::User::validate")}
+
+
+def test_python_imports_resolve_to_the_imported_module():
+    functions = [func("app/main.py", "main", ["load", "dump"]),
+                 func("app/io/reader.py", "load"), func("app/io/writer.py", "dump"),
+                 func("other/reader.py", "load"), func("other/writer.py", "dump")]
+    imports = {"app/main.py": {"load": ["io.reader", "load"], "dump": [".io.writer", "dump"]}}
+    graph = CallGraph(functions, imports)
+    assert edges_by_id(graph) == {("app/main.py::main", "app/io/reader.py::load"),
+                                  ("app/main.py::main", "app/io/writer.py::dump")}
+    assert graph.stats["resolved_import"] == 2
+
+
+def test_js_imports_resolve_relative_index_and_root_aliased_modules():
+    functions = [func("src/pages/home.tsx", "Home", ["fetchItems", "Button", "format"]),
+                 func("src/api/items.ts", "fetchItems"), func("src/lib/items.ts", "fetchItems"),
+                 func("src/components/index.ts", "Button"), func("lib/components/index.ts", "Button"),
+                 func("src/utils/format.js", "format"), func("test/utils/format.js", "format")]
+    imports = {"src/pages/home.tsx": {"fetchItems": ["../api/items", "fetchItems"],
+                                      "Button": ["../components", "default"],
+                                      "format": ["@/src/utils/format.js", "format"]}}
+    graph = CallGraph(functions, imports)
+    assert edges_by_id(graph) == {("src/pages/home.tsx::Home", "src/api/items.ts::fetchItems"),
+                                  ("src/pages/home.tsx::Home", "src/components/index.ts::Button"),
+                                  ("src/pages/home.tsx::Home", "src/utils/format.js::format")}
+
+
+def test_unique_names_resolve_globally_and_ambiguous_ones_add_no_edge():
+    graph = CallGraph([func("a.py", "main", ["unique", "shared", "print"]), func("b.py", "unique"),
+                       func("c.py", "shared"), func("d.py", "shared")])
+    assert edges_by_id(graph) == {("a.py::main", "b.py::unique")}
+    assert graph.stats == {"resolved_local": 0, "resolved_import": 0, "resolved_global": 1, "ambiguous": 1,
+                           "external": 1}
+    # Candidates of an ambiguous call may be called, so they are not entry points
+    assert [graph.ids[i] for i in graph.entry_points] == ["a.py::main"]
+
+
+def test_duplicate_definitions_merge_and_self_or_repeated_calls_add_one_edge():
+    graph = CallGraph([func("a.py", "f", ["g", "f"]), func("a.py", "f", ["g", "h"]),
+                       func("a.py", "g"), func("a.py", "h")])
+    assert len(graph) == 3
+    assert sorted(graph.ids[j] for j in graph.callees(0)) == ["a.py::g", "a.py::h"]
+    assert graph.edge_count == 2
+    assert list(graph.in_degree) == [0, 1, 1]
+    assert graph.entry_points == [0]
+
+
+def test_walk_is_depth_limited_and_reports_shared_callees_from_every_caller():
+    # a -> b -> d, a -> c -> d, d -> e
+    graph = CallGraph([func("m.py", "a", ["b", "c"]), func("m.py", "b", ["d"]), func("m.py", "c", ["d"]),
+                       func("m.py", "d", ["e"]), func("m.py", "e")])
+    name = lambda i: graph.functions[i]["name"]  # noqa: E731
+    walked = [(name(caller), name(callee), depth) for caller, callee, depth in graph.walk(graph.entry_points, 3)]
+    assert walked == [("a", "b", 1), ("a", "c", 1), ("b", "d", 2), ("c", "d", 2)]
+    assert len(list(graph.walk(graph.entry_points, 4))) == 5
+    assert list(graph.walk(graph.entry_points, 0)) == []
+
+
+def test_edges_include_cycles_unreachable_from_entry_points():
+    graph = CallGraph([func("m.py", "main", ["x"]), func("m.py", "x"),
+                       func("m.py", "ping", ["pong"]), func("m.py", "pong", ["ping"])])
+    assert [graph.ids[i] for i in graph.entry_points] == ["m.py::main"]
+    names = {(graph.functions[a]["name"], graph.functions[b]["name"]) for a, b in graph.edges(5)}
+    assert names == {("main", "x"), ("ping", "pong"), ("pong", "ping")}
+
+
+def test_call_tree_links_shared_callees_as_leaves():
+    graph = CallGraph([func("m.py", "a", ["b", "c"]), func("m.py", "b", ["c"]), func("m.py", "c", ["a2"]),
+                       func("m.py", "a2")])
+    tree = graph.call_tree(max_depth=5)
+    root = tree["m.py::a"]
+    assert set(root["children"]) == {"m.py::b", "m.py::c"}
+    assert root["children"]["m.py::c"]["children"] == {"m.py::a2": {"id": "m.py::a2", "name": "a2", "file": "m.py",
+                                                                   "children": {}}}
+    assert root["children"]["m.py::b"]["children"]["m.py::c"]["children"] == {}
+    assert graph.call_tree(max_depth=0) == {}
+
+
+def test_aliases_are_qualified_only_for_ambiguous_names():
+    graph = CallGraph([func("src/a.py", "run"), func("src/b.py", "run"), func("src/b.py", "stop")])
+    assert graph.alias(2) == "stop"
+    assert graph.alias(0) == "src_a_py__run" and graph.alias(1) == "src_b_py__run"
+
+
+def test_large_graph():
+    functions = [func(f"pkg/m{i // 10}.py", f"f{i}", [f"f{i + 1}", f"f{(i * 7) % 50000}"]) for i in range(50000)]
+    graph = CallGraph(functions)
+    assert len(graph) == 50000
+    assert graph.stats["resolved_local"] + graph.stats["resolved_global"] + graph.stats["external"] == 100000
+    assert len(graph.edges(5)) > 0
@@ -0,0 +1,106 @@
+from app.services.analysis import CodeAnalyzer
+from app.services.chunking import ELISION, chunk_file, file_summary
+
+SOURCE = '''import os
+
+LIMIT = 10
+
+
+class Store:
+    """Keeps values"""
+    size = LIMIT
+
+    def path(self, name):
+        return os.path.join("data", name)
+
+
+def load(name):
+    return Store().path(name)
+'''
+
+
+def chunks_of(content, path="pkg/store.py", **options):
+    functions, _ = CodeAnalyzer.analyze_file(content, path)
+    return chunk_file(content, path, functions, **options)
+
+
+def body(chunk):
+    """Code of a chunk without its header line"""
+    return chunk[1].split("\n", 1)[1]
+
+
+def test_one_chunk_per_span_and_module_code():
+    chunks, pending = chunks_of(SOURCE)
+    by_node = {chunk[2]["node"]: chunk for chunk in chunks}
+    assert set(by_node) == {None, "pkg/store.py::Store", "pkg/store.py::Store::path", "pkg/store.py::load"}
+    assert pending == []
+    module = by_node[None]
+    assert module[0] == "pkg/store.py::<module>:1#0"
+    assert module[2]["kind"] == "module" and body(module) == "import os\nLIMIT = 10\n"
+    method = by_node["pkg/store.py::Store::path"]
+    assert method[1].startswith("pkg/store.py | function Store.path | lines 10-11\n")
+    assert (method[2]["start_line"], method[2]["end_line"], method[2]["parts"]) == (10, 11, 1)
+    # The class chunk leaves out its method, which is embedded on its own
+    assert body(by_node["pkg/store.py::Store"]).endswith("    size = LIMIT\n\n")
+
+
+def test_every_code_line_is_embedded_exactly_once():
+    chunks, _ = chunks_of(SOURCE)
+    embedded = [line for chunk in chunks for line in body(chunk).splitlines() if line and line != ELISION.strip()]
+    assert sorted(embedded) == sorted(line for line in SOURCE.splitlines() if line.strip())
+
+
+def test_gaps_left_by_nested_spans_are_marked():
+    source = "def outer():\n    x = 1\n\n    def inner():\n        return 2\n\n    return inner\n"
+    chunks, _ = chunks_of(source, "a.py")
+    outer = next(chunk for chunk in chunks if chunk[2]["name"] == "outer")
+    assert body(outer) == f"def outer():\n    x = 1\n\n{ELISION}\n    return inner\n"
+
+
+def test_large_spans_are_windowed_within_the_budget_and_summarized():
+    lines = "".join(f"    value = value * {n} + {n}\n" for n in range(300))
+    source = f"def big(value):\n{lines}    return value\n\n\ndef small():\n    return 1\n"
+    chunks, pending = chunks_of(source, "a.py", max_chars=1000)
+    windows = [chunk for chunk in chunks if chunk[2]["name"] == "big"]
+    assert len(windows) > 1
+    assert all(len(body(chunk)) <= 1000 for chunk in windows)
+    assert [chunk[2]["part"] for chunk in windows] == list(range(len(windows)))
+    assert all(chunk[2]["parts"] == len(windows) for chunk in windows)
+    assert windows[0][2]["start_line"] == 1 and windows[-1][2]["end_line"] == 302
+    assert "".join(body(chunk) for chunk in windows) == "".join(source.splitlines(keepends=True)[:302])
+    # Only the windowed span needs a summary by default
+    assert [(key, metadata["type"], metadata["start_line"]) for key, metadata, _ in pending] == [
+        ("a.py::big:1#summary", "summary", 1)]
+
+
+def test_overlong_lines_are_cut():
+    source = "def f():\n    return '" + "x" * 2500 + "'\n"
+    chunks, _ = chunks_of(source, "a.py", max_chars=1000)
+    assert len(chunks) == 4
+    assert all(len(body(chunk)) <= 1001 for chunk in chunks)
+
+
+def test_summary_modes():
+    assert len(chunks_of(SOURCE, summaries="all")[1]) == 4
+    lines = "".join(f"    x = {n}\n" for n in range(100))
+    assert chunks_of(f"def big():\n{lines}", "a.py", max_chars=100, summaries="none")[1] == []
+
+
+def test_file_summary_uses_docstrings_and_span_summaries():
+    functions, _ = CodeAnalyzer.analyze_file(SOURCE, "pkg/store.py")
+    assert file_summary(functions, []) == "Store: Keeps values"
+    summary = file_summary(functions, [({"name": "load", "class": None}, "loads a value")])
+    assert summary == "Store: Keeps values; load: loads a value"
+    assert file_summary([], []) is None
+    long = file_summary([], [({"name": "f"}, "y" * 2000)], max_chars=100)
+    assert len(long) == 100 and long.endswith("...")
+
+
+def test_analysis_embeds_spans_and_summarizes_only_large_ones(client, make_repo, request_for):
+    git_url = make_repo(num_files=4, large_every=4)
+    result = client.post("/plantuml-tree", json=request_for(git_url)).json()
+    stats = result["metadata"]["summarization"]
+    # Two of the eight functions are large: one summary each, next to their code windows
+    assert stats["chunks_summarized"] == 2
+    assert stats["embedded_chunks"] > 4 * 4
+    assert stats["failed"] == 0
@@ -0,0 +1,49 @@
+import json
+import pytest
+from benchmarks.common import commit_change
+from benchmarks.end_to_end import compare
+
+
+@pytest.mark.parametrize("language", ["python", "javascript", "typescript"])
+def test_synthetic_repositories_are_analyzed(client, make_repo, request_for, language):
+    git_url = make_repo(language, num_files=4, fan_out=2)
+    metadata = client.post("/plantuml-tree", json=request_for(git_url, language=language)).json()["metadata"]
+    # Two functions plus a class with one method per module
+    assert metadata["total_files"] == 4
+    assert metadata["total_functions"] == 4 * 4
+    assert metadata["summarization"]["failed"] == 0
+
+
+def test_new_commit_reanalyzes_only_changed_files(client, make_repo, request_for):
+    git_url = make_repo(num_files=6)
+    first = client.post("/plantuml-tree", json=request_for(git_url)).json()
+    assert not first["metadata"]["incremental"]
+
+    commit_change(git_url[len("file://"):], "python", module=2)
+    second = client.post("/plantuml-tree", json=request_for(git_url)).json()
+    metadata = second["metadata"]
+    assert metadata["incremental"]
+    assert metadata["changed_files"] == 1
+    assert metadata["commit"] != first["metadata"]["commit"]
+    assert metadata["total_functions"] == first["metadata"]["total_functions"] + 1
+    assert "added_function" in second["plantuml"]
+
+
+def test_incremental_state_matches_a_full_analysis(client, make_repo, request_for):
+    git_url = make_repo(num_files=6)
+    client.post("/plantuml-tree", json=request_for(git_url))
+    commit_change(git_url[len("file://"):], "python", module=4)
+    incremental = client.post("/plantuml-tree", json=request_for(git_url)).json()
+    full = client.post("/plantuml-tree", json=request_for(git_url, use_cache=False)).json()
+    assert not full["metadata"]["incremental"]
+    for field in ("total_functions", "total_files", "entry_points", "commit"):
+        assert incremental["metadata"][field] == full["metadata"][field]
+
+
+def test_regressions_against_a_baseline_are_reported(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps([{"language": "python", "files": 50, "cold_sec": 1.0, "incremental_sec": 0.2}]))
+    result = {"language": "python", "files": 50, "cold_sec": 1.1, "incremental_sec": 0.2}
+    assert compare([result], str(baseline), tolerance=0.25)
+    assert not compare([dict(result, incremental_sec=0.3)], str(baseline), tolerance=0.25)
+    assert compare([dict(result, files=200, cold_sec=9.0)], str(baseline), tolerance=0.25)
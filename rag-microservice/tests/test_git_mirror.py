@@ -0,0 +1,123 @@
+import asyncio
+import os
+from app.services import git_mirror
+from app.services.cache import DiskLRUCache
+from app.services.git_mirror import MirrorCache, fetch_source, shallow_checkout
+from app.utils.git import has_commit, head_commit
+from benchmarks.common import git
+
+
+def make_source(root, files: dict) -> str:
+    """Non-bare repository with the given files committed; returns its path"""
+    os.makedirs(root)
+    git(str(root), "init", "-q")
+    return commit_files(root, files)
+
+
+def commit_files(root, files: dict) -> str:
+    for name, content in files.items():
+        os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+        with open(os.path.join(root, name), "w") as f:
+            f.write(content)
+    git(str(root), "add", "-A")
+    git(str(root), "commit", "-qm", "change")
+    return asyncio.run(head_commit(str(root)))
+
+
+def record_git(monkeypatch):
+    """Record the subcommand of every git call the mirror cache makes"""
+    calls = []
+    real = git_mirror.git_command
+
+    async def git_command(args, *rest, **kwargs):
+        calls.append(args[0])
+        return await real(args, *rest, **kwargs)
+
+    monkeypatch.setattr(git_mirror, "git_command", git_command)
+    return calls
+
+
+FILES = {"src/app.py": "def main():\n    pass\n", "docs/guide.md": "# Guide\n"}
+
+
+def test_first_request_mirrors_and_exports_only_the_folder(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    commit = make_source(source, FILES)
+    mirrors = MirrorCache(DiskLRUCache(str(tmp_path / "mirrors"), max_bytes=10 ** 8))
+    calls = record_git(monkeypatch)
+
+    (tmp_path / "out").mkdir()
+
+    async def scenario():
+        mirror_dir = await mirrors.ensure("url", f"file://{source}", commit)
+        await mirrors.export(mirror_dir, f"file://{source}", commit, "src", str(tmp_path / "out"))
+        return mirror_dir
+
+    mirror_dir = asyncio.run(scenario())
+    assert "clone" in calls and "fetch" not in calls
+    assert (tmp_path / "out" / "src" / "app.py").exists()
+    assert not (tmp_path / "out" / "docs").exists()
+    assert not (tmp_path / "out" / ".source.tar").exists()
+    # Credentials are never stored in the mirror
+    assert "file://" not in open(os.path.join(mirror_dir, "config")).read()
+
+
+def test_warm_request_fetches_only_for_a_new_commit(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    first = make_source(source, FILES)
+    mirrors = MirrorCache(DiskLRUCache(str(tmp_path / "mirrors"), max_bytes=10 ** 8))
+    asyncio.run(mirrors.ensure("url", f"file://{source}", first))
+    calls = record_git(monkeypatch)
+
+    mirror_dir = asyncio.run(mirrors.ensure("url", f"file://{source}", first))
+    assert calls == []
+
+    second = commit_files(source, {"src/app.py": "def main():\n    return 1\n"})
+    assert not asyncio.run(has_commit(mirror_dir, second))
+    assert asyncio.run(mirrors.ensure("url", f"file://{source}", second)) == mirror_dir
+    assert calls == ["fetch"]
+    assert asyncio.run(has_commit(mirror_dir, second))
+
+
+def test_mirrors_are_evicted_over_quota(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "mirrors"), max_bytes=1)
+    mirrors = MirrorCache(cache)
+    for name in ("one", "two", "three"):
+        source = tmp_path / name
+        commit = make_source(source, FILES)
+        asyncio.run(mirrors.ensure(name, f"file://{source}", commit))
+        if name != "one":
+            cache.unpin(mirrors.key(name))
+    # "one" is still in use, so only the unpinned mirrors are evicted
+    assert cache.stats()["entries"] == 2
+    assert cache.get_dir(mirrors.key("one")) is not None
+
+
+def test_fetched_mirror_stays_pinned_until_released(tmp_path):
+    source = tmp_path / "source"
+    make_source(source, FILES)
+    os.makedirs(tmp_path / "out")
+    checkout = asyncio.run(fetch_source("url", f"file://{source}", None, "src", str(tmp_path / "out")))
+    cache = git_mirror._mirrors.cache
+    assert cache._pins == {git_mirror._mirrors.key("url"): 1}
+    checkout.release()
+    checkout.release()
+    assert cache._pins == {}
+
+
+def test_shallow_checkout_fetches_only_the_folder(tmp_path):
+    source = tmp_path / "source"
+    commit = make_source(source, FILES)
+    checkout = asyncio.run(shallow_checkout(f"file://{source}", "src", str(tmp_path / "out")))
+    assert checkout.commit == commit
+    assert (tmp_path / "out" / "src" / "app.py").exists()
+    assert not (tmp_path / "out" / "docs").exists()
+
+
+def test_fetch_source_falls_back_to_a_shallow_checkout(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    commit = make_source(source, FILES)
+    monkeypatch.setattr(git_mirror, "GIT_MIRROR_CACHE", False)
+    checkout = asyncio.run(fetch_source("url", f"file://{source}", None, "/src/", str(tmp_path / "out")))
+    assert (checkout.repo_dir, checkout.commit) == (str(tmp_path / "out"), commit)
+    assert git_mirror._mirrors is None
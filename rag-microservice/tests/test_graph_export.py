@@ -0,0 +1,115 @@
+import json
+import shutil
+import pytest
+from app.services.access import repo_access
+from app.services.call_graph import CallGraph
+from app.services.graph_export import StoredGraph
+from benchmarks.common import commit_change
+
+
+def sample_graph() -> StoredGraph:
+    """Three directories; api calls into core and util, and ping/pong only call each other"""
+    records = []
+    for d, directory in enumerate(["api", "core", "util"]):
+        for f in range(2):
+            for n in range(3):
+                calls = [f"{directory}_{f}_{n + 1}"] if n < 2 else []
+                if directory == "api" and n == 0:
+                    calls += [f"core_{f}_0", "util_0_0"]
+                records.append({"file": f"{directory}/m{f}.py", "name": f"{directory}_{f}_{n}", "class": None,
+                                "type": "function", "line": n + 1, "calls": calls})
+    records.append({"file": "loop.py", "name": "ping", "class": None, "calls": ["pong"], "line": 1})
+    records.append({"file": "loop.py", "name": "pong", "class": None, "calls": ["ping"], "line": 2})
+    return StoredGraph(CallGraph(records), "abc123")
+
+
+def parse(lines):
+    return [json.loads(line) for line in lines]
+
+
+def test_ndjson_round_trips_the_graph():
+    stored = sample_graph()
+    graph = stored.graph
+    lines = parse(stored.ndjson(chunk=4))
+    assert lines[0] == {"type": "graph", "commit": "abc123", "files": 7, "nodes": len(graph),
+                        "edges": graph.edge_count, "entry_points": len(graph.entry_points)}
+    assert lines[-1] == {"type": "end"}
+    by_type = {}
+    for line in lines[1:-1]:
+        assert len(line["items"]) <= 8  # chunk items, or chunk caller/callee pairs
+        by_type.setdefault(line["type"], []).append(line)
+    flat = {kind: [item for line in chunks for item in line["items"]] for kind, chunks in by_type.items()}
+    assert all(line["start"] == sum(len(previous["items"]) for previous in chunks[:i]) // (2 if kind == "edges" else 1)
+               for kind, chunks in by_type.items() for i, line in enumerate(chunks))
+    assert flat["files"] == stored.files
+    assert [[stored.files[node[1]], node[0]] for node in flat["nodes"]] == [
+        [func["file"], func["name"]] for func in graph.functions]
+    edges = list(zip(flat["edges"][::2], flat["edges"][1::2]))
+    assert edges == [(i, j) for i in range(len(graph)) for j in graph.callees(i)]
+    assert flat["entry_points"] == graph.entry_points
+
+
+@pytest.mark.parametrize("partition", ["package", "subtree"])
+def test_pages_cover_every_node_once_within_the_page_size(partition):
+    stored = sample_graph()
+    pagination = stored.pagination(partition, 5)
+    nodes = [i for page in pagination.pages for i in page]
+    assert sorted(nodes) == list(range(len(stored.graph)))
+    assert all(0 < len(page) <= 5 for page in pagination.pages)
+    for p in range(len(pagination.pages)):
+        for q, count in pagination.calls_into[p].items():
+            assert pagination.called_from[q][p] == count
+
+
+def test_package_pages_keep_directories_together_where_they_fit():
+    stored = sample_graph()
+    pagination = stored.pagination("package", 6)
+    assert pagination.titles == ["api", "core", ".", "util"]
+    assert [len(page) for page in pagination.pages] == [6, 6, 2, 6]
+
+
+def test_page_links_calls_into_other_pages():
+    stored = sample_graph()
+    page = stored.page("package", 6, 0, "/graph?q={x}&page={page}")
+    assert (page["page"], page["pages"], page["title"]) == (0, 4, "api")
+    assert page["calls_into"] == {"1": 2, "3": 2} and page["called_from"] == {}
+    assert "[[/graph?q={x}&page=1]]" in page["plantuml"] and "[[/graph?q={x}&page=3]]" in page["plantuml"]
+    assert "component [core_0_0] as core_0_0 <<page 2>>" in page["plantuml"]
+    assert "api_0_0 ..> util_0_0" in page["plantuml"]
+    assert stored.page("package", 6, 3, "")["called_from"] == {"0": 2}
+    assert stored.page("package", 6, 4, "") is None
+    assert stored.page("package", 6, -1, "") is None
+
+
+def test_graph_endpoints_serve_the_last_analysis(client, make_repo, request_for):
+    git_url = make_repo(num_files=4)
+    assert client.post("/graph", json=request_for(git_url)).status_code == 404
+    analysis = client.post("/plantuml-tree", json=request_for(git_url)).json()
+
+    response = client.post("/graph", json=request_for(git_url))
+    assert response.headers["content-type"] == "application/x-ndjson"
+    header = parse(response.text.splitlines())[0]
+    assert header["commit"] == analysis["metadata"]["commit"]
+    assert header["nodes"] == analysis["metadata"]["total_functions"] and header["files"] == 4
+
+    page = client.post("/plantuml-tree/pages", json=request_for(git_url, page_size=3)).json()
+    assert page["nodes"] <= 3 and page["pages"] > 1
+    assert "[[?page=" in page["plantuml"]
+    assert client.post("/plantuml-tree/pages", json=request_for(git_url, page=99)).status_code == 404
+    assert client.post("/plantuml-tree/pages", json=request_for(git_url, partition="random")).status_code == 400
+
+    # A new analysis replaces the graph that is served
+    commit_change(git_url[len("file://"):], "python")
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    updated = parse(client.post("/graph", json=request_for(git_url)).text.splitlines())[0]
+    assert updated["nodes"] == header["nodes"] + 1 and updated["commit"] != header["commit"]
+
+
+def test_graph_endpoints_require_access_to_the_repository(client, make_repo, request_for, monkeypatch):
+    git_url = make_repo()
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    path = git_url[len("file://"):]
+    shutil.move(path, path + ".moved")
+    monkeypatch.setattr(repo_access, "_granted", {})
+    assert client.post("/graph", json=request_for(git_url)).status_code == 403
+    assert client.post("/plantuml-tree/pages", json=request_for(git_url)).status_code == 403
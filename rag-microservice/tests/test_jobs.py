@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+import pytest
+from app.models.schemas import PlantUMLTreeRequest
+from app.services import pipeline
+from app.services.jobs import FINISHED, Job, JobManager, job_manager
+
+
+@pytest.fixture(autouse=True)
+def jobs(client, monkeypatch):
+    """Every TestClient runs its own event loop: start each test with an idle job manager.
+
+    Jobs still running when the test ends are waited for, so the client does not
+    shut its loop down in the middle of a git subprocess.
+    """
+    monkeypatch.setattr(job_manager, "jobs", {})
+    monkeypatch.setattr(job_manager, "_by_key", {})
+    monkeypatch.setattr(job_manager, "_queue", None)
+    monkeypatch.setattr(job_manager, "_tasks", [])
+    yield job_manager
+    for job_id in list(job_manager.jobs):
+        wait_for(client, job_id)
+
+
+def wait_for(client, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in FINISHED or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_job_reports_stages_and_result(client, make_repo, request_for):
+    response = client.post("/plantuml-tree/jobs", json=request_for(make_repo()))
+    assert response.status_code == 202
+    job = wait_for(client, response.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["commit"] == job["result"]["metadata"]["commit"]
+    assert job["stages"]["fetch"]["status"] == "done"
+    assert job["counters"]["files_parsed"] == 5
+
+
+def test_identical_requests_share_a_job(client, make_repo, request_for):
+    body = request_for(make_repo())
+    first = client.post("/plantuml-tree/jobs", json=body).json()
+    second = client.post("/plantuml-tree/jobs", json=body).json()
+    assert second["job_id"] == first["job_id"]
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    other = client.post("/plantuml-tree/jobs", json=dict(body, max_depth=2)).json()
+    assert other["job_id"] != first["job_id"]
+    # Options that do not change the diagram still change the result (timings, freshness)
+    uncached = client.post("/plantuml-tree/jobs", json=dict(body, use_cache=False)).json()
+    assert uncached["job_id"] not in (first["job_id"], other["job_id"])
+    for job_id in (first["job_id"], other["job_id"], uncached["job_id"]):
+        assert wait_for(client, job_id)["status"] == "succeeded"
+    # Finished jobs are not shared: the repository may have new commits, an unchanged one hits the result cache
+    again = client.post("/plantuml-tree/jobs", json=body).json()
+    assert again["job_id"] != first["job_id"] and not again["deduplicated"]
+    assert wait_for(client, again["job_id"])["result"]["metadata"]["cached"]
+
+
+def test_failed_job_is_not_reused(client, make_repo, request_for):
+    body = request_for(make_repo(), code_folder="missing")
+    first = client.post("/plantuml-tree/jobs", json=body).json()
+    job = wait_for(client, first["job_id"])
+    assert job["status"] == "failed"
+    assert job["status_code"] >= 400 and job["error"]
+    second = client.post("/plantuml-tree/jobs", json=body).json()
+    assert second["job_id"] != first["job_id"] and not second["deduplicated"]
+
+
+def test_events_stream_progress_then_done(client, make_repo, request_for):
+    job_id = client.post("/plantuml-tree/jobs", json=request_for(make_repo())).json()["job_id"]
+    events = []
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                events.append(line[len("event: "):])
+            elif line.startswith("data: ") and events[-1] == "done":
+                done = json.loads(line[len("data: "):])
+                break
+    assert events[-1] == "done" and set(events[:-1]) <= {"progress"}
+    assert done["status"] == "succeeded" and "plantuml" in done["result"]
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.get("/jobs/missing/events").status_code == 404
+
+
+def test_jobs_are_queued_before_the_commit_is_resolved(request_for, monkeypatch):
+    resolved = []
+
+    async def resolve_remote_head(clone_url, timeout=60):
+        resolved.append(clone_url)
+        return None
+
+    monkeypatch.setattr(pipeline, "resolve_remote_head", resolve_remote_head)
+
+    async def submit():
+        manager = JobManager(workers=1)
+        job, _ = await manager.submit(PlantUMLTreeRequest(**request_for("https://example.com/repo.git")))
+        queued = (job.status, job.commit, list(resolved))
+        await manager.close()
+        return queued
+
+    assert asyncio.run(submit()) == ("queued", None, [])
+
+
+def test_finished_jobs_are_bounded_and_expire(request_for):
+    async def prune():
+        manager = JobManager(ttl=60, max_finished=2)
+        request = PlantUMLTreeRequest(**request_for("https://example.com/repo.git"))
+        jobs = [Job(request, f"key-{i}") for i in range(5)]
+        now = time.time()
+        for i, job in enumerate(jobs):
+            job.status, job.finished_at = "succeeded", now - 10 * (4 - i)
+            manager.jobs[job.id] = job
+        jobs[0].finished_at = now - 120  # Expired
+        jobs[1].status = "running"
+        manager._prune()
+        return [job in manager.jobs.values() for job in jobs]
+
+    kept = asyncio.run(prune())
+    # The running job is never dropped; of the finished ones only the newest two remain
+    assert kept == [False, True, False, True, True]
+
+
+def test_close_cancels_running_jobs(make_repo, request_for, monkeypatch):
+    started = None
+
+    async def analyze_repository(request, progress):
+        started.set()
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(pipeline, "analyze_repository", analyze_repository)
+
+    async def submit_and_close():
+        nonlocal started
+        started = asyncio.Event()
+        manager = JobManager(workers=1)
+        job, _ = await manager.submit(PlantUMLTreeRequest(**request_for(make_repo())))
+        await asyncio.wait_for(started.wait(), 10)
+        await manager.close()
+        return job
+
+    job = asyncio.run(submit_and_close())
+    assert (job.status, job.status_code) == ("failed", 503)
+    assert job.finished_at is not None
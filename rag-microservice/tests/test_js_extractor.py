@@ -0,0 +1,117 @@
+import pytest
+from app.services import js_extractor
+
+pytestmark = pytest.mark.skipif(not js_extractor.available(), reason="tree-sitter grammars are not installed")
+
+
+def by_name(functions):
+    return {func["name"]: func for func in functions}
+
+
+def test_declarations_expressions_and_methods():
+    code = """
+export function load(id) {
+  return fetchItem(id).then(parse);
+}
+const save = async (item) => {
+  validate(item);
+  return store.put(item);
+};
+class Repo extends Base {
+  find(id) { return this.lookup(id); }
+  remove = (id) => drop(id);
+}
+"""
+    functions = by_name(js_extractor.extract_functions(code, "src/repo.js"))
+    assert functions["load"]["type"] == "function_declaration"
+    assert functions["load"]["exported"]
+    assert functions["load"]["calls"] == ["then", "fetchItem"]
+    assert functions["save"]["type"] == "arrow_function"
+    assert not functions["save"]["exported"]
+    assert set(functions["save"]["calls"]) == {"validate", "put"}
+    assert functions["Repo"]["type"] == "class"
+    assert functions["find"]["class"] == "Repo" and functions["find"]["calls"] == ["lookup"]
+    assert functions["remove"]["type"] == "method_definition" and functions["remove"]["class"] == "Repo"
+    assert functions["load"]["line"] == 2 and functions["load"]["end_line"] == 4
+    assert all(func["file"] == "src/repo.js" for func in functions.values())
+
+
+def test_calls_in_callbacks_count_towards_the_enclosing_function():
+    code = """
+function outer(items) {
+  items.forEach((item) => { inner(item); });
+  function nested() { deep(); }
+  return nested;
+}
+"""
+    functions = by_name(js_extractor.extract_functions(code, "a.js"))
+    assert set(functions["outer"]["calls"]) == {"forEach", "inner"}
+    assert functions["nested"]["calls"] == ["deep"]
+
+
+def test_console_and_self_calls_are_skipped():
+    code = """
+function tick(n) {
+  console.log(n);
+  this.console.log(n);
+  logger.console.warn(n);
+  tick(n - 1);
+  tick(n - 2);
+  step();
+  step();
+}
+"""
+    functions = by_name(js_extractor.extract_functions(code, "a.js"))
+    # Only a bare `console` object is skipped; a console property of another object is a real call
+    assert functions["tick"]["calls"] == ["log", "warn", "step"]
+
+
+def test_long_call_chains_are_extracted():
+    chain = "".join(f".then(step{i})" for i in range(2000))
+    functions = js_extractor.extract_functions(f"function run() {{ start(){chain}; }}", "a.js")
+    assert functions[0]["calls"] == ["then", "start"]
+
+
+def test_jsx_components_and_their_usages():
+    code = """
+export default function App() {
+  return <Layout><Header title="x" /><div>{items.map(renderItem)}</div><ui.Button /></Layout>;
+}
+function helper() { return 1; }
+"""
+    functions = by_name(js_extractor.extract_functions(code, "src/App.jsx"))
+    assert functions["App"]["type"] == "component"
+    assert functions["App"]["exported"]
+    assert set(functions["App"]["calls"]) == {"Layout", "Header", "Button", "map"}
+    assert functions["helper"]["type"] == "function_declaration"
+
+
+def test_imports():
+    code = """
+import React, { useState as useLocalState, useEffect } from "react";
+import api from './api';
+import "./side-effect.css";
+"""
+    _, imports = js_extractor.extract(code, "a.js")
+    assert imports == {
+        "React": ["react", "default"],
+        "useLocalState": ["react", "useState"],
+        "useEffect": ["react", "useEffect"],
+        "api": ["./api", "default"],
+    }
+
+
+@pytest.mark.parametrize("filename", ["a.ts", "a.tsx", "a.mts"])
+def test_typescript_grammars(filename):
+    code = """
+interface Item { id: number }
+export abstract class Store<T> {
+  private items: Map<number, T> = new Map();
+  find(id: number): T | undefined { return this.items.get(id); }
+}
+export const total = (values: number[]): number => values.reduce((a, b) => a + b, 0);
+"""
+    functions = by_name(js_extractor.extract_functions(code, filename))
+    assert functions["Store"]["type"] == "class"
+    assert functions["find"]["class"] == "Store" and functions["find"]["calls"] == ["get"]
+    assert functions["total"]["exported"] and functions["total"]["calls"] == ["reduce"]
@@ -0,0 +1,50 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import llm_clients
+from app.services.pipeline import SUMMARY_MODEL
+from app.services.refinement import REFINE_MODEL
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """Real (never called) OpenAI clients with a fresh shared pool"""
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(llm_clients, "_http", None)
+    monkeypatch.setattr(llm_clients, "_chat_models", {})
+    monkeypatch.setattr(llm_clients, "_embeddings", None)
+    return llm_clients
+
+
+def test_clients_are_reused_and_share_one_pool(clients):
+    summary = clients.chat_model("gpt-3.5-turbo")
+    assert clients.chat_model("gpt-3.5-turbo") is summary
+    refine = clients.chat_model("gpt-4")
+    assert refine is not summary
+    sync_client, async_client = clients.http_clients()
+    assert summary.http_async_client is refine.http_async_client is async_client
+    assert summary.http_client is sync_client
+    assert clients.embeddings() is clients.embeddings()
+
+
+def test_close_releases_the_pool(clients):
+    summary = clients.chat_model("gpt-3.5-turbo")
+    sync_client, async_client = clients.http_clients()
+    asyncio.run(clients.close())
+    assert sync_client.is_closed and async_client.is_closed
+    assert clients.chat_model("gpt-3.5-turbo") is not summary
+    assert clients.http_clients()[1] is not async_client
+
+
+def test_clients_are_warmed_up_at_startup_and_closed_on_shutdown(clients):
+    with TestClient(app) as client:
+        assert client.get("/health").status_code == 200
+        deadline = time.monotonic() + 30
+        while not (clients._http and clients._embeddings) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        sync_client, async_client = clients._http
+        assert set(model for model, _ in clients._chat_models) == {SUMMARY_MODEL, REFINE_MODEL}
+    assert sync_client.is_closed and async_client.is_closed
+    assert clients._http is None and clients._chat_models == {}
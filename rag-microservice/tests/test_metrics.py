@@ -0,0 +1,45 @@
+import re
+
+
+def sample(text: str, name: str, **labels: str) -> float:
+    """Value of one sample in a Prometheus text exposition (0 when it has not been recorded yet)"""
+    for line in text.splitlines():
+        match = re.match(r"^([a-zA-Z_:][\w:]*)(?:\{(.*)\})? (\S+)$", line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == value for key, value in labels.items()):
+            return float(match.group(3))
+    return 0.0
+
+
+def test_metrics_are_scraped_after_an_analysis(client, make_repo, request_for):
+    before = client.get("/metrics").text
+    git_url = make_repo()
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    after = response.text
+
+    def delta(name, **labels):
+        return sample(after, name, **labels) - sample(before, name, **labels)
+
+    assert delta("agamify_analyses_total", outcome="computed") == 1
+    assert delta("agamify_analyses_total", outcome="cached") == 1
+    assert delta("agamify_stage_duration_seconds_count", stage="fetch", status="done") == 1
+    assert delta("agamify_files_total", result="parsed") == 5
+    assert delta("agamify_http_request_duration_seconds_count", method="POST", route="/plantuml-tree",
+                 status="200") == 2
+    assert sample(after, "agamify_analyses_active") == 0
+
+
+def test_timings_are_returned_on_request(client, make_repo, request_for):
+    result = client.post("/plantuml-tree", json=request_for(make_repo(), include_timings=True)).json()
+    timings = result["metadata"]["timings"]
+    assert {"fetch", "extract", "summarize", "refine", "total_sec"} <= set(timings)
+    assert timings["total_sec"] >= timings["summarize"]
+    plain = client.post("/plantuml-tree", json=request_for(make_repo())).json()
+    assert "timings" not in plain["metadata"]
@@ -0,0 +1,172 @@
+import asyncio
+from typing import Dict, List
+from app.services.cache import DiskLRUCache
+from app.services.fakes import FakeChatModel
+from app.services.migration import (
+    MODULE, Component, MigrationEngine, components_from_source, dependency_levels, parse_translation
+)
+
+
+def graph(deps: Dict[str, List[str]]) -> Dict[str, Component]:
+    components = {}
+    for line, (component_id, component_deps) in enumerate(deps.items()):
+        component = Component(component_id, f"code of {component_id}\n", line)
+        component.deps = list(component_deps)
+        components[component_id] = component
+    return components
+
+
+class RecordingModel(FakeChatModel):
+    """Fake chat model that keeps its prompts and fails on the components named in `failing`"""
+
+    prompts: List[str] = []
+    failing: List[str] = []
+
+    def _reply(self, messages):
+        text = "\n".join(str(message.content) for message in messages)
+        self.prompts.append(text)
+        if any(f"Component {name}:" in text for name in self.failing):
+            raise ValueError("model rejected the prompt")
+        return super()._reply(messages)
+
+
+def migrate(components, llm, cache=None, targets=("vue",)):
+    levels, _ = dependency_levels(components)
+    return asyncio.run(MigrationEngine(llm, cache, backoff_base=0).run(components, levels, "react", list(targets)))
+
+
+def test_levels_run_from_leaves_to_roots():
+    components = graph({"app": ["page", "api"], "page": ["button", "api"], "api": [], "button": []})
+    levels, cycles = dependency_levels(components)
+    assert levels == [["api", "button"], ["page"], ["app"]]
+    assert cycles == []
+
+
+def test_cycles_share_a_level():
+    components = graph({"a": ["b"], "b": ["c"], "c": ["b", "leaf"], "leaf": []})
+    levels, cycles = dependency_levels(components)
+    assert levels == [["leaf"], ["b", "c"], ["a"]]
+    assert cycles == [["b", "c"]]
+
+
+def test_hashes_cover_dependencies():
+    before = graph({"app": ["lib"], "lib": [], "other": []})
+    dependency_levels(before)
+    after = graph({"app": ["lib"], "lib": [], "other": []})
+    after["lib"].code = "changed\n"
+    dependency_levels(after)
+    assert after["lib"].hash != before["lib"].hash
+    assert after["app"].hash != before["app"].hash
+    assert after["other"].hash == before["other"].hash
+
+
+def test_snippet_components_and_their_dependencies():
+    code = """import React from "react";
+
+const LIMIT = 3;
+
+function Item({ label }) {
+  return <li>{label}</li>;
+}
+
+export function List({ items }) {
+  return <ul>{items.slice(0, LIMIT).map((item) => <Item label={item} />)}</ul>;
+}
+"""
+    components = components_from_source(code, "List.jsx")
+    assert set(components) == {MODULE, "Item", "List"}
+    assert components[MODULE].code == 'import React from "react";\n\nconst LIMIT = 3;\n'
+    assert components["Item"].deps == [MODULE]
+    assert components["List"].deps == [MODULE, "Item"]
+    assert dependency_levels(components)[0] == [[MODULE], ["Item"], ["List"]]
+
+
+def test_translations_of_dependencies_are_context_for_dependents():
+    components = graph({"app": ["lib"], "lib": []})
+    llm = RecordingModel(prompts=[])
+    result = migrate(components, llm, targets=["vue", "svelte"])
+    assert result.translated == 4 and result.failed == 0
+    assert result.confidence == 1.0
+    for target in ("vue", "svelte"):
+        lib_translation = result.translations[target]["lib"]
+        app_prompt = next(prompt for prompt in llm.prompts if "Component app:" in prompt and target in prompt)
+        assert f"--- lib ---\n{lib_translation}" in app_prompt
+
+
+def test_cached_translations_are_reused_while_inputs_are_unchanged(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "translations"), max_bytes=10 ** 7)
+    deps = {"app": ["lib"], "lib": [], "other": []}
+    first = migrate(graph(deps), FakeChatModel(), cache)
+    assert (first.translated, first.cached) == (3, 0)
+
+    llm = FakeChatModel()
+    again = migrate(graph(deps), llm, cache)
+    assert (again.translated, again.cached, llm.calls) == (0, 3, 0)
+    assert again.translations == first.translations
+
+    changed = graph(deps)
+    changed["lib"].code = "changed\n"
+    partial = migrate(changed, FakeChatModel(), cache)
+    assert (partial.translated, partial.cached) == (2, 1)  # lib and the app built on it
+
+
+def test_changed_dependency_translation_invalidates_dependents(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "translations"), max_bytes=10 ** 7)
+    deps = {"app": ["lib"], "lib": [], "other": []}
+    # lib fails and is kept as-is; app is translated against the untranslated lib
+    first = migrate(graph(deps), RecordingModel(prompts=[], failing=["lib"]), cache)
+    assert (first.translated, first.failed) == (2, 1)
+
+    second = migrate(graph(deps), RecordingModel(prompts=[]), cache)
+    # lib is translated now, so app's cached translation (written against the old lib) is not reused
+    assert (second.translated, second.cached, second.failed) == (2, 1, 0)
+
+
+def test_members_of_a_cycle_are_translated_without_each_other(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "translations"), max_bytes=10 ** 7)
+    deps = {"a": ["b", "leaf"], "b": ["a"], "leaf": []}
+    first = migrate(graph(deps), RecordingModel(prompts=[], failing=["b"]), cache)
+    assert (first.translated, first.failed) == (2, 1)
+
+    # a is answered from the cache before b is translated, yet b's prompt and cache key stay the same
+    llm = RecordingModel(prompts=[])
+    second = migrate(graph(deps), llm, cache)
+    assert (second.translated, second.cached) == (1, 2)
+    [b_prompt] = llm.prompts
+    assert "Component b:" in b_prompt and "--- a ---" not in b_prompt and "Dependencies:\n(none)" in b_prompt
+    third = migrate(graph(deps), RecordingModel(prompts=[]), cache)
+    assert (third.translated, third.cached) == (0, 3)
+
+
+def test_failures_keep_the_source_and_lower_confidence():
+    result = migrate(graph({"app": ["lib"], "lib": []}), RecordingModel(prompts=[], failing=["lib"]))
+    assert result.translations["vue"]["lib"] == "code of lib\n"
+    assert result.failed == 1 and result.confidence == 0.5
+    assert any("lib" in warning and "kept as-is" in warning for warning in result.warnings)
+
+
+def test_parse_translation():
+    reply = "Here it is:\n```vue\n<template>x</template>\n```\nDEPENDENCY: vue-router\nWARNING: no portals\n"
+    assert parse_translation(reply) == ("<template>x</template>\n", ["vue-router"], ["no portals"])
+    assert parse_translation("plain code") == ("plain code\n", [], [])
+
+
+def test_migrate_endpoint_for_a_snippet(client):
+    code = "function helper() {\n  return 1;\n}\n\nfunction main() {\n  return helper();\n}\n"
+    response = client.post("/migrate", json={"source_code": code, "filename": "main.js", "source_framework": "react",
+                                             "target_frameworks": ["vue"]})
+    body = response.json()
+    assert response.status_code == 200
+    assert body["levels"] == [["helper"], ["main"]]
+    assert body["stats"]["translated"] == 2 and body["confidence_score"] == 1.0
+    assert set(body["translated_code"]) == {"vue"}
+
+
+def test_migrate_endpoint_for_a_repository(client, make_repo):
+    git_url = make_repo("javascript", num_files=4)
+    body = client.post("/migrate", json={"git_url": git_url, "code_folder": "src", "language": "javascript",
+                                         "source_framework": "react", "target_frameworks": ["vue"]}).json()
+    # Every module calls the next one, so the files form one dependency cycle
+    assert body["levels"] == [[f"module_{i}.js" for i in range(4)]]
+    assert any("cycle" in warning for warning in body["warnings"])
+    assert set(body["translated_files"]["vue"]) == {f"module_{i}.js" for i in range(4)}
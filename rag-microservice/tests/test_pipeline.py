@@ -0,0 +1,84 @@
+import asyncio
+import subprocess
+import sys
+import pytest
+from app.services.cache import get_cache
+from app.services.pipeline import AnalysisError, AnalysisLimiter
+from app.utils.process import run_command
+
+
+def test_unchanged_commit_is_answered_from_the_result_cache(client, make_repo, request_for):
+    git_url = make_repo()
+    first = client.post("/plantuml-tree", json=request_for(git_url))
+    second = client.post("/plantuml-tree", json=request_for(git_url))
+    assert first.status_code == second.status_code == 200
+    assert not first.json()["metadata"]["cached"]
+    assert second.json()["metadata"]["cached"]
+    assert second.json()["plantuml"] == first.json()["plantuml"]
+
+
+def test_cache_can_be_bypassed(client, make_repo, request_for):
+    git_url = make_repo()
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    uncached = client.post("/plantuml-tree", json=request_for(git_url, use_cache=False)).json()
+    assert not uncached["metadata"]["cached"] and not uncached["metadata"]["incremental"]
+    assert uncached["metadata"]["total_functions"] == 20
+
+
+def test_missing_folder_is_reported(client, make_repo, request_for):
+    response = client.post("/plantuml-tree", json=request_for(make_repo(), code_folder="lib"))
+    assert response.status_code >= 400
+    assert "error" in response.json()
+    # Mirrors are released after failed analyses as well
+    assert get_cache("mirrors")._pins == {}
+
+
+def test_code_folder_is_resolved_inside_the_checkout(client, make_repo, request_for):
+    git_url = make_repo()
+    absolute = client.post("/plantuml-tree", json=request_for(git_url, code_folder="/src/"))
+    assert absolute.status_code == 200 and absolute.json()["metadata"]["total_files"] == 5
+    outside = client.post("/plantuml-tree", json=request_for(git_url, code_folder="../etc"))
+    assert outside.status_code == 400
+
+
+def test_mirror_is_unpinned_after_analysis(client, make_repo, request_for):
+    client.post("/plantuml-tree", json=request_for(make_repo())).raise_for_status()
+    assert get_cache("mirrors")._pins == {}
+
+
+def test_health_is_served(client):
+    assert client.get("/health").json() == {"status": "ok"}
+
+
+def test_limiter_rejects_requests_once_the_queue_is_full():
+    async def scenario():
+        limiter = AnalysisLimiter(limit=1, max_queued=1)
+        release = asyncio.Event()
+
+        async def analysis():
+            async with limiter:
+                await release.wait()
+
+        running = asyncio.create_task(analysis())
+        queued = asyncio.create_task(analysis())
+        await asyncio.sleep(0)
+        assert (limiter.active, limiter.queued) == (1, 1)
+        with pytest.raises(AnalysisError) as rejected:
+            async with limiter:
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value, limiter
+
+    error, limiter = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert (limiter.active, limiter.queued) == (0, 0)
+
+
+def test_run_command_mirrors_subprocess_run():
+    result = asyncio.run(run_command([sys.executable, "-c", "print('out')"]))
+    assert (result.returncode, result.stdout.strip()) == (0, "out")
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(run_command([sys.executable, "-c", "raise SystemExit(3)"]))
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(run_command([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.2))
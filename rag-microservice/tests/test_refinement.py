@@ -0,0 +1,137 @@
+import asyncio
+import time
+from app.services.call_graph import CallGraph
+from app.services.fakes import FakeChatModel
+from app.services.refinement import (
+    PARTITION_PROMPT, RefinementEngine, _communities, merge_fragments, plan_refinement
+)
+from app.utils.tokens import count_tokens
+
+INSTRUCTIONS = count_tokens(PARTITION_PROMPT.format(part="", parts="", fragment="", external="", summaries=""))
+
+
+def clustered_graph(clusters: int = 2, files: int = 4, functions: int = 5) -> CallGraph:
+    """Files of a cluster call each other in a ring; cluster c's first file also calls into cluster c + 1"""
+    records = []
+    for c in range(clusters):
+        for f in range(files):
+            for n in range(functions):
+                calls = [f"c{c}_f{(f + 1) % files}_n{n}"]
+                if f == 0 and n == 0 and c + 1 < clusters:
+                    calls.append(f"c{c + 1}_f0_n0")
+                records.append({"file": f"pkg{c}/file{f}.py", "name": f"c{c}_f{f}_n{n}", "class": None,
+                                "calls": calls})
+    return CallGraph(records)
+
+
+def files_of(plan):
+    return [file for partition in plan.partitions for file in partition.files]
+
+
+def test_communities_follow_the_call_structure():
+    files = ["a", "b", "c", "d", "e"]
+    weights = {(0, 1): 3, (1, 2): 3, (2, 3): 1, (3, 4): 5}
+    assert _communities(files, weights) == [["a", "b", "c"], ["d", "e"]]
+    assert _communities(files, {}) == [[file] for file in files]
+
+
+def test_small_graph_is_refined_in_one_partition():
+    graph = clustered_graph()
+    plan = plan_refinement(graph, {}, max_depth=5, budget=100000)
+    assert len(plan.partitions) == 1
+    assert sorted(files_of(plan)) == sorted({func["file"] for func in graph.functions})
+    assert plan.partitions[0].prompt_tokens <= plan.budget
+
+
+def test_partitions_fit_the_token_budget_and_keep_communities_together():
+    graph = clustered_graph(clusters=3)
+    single = plan_refinement(graph, {}, max_depth=5, budget=100000).partitions[0]
+    budget = INSTRUCTIONS + (single.prompt_tokens - INSTRUCTIONS) // 2
+    plan = plan_refinement(graph, {}, max_depth=5, budget=budget)
+    assert len(plan.partitions) > 1
+    assert sorted(files_of(plan)) == sorted(single.files)
+    for partition in plan.partitions:
+        assert partition.prompt is not None
+        assert partition.prompt_tokens <= budget
+        # Each partition holds whole clusters
+        assert len({file.split("/")[0] for file in partition.files}) * 4 == len(partition.files)
+    # Calls into other partitions are listed as external elements
+    assert "c1_f0_n0" in plan.partitions[0].prompt.split("Elements declared in other parts")[1]
+
+
+def test_summaries_over_budget_are_dropped():
+    graph = clustered_graph(clusters=1, files=2)
+    plain = plan_refinement(graph, {}, max_depth=5, budget=100000).partitions[0]
+    summaries = {"pkg0/file0.py": "short summary", "pkg0/file1.py": "long summary " * 500}
+    plan = plan_refinement(graph, summaries, max_depth=5, budget=plain.prompt_tokens + 50)
+    assert sum(partition.dropped_summaries for partition in plan.partitions) == 1
+    prompts = "".join(partition.prompt for partition in plan.partitions)
+    assert "short summary" in prompts and "long summary" not in prompts
+    assert all(partition.prompt_tokens <= plan.budget for partition in plan.partitions)
+
+
+def test_partition_over_budget_keeps_its_static_diagram():
+    graph = clustered_graph(clusters=1)
+    plan = plan_refinement(graph, {}, max_depth=5, budget=INSTRUCTIONS + 10)
+    assert all(partition.prompt is None for partition in plan.partitions)
+    llm = FakeChatModel(echo_plantuml=True)
+    result = asyncio.run(RefinementEngine(llm).run(plan))
+    assert llm.calls == 0
+    assert result.stats()["oversized"] == len(plan.partitions)
+    assert result.plantuml == plan.initial_plantuml()
+
+
+def test_engine_refines_every_partition_and_reports_tokens():
+    graph = clustered_graph(clusters=3)
+    single = plan_refinement(graph, {}, max_depth=5, budget=100000).partitions[0]
+    plan = plan_refinement(graph, {}, max_depth=5, budget=INSTRUCTIONS + (single.prompt_tokens - INSTRUCTIONS) // 2)
+    llm = FakeChatModel(echo_plantuml=True)
+    result = asyncio.run(RefinementEngine(llm).run(plan))
+    stats = result.stats()
+    assert llm.calls == stats["refined"] == len(plan.partitions)
+    assert stats["fallbacks"] == 0
+    assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+    assert stats["largest_prompt_tokens"] <= stats["token_budget"]
+    # Echoed fragments merge back into the static diagram
+    assert result.plantuml == plan.initial_plantuml()
+    assert result.plantuml.count("@startuml") == 1
+
+
+def test_unusable_or_failed_refinements_fall_back_to_the_static_fragment():
+    plan = plan_refinement(clustered_graph(), {}, max_depth=5, budget=100000)
+    result = asyncio.run(RefinementEngine(FakeChatModel(response="no diagram here")).run(plan))
+    assert result.fallbacks == 1 and result.refined == 0
+    assert result.plantuml == plan.initial_plantuml()
+
+    relations_lost = "@startuml\npackage \"x\" {\n}\n@enduml"
+    result = asyncio.run(RefinementEngine(FakeChatModel(response=relations_lost)).run(plan))
+    assert result.fallbacks == 1 and result.retries == 0
+
+    class BrokenModel(FakeChatModel):
+        async def ainvoke(self, *args, **kwargs):
+            raise ValueError("bad request")
+
+    result = asyncio.run(RefinementEngine(BrokenModel(), backoff_base=0).run(plan))
+    assert result.fallbacks == 1 and result.retries == 0
+    assert result.plantuml == plan.initial_plantuml()
+
+
+def test_partitions_are_refined_concurrently():
+    graph = clustered_graph(clusters=4)
+    single = plan_refinement(graph, {}, max_depth=5, budget=100000).partitions[0]
+    plan = plan_refinement(graph, {}, max_depth=5, budget=INSTRUCTIONS + (single.prompt_tokens - INSTRUCTIONS) // 3)
+    assert len(plan.partitions) >= 3
+    started = time.perf_counter()
+    asyncio.run(RefinementEngine(FakeChatModel(echo_plantuml=True, latency=0.3)).run(plan))
+    assert time.perf_counter() - started < 0.3 * len(plan.partitions) - 0.2
+
+
+def test_merge_drops_repeated_relations_and_settings():
+    first = "@startuml\nskinparam component {\n  BorderColor #000\n}\nA --> B\nA --> C\n@enduml"
+    second = "@startuml\n!theme plain\nA --> B\nC ..> D\n@enduml"
+    merged = merge_fragments([first, second])
+    body = merged.split("\n")
+    assert body.count("A --> B") == 1
+    assert "C ..> D" in body and "A --> C" in body
+    assert "  BorderColor #000" not in body
+    assert merged.startswith("@startuml") and merged.endswith("@enduml")
@@ -0,0 +1,63 @@
+import asyncio
+import subprocess
+from langchain_community.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from app.services.cache import DiskLRUCache
+from app.services.repo_state import RepoState, RepoStateStore, repo_state_key
+from app.utils.git import changed_files, head_commit
+
+GIT = ["git", "-c", "user.email=test@example.com", "-c", "user.name=test"]
+
+
+def commit_files(repo, files: dict) -> str:
+    for name, content in files.items():
+        (repo / name).write_text(content)
+    subprocess.run([*GIT, "add", "-A"], cwd=repo, check=True)
+    subprocess.run([*GIT, "commit", "-q", "-m", "change"], cwd=repo, check=True)
+    return asyncio.run(head_commit(str(repo)))
+
+
+def test_state_round_trips_through_the_store(tmp_path):
+    store = RepoStateStore(DiskLRUCache(str(tmp_path / "repos"), max_bytes=10 ** 7))
+    index = FAISS.from_texts(["def f(): pass"], FakeEmbeddings(size=8), ids=["a.py:0"])
+    state = RepoState("abc", {"a.py": {"hash": "h", "functions": [], "doc_ids": ["a.py:0"]}})
+    store.save("key", state, index, str(tmp_path / "work"))
+
+    loaded, index_dir = store.load("key")
+    assert loaded.commit == "abc" and loaded.files == state.files
+    assert loaded.doc_ids(["a.py", "missing.py"]) == ["a.py:0"]
+    assert index_dir is not None
+    assert store.load("other") == (None, None)
+
+
+def test_state_of_another_analysis_version_is_ignored(tmp_path):
+    store = RepoStateStore(DiskLRUCache(str(tmp_path / "repos"), max_bytes=10 ** 7))
+    index = FAISS.from_texts(["def f(): pass"], FakeEmbeddings(size=8))
+    state = RepoState("abc", {"a.py": {"hash": "h", "functions": []}}, analysis_version=1)
+    store.save("key", state, index, str(tmp_path / "work"))
+    loaded, _ = store.load("key", analysis_version=1)
+    assert loaded.commit == "abc" and loaded.analysis_version == 1
+    # Artifacts of older extractors are re-extracted rather than reused
+    assert store.load("key", analysis_version=2) == (None, None)
+
+
+def test_state_of_another_layout_version_is_ignored():
+    assert RepoState.from_dict({"version": -1, "commit": "abc", "files": {}}) is None
+    assert repo_state_key("url", "src", "Python", "openai:default") == repo_state_key("url", "src", "python",
+                                                                                      "openai:default")
+    assert repo_state_key("url", "src", "python", "openai:default") != repo_state_key("url", "lib", "python",
+                                                                                      "openai:default")
+    # An index built in another embedding space cannot be patched
+    assert repo_state_key("url", "src", "python", "openai:default") != repo_state_key("url", "src", "python",
+                                                                                      "local:minilm")
+
+
+def test_changed_files_between_commits(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    subprocess.run([*GIT, "init", "-q"], cwd=repo, check=True)
+    first = commit_files(repo, {"a.py": "a = 1\n", "b.py": "b = 1\n"})
+    second = commit_files(repo, {"b.py": "b = 2\n", "c.py": "c = 1\n"})
+    assert asyncio.run(changed_files(str(repo), first, second)) == {"b.py", "c.py"}
+    assert asyncio.run(changed_files(str(repo), second, second)) == set()
+    assert asyncio.run(changed_files(str(repo), "0" * 40, second)) is None
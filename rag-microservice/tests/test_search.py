@@ -0,0 +1,170 @@
+import asyncio
+import os
+import shutil
+import threading
+import numpy as np
+import pytest
+from app.services import access, search_index
+from app.services.access import RepoAccess, repo_access
+from app.services.search_index import SearchIndexStore, normalize_repo, search_indexes
+
+SPACE = "test:space"
+REPO = "https://example.com/org/repo.git"
+
+
+def info(repo=REPO, language="python", embedding=SPACE):
+    return {"repo": repo, "code_folder": "src", "language": language, "commit": "0" * 40, "embedding": embedding}
+
+
+def corpus(count=200, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    docs = [{"id": f"doc-{i}", "file": f"pkg_{i % 4}/module_{i % 10}.py", "text": f"chunk {i}"} for i in range(count)]
+    return vectors, docs
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SearchIndexStore(str(tmp_path / "search"))
+
+
+def test_nearest_document_is_returned_first(store):
+    vectors, docs = corpus()
+    store.publish("key", info(), vectors, docs)
+    found = store.search(vectors[42] * 3, SPACE, top_k=5)
+    assert found["indexes_searched"] == 1
+    assert len(found["results"]) == 5
+    best = found["results"][0]
+    assert best["id"] == "doc-42" and best["score"] == pytest.approx(1.0, abs=1e-5)
+    assert best["repo"] == REPO and best["language"] == "python" and best["text"] == "chunk 42"
+    scores = [result["score"] for result in found["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_file_prefix_filter(store):
+    vectors, docs = corpus()
+    store.publish("key", info(), vectors, docs)
+    results = store.search(vectors[42], SPACE, top_k=10, file="pkg_1/")["results"]
+    assert len(results) == 10
+    assert all(result["file"].startswith("pkg_1/") for result in results)
+    assert store.search(vectors[42], SPACE, file="pkg_2/module_2.py")["results"][0]["id"] == "doc-42"
+    assert store.search(vectors[0], SPACE, file="missing/")["results"] == []
+
+
+def test_repository_language_and_embedding_filters(store):
+    vectors, docs = corpus()
+    other = "https://example.com/org/other"
+    store.publish("a", info(), vectors, docs)
+    store.publish("b", info(repo=other, language="typescript"), vectors, docs)
+    store.publish("c", info(embedding="other:space"), vectors, docs)
+    assert store.search(vectors[0], SPACE)["indexes_searched"] == 2
+    assert sorted(store.repos(SPACE)) == sorted([REPO, other])
+    # URLs match regardless of case, a trailing slash or the .git suffix
+    only_repo = store.search(vectors[0], SPACE, repo="HTTPS://example.com/org/repo/")
+    assert only_repo["indexes_searched"] == 1 and {r["repo"] for r in only_repo["results"]} == {REPO}
+    assert store.search(vectors[0], SPACE, language="TypeScript")["results"][0]["repo"] == other
+    assert store.search(vectors[0], SPACE, repos=[other + ".git"])["indexes_searched"] == 1
+    assert store.search(vectors[0], SPACE, repos=[]) == {"results": [], "indexes_searched": 0}
+    assert normalize_repo("https://Example.com/x.git/") == "https://example.com/x"
+
+
+def test_republish_replaces_the_live_generation(store):
+    vectors, docs = corpus()
+    store.publish("key", info(), vectors, docs)
+    store.search(vectors[0], SPACE)  # Keep the first generation open
+    first, _ = store.current("key")
+    store.publish("key", info(), vectors[:50], docs[:50])
+    second, manifest = store.current("key")
+    assert second != first and manifest["count"] == 50
+    assert sorted(os.listdir(os.path.join(store.root, "key"))) == sorted([second, "CURRENT", ".lock"])
+    assert store.search(vectors[120], SPACE, top_k=1)["results"][0]["id"] != "doc-120"
+
+
+def test_large_indexes_use_ivf_and_republish_reuses_centroids(store, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_IVF_MIN_VECTORS", 1000)
+    vectors, docs = corpus(count=3000, dim=8)
+    store.publish("key", info(), vectors, docs)
+    _, manifest = store.current("key")
+    assert manifest["nlist"] > 1
+    centroids = store._centroids("key", 8)
+    vectors[:10] += 0.01  # An incremental analysis changes a few vectors
+    store.publish("key", info(), vectors, docs)
+    np.testing.assert_array_equal(store._centroids("key", 8), centroids)
+    assert store.search(vectors[7], SPACE, top_k=1)["results"][0]["id"] == "doc-7"
+    assert store.search(vectors[7], SPACE, top_k=1, file="pkg_3/")["results"][0]["file"].startswith("pkg_3/")
+
+
+def test_scheduled_publishes_coalesce_per_key(store):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    store.schedule("other", blocker)
+    started.wait(5)
+    for version in range(3):
+        store.schedule("key", lambda version=version: ran.append(version))
+    store.schedule("failing", lambda: 1 / 0)
+    release.set()
+    store.flush()
+    assert ran == [2]
+
+
+def test_empty_index_is_not_published(store):
+    store.publish("key", info(), np.zeros((0, 16), np.float32), [])
+    assert store.current("key") == (None, None)
+
+
+def test_search_endpoint_over_analyzed_repositories(client, make_repo, request_for):
+    git_url = make_repo()
+    client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    search_indexes.flush()
+    found = client.post("/search", json={"query": "def func_3_0(value)", "repo": git_url, "top_k": 3}).json()
+    assert found["indexes_searched"] == 1
+    assert len(found["results"]) == 3
+    assert all(result["repo"] == git_url for result in found["results"])
+    filtered = client.post("/search", json={"query": "func", "repo": git_url, "file": "module_2.py"}).json()
+    assert filtered["results"] and all(result["file"] == "module_2.py" for result in filtered["results"])
+    assert client.post("/search", json={"query": "  "}).status_code == 400
+
+
+def test_search_skips_repositories_the_caller_cannot_read(client, make_repo, request_for, monkeypatch):
+    readable, private = make_repo(), make_repo(num_files=6)
+    for git_url in (readable, private):
+        client.post("/plantuml-tree", json=request_for(git_url)).raise_for_status()
+    search_indexes.flush()
+    path = private[len("file://"):]
+    shutil.move(path, path + ".moved")  # The remote no longer answers the caller
+    monkeypatch.setattr(repo_access, "_granted", {})
+
+    found = client.post("/search", json={"query": "func", "top_k": 100}).json()
+    repos = {result["repo"] for result in found["results"]}
+    assert readable in repos and private not in repos
+    only_private = client.post("/search", json={"query": "func", "repo": private}).json()
+    assert only_private == {"results": [], "indexes_searched": 0, "search_ms": only_private["search_ms"]}
+
+
+def test_access_checks_are_cached_and_denials_expire_sooner(monkeypatch):
+    remotes = []
+
+    async def resolve_remote_head(clone_url, timeout=60):
+        remotes.append(clone_url)
+        await asyncio.sleep(0.01)
+        return None if "private" in clone_url else "0" * 40
+
+    monkeypatch.setattr(access, "resolve_remote_head", resolve_remote_head)
+    urls = ["https://example.com/public", "https://example.com/private"]
+
+    async def check_all(checker):
+        return await asyncio.gather(*(checker.check(url) for url in urls))
+
+    checker = RepoAccess(ttl=60, denied_ttl=60)
+    assert asyncio.run(check_all(checker)) == asyncio.run(check_all(checker)) == [True, False]
+    assert len(remotes) == 2
+    # Denials expire on their own TTL, grants stay cached
+    remotes.clear()
+    short = RepoAccess(ttl=60, denied_ttl=0)
+    asyncio.run(check_all(short))
+    asyncio.run(check_all(short))
+    assert sorted(remotes) == sorted([urls[0], urls[1], urls[1]])
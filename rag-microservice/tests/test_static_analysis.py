@@ -0,0 +1,87 @@
+import os
+import pytest
+from app.services import static_analysis
+from app.services.cache import DiskLRUCache, cache_key
+from app.services.static_analysis import analyze_files, discover_files
+
+VERSION = 1
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Ten small Python modules plus files the discovery must skip"""
+    code_path = tmp_path / "src"
+    for i in range(10):
+        package = code_path / f"pkg_{i % 3}"
+        package.mkdir(parents=True, exist_ok=True)
+        (package / f"module_{i}.py").write_text(
+            f"def func_{i}(value):\n    return helper_{i}(value)\n\n\ndef helper_{i}(value):\n    return value + {i}\n"
+        )
+    (code_path / "node_modules").mkdir()
+    (code_path / "node_modules" / "dep.py").write_text("def dep():\n    pass\n")
+    (code_path / "README.md").write_text("not code\n")
+    return str(code_path)
+
+
+def tasks_for(code_path, previous=None):
+    previous = previous or {}
+    return [(relative, absolute, previous.get(relative)) for relative, absolute
+            in discover_files(code_path, [".py"], {"node_modules"})]
+
+
+def test_discovery_is_sorted_and_skips_excluded_dirs(corpus):
+    paths = [relative for relative, _ in discover_files(corpus, [".py"], {"node_modules"})]
+    assert len(paths) == 10
+    assert paths == sorted(paths)
+    assert not any(path.startswith("node_modules") for path in paths)
+
+
+def test_batches_are_bounded_by_count_and_size(corpus):
+    tasks = tasks_for(corpus)
+    assert [len(batch) for batch in static_analysis._batches(tasks, 4, 10 ** 9)] == [4, 4, 2]
+    assert all(len(batch) == 1 for batch in static_analysis._batches(tasks, 64, 1))
+
+
+def test_process_pool_results_match_inline_analysis(corpus):
+    inline = {result.path: result for result in analyze_files(tasks_for(corpus), None, VERSION, workers=1)}
+    try:
+        pooled = list(analyze_files(tasks_for(corpus), None, VERSION, workers=2, batch_files=2))
+    finally:
+        static_analysis.shutdown_pool()
+    assert sorted(result.path for result in pooled) == sorted(inline)
+    for result in pooled:
+        expected = inline[result.path]
+        assert result.error is None
+        assert result.hash == expected.hash
+        assert result.functions == expected.functions
+        assert [chunk[0] for chunk in result.chunks] == [chunk[0] for chunk in expected.chunks]
+    names = {func["name"] for result in pooled for func in result.functions}
+    assert names == {f"{prefix}_{i}" for prefix in ("func", "helper") for i in range(10)}
+
+
+def test_unchanged_files_are_not_parsed_again(corpus):
+    first = {result.path: result.hash for result in analyze_files(tasks_for(corpus), None, VERSION, workers=1)}
+    again = list(analyze_files(tasks_for(corpus, previous=first), None, VERSION, workers=1))
+    assert all(result.functions is None and result.hash == first[result.path] for result in again)
+
+
+def test_functions_are_read_from_the_cache(corpus, tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "functions"), max_bytes=10 ** 7)
+    results = list(analyze_files(tasks_for(corpus), cache.root, VERSION, workers=1))
+    assert not any(result.cached for result in results)
+    for result in results:
+        cache.set(cache_key("functions", VERSION, result.hash), {"functions": result.functions, "imports": result.imports})
+
+    cached = list(analyze_files(tasks_for(corpus), cache.root, VERSION, workers=1))
+    assert all(result.cached for result in cached)
+    assert [result.functions for result in cached] == [result.functions for result in results]
+    # Another analysis version does not read entries of this one
+    assert not any(result.cached for result in analyze_files(tasks_for(corpus), cache.root, VERSION + 1, workers=1))
+
+
+def test_unreadable_file_is_reported_without_stopping_the_batch(corpus):
+    tasks = tasks_for(corpus)
+    tasks.insert(3, ("missing.py", os.path.join(corpus, "missing.py"), None))
+    results = {result.path: result for result in analyze_files(tasks, None, VERSION, workers=1)}
+    assert results["missing.py"].error
+    assert sum(1 for result in results.values() if result.error is None) == 10
@@ -0,0 +1,155 @@
+import asyncio
+import time
+import httpx
+import pytest
+from app.services import llm_clients
+from app.services.fakes import FakeChatModel, FakeEmbeddings
+from app.services.pipeline import SUMMARY_MODEL
+from app.services.summarizer import SummarizationPipeline, SummaryJob, TokenBucket, is_transient, with_retries
+
+
+class FlakyModel(FakeChatModel):
+    """Fake chat model whose first `failures` calls raise `error`"""
+
+    failures: int = 0
+    error: Exception = None
+    attempts: int = 0
+
+    def _reply(self, messages):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise self.error
+        return super()._reply(messages)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class OutageModel(FakeChatModel):
+    """Fake chat model that fails every call while `down` is set"""
+
+    down: bool = True
+
+    def _reply(self, messages):
+        if self.down:
+            raise ValueError("model unavailable")
+        return super()._reply(messages)
+
+
+class BrokenPromptModel(FakeChatModel):
+    """Fake chat model that always fails on prompts mentioning the word broken"""
+
+    def _reply(self, messages):
+        if any("broken" in str(message.content) for message in messages):
+            raise ValueError("bad prompt")
+        return super()._reply(messages)
+
+
+def chunker(key, summary):
+    return [(key, summary, {"file": "a.py"})]
+
+
+def run(llm, jobs):
+    pipeline = SummarizationPipeline(llm, FakeEmbeddings(), chunker, max_retries=2, backoff_base=0, batch_size=2)
+    return asyncio.run(pipeline.run(jobs))
+
+
+@pytest.mark.parametrize("error, transient", [
+    (StatusError(429), True),
+    (StatusError(503), True),
+    (StatusError(408), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (httpx.ConnectTimeout("timed out"), True),
+    (ValueError("bad prompt"), False),
+])
+def test_transient_errors(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_transient_failures_are_retried():
+    retries = []
+    llm = FlakyModel(failures=2, error=StatusError(429))
+    message = asyncio.run(with_retries(lambda: llm.ainvoke("hi"), "call", 2, 0, lambda: retries.append(1)))
+    assert message.content.startswith("Summary ")
+    assert (llm.attempts, len(retries)) == (3, 2)
+
+
+def test_permanent_failures_are_not_retried():
+    llm = FlakyModel(failures=1, error=StatusError(401))
+    with pytest.raises(StatusError):
+        asyncio.run(with_retries(lambda: llm.ainvoke("hi"), "call", 3, 0))
+    assert llm.attempts == 1
+
+
+def test_pipeline_summarizes_and_embeds_in_batches():
+    jobs = [SummaryJob(f"job-{i}", prompt=f"summarize {i}") for i in range(5)]
+    jobs.append(SummaryJob("known", summary="cached summary"))
+    jobs.append(SummaryJob("not-embedded", summary="skip me", embed=False))
+    llm = FakeChatModel()
+    result = run(llm, jobs)
+    assert llm.calls == 5
+    assert result.summaries["known"] == "cached summary"
+    assert sorted(key for key, _, _ in result.chunks) == sorted([f"job-{i}" for i in range(5)] + ["known"])
+    assert len(result.vectors) == len(result.chunks)
+    assert result.embedding_batches >= 3
+    assert result.stats()["failed"] == 0
+
+
+def test_failed_calls_are_retried():
+    llm = FlakyModel(failures=2, error=ConnectionResetError())
+    result = run(llm, [SummaryJob("a", prompt="x")])
+    assert llm.attempts == 3
+    assert result.retries == 2
+    assert "a" in result.summaries
+
+
+def test_pipeline_keeps_going_when_a_summary_fails():
+    result = run(BrokenPromptModel(), [SummaryJob("a", prompt="broken"), SummaryJob("b", prompt="fine")])
+    assert list(result.errors) == ["a"] and list(result.summaries) == ["b"]
+    assert [key for key, _, _ in result.chunks] == list(result.summaries)
+    assert result.retries == 0
+
+
+def test_token_bucket_waits_for_refill():
+    async def take_three():
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(take_three()) >= 0.08
+
+
+def test_code_chunks_are_embedded_next_to_summaries():
+    code = [(f"chunk-{i}", f"def f{i}(): pass", {"file": "a.py"}) for i in range(6)]
+    llm = FakeChatModel()
+    pipeline = SummarizationPipeline(llm, FakeEmbeddings(), chunker, max_retries=0, backoff_base=0, batch_size=4)
+    result = asyncio.run(pipeline.run([SummaryJob("big", prompt="summarize")], chunks=code))
+    assert llm.calls == 1
+    assert sorted(key for key, _, _ in result.chunks) == sorted([f"chunk-{i}" for i in range(6)] + ["big"])
+    assert len(result.vectors) == 7
+
+
+def test_analysis_with_failed_summaries_is_not_cached(client, make_repo, request_for, monkeypatch):
+    summary_model = OutageModel()
+    fake_chat_model = llm_clients.chat_model
+    monkeypatch.setattr(llm_clients, "chat_model", lambda model, temperature=0.1:
+                        summary_model if model == SUMMARY_MODEL else fake_chat_model(model, temperature))
+    body = request_for(make_repo(num_files=4, large_every=4))
+    first = client.post("/plantuml-tree", json=body).json()["metadata"]
+    assert first["summarization"]["failed"] == 2
+
+    # Same commit: only the files with failed summaries are analyzed again
+    summary_model.down = False
+    second = client.post("/plantuml-tree", json=body).json()["metadata"]
+    assert not second["cached"] and second["incremental"]
+    assert second["changed_files"] == 2 and second["summarization"]["chunks_summarized"] == 2
+    assert second["summarization"]["failed"] == 0
+    assert client.post("/plantuml-tree", json=body).json()["metadata"]["cached"]
@@ -0,0 +1,79 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services.embeddings import CachedEmbeddings
+from app.services.fakes import FakeEmbeddings
+from app.services.vector_cache import VectorCache, text_digest
+
+
+def vectors(count: int, dim: int = 4, start: int = 0):
+    return [[float(start + i)] * dim for i in range(count)]
+
+
+def test_hits_and_misses(tmp_path):
+    cache = VectorCache(str(tmp_path))
+    digests = [text_digest(f"text {i}") for i in range(3)]
+    assert cache.get_many(digests) == [None] * 3
+    cache.put_many(digests[:2], vectors(2))
+    cached = cache.get_many(digests)
+    assert [list(vector) for vector in cached[:2]] == vectors(2)
+    assert cached[2] is None
+    # Digests already cached are not appended again, duplicates within a call only once
+    cache.put_many([digests[0], digests[2], digests[2]], vectors(3, start=10))
+    assert len(cache) == 3
+    assert list(cache.get_many([digests[0]])[0]) == vectors(1)[0]
+
+
+def test_failed_write_leaves_no_placeholders(tmp_path, monkeypatch):
+    cache = VectorCache(str(tmp_path))
+    digests = [text_digest(f"text {i}") for i in range(2)]
+
+    def disk_full():
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache, "_map", disk_full)
+    with pytest.raises(OSError):
+        cache.put_many(digests, vectors(2))
+    monkeypatch.undo()
+    assert cache.get_many(digests) == [None, None]
+    cache.put_many(digests, vectors(2))
+    assert [list(vector) for vector in cache.get_many(digests)] == vectors(2)
+
+
+def test_rows_appended_by_another_instance_are_picked_up(tmp_path):
+    writer, reader = VectorCache(str(tmp_path)), VectorCache(str(tmp_path))
+    digests = [text_digest(f"text {i}") for i in range(2000)]
+    writer.put_many(digests[:10], vectors(10))
+    assert list(reader.get_many([digests[9]])[0]) == vectors(10)[9]
+    # Growing past the initial capacity remaps the matrix in both instances
+    writer.put_many(digests[10:], vectors(1990, start=10))
+    reader.put_many([text_digest("from reader")], vectors(1, start=-1))
+    assert len(writer) == len(reader) == 2001
+    assert list(writer.get_many([text_digest("from reader")])[0]) == vectors(1, start=-1)[0]
+    assert np.array_equal(reader.get_many([digests[1999]])[0], np.full(4, 1999, dtype=np.float32))
+
+
+def test_new_generation_on_dimension_change_or_quota(tmp_path):
+    cache = VectorCache(str(tmp_path), max_bytes=10 * 4 * 4)
+    other = VectorCache(str(tmp_path), max_bytes=10 * 4 * 4)
+    first = [text_digest(f"text {i}") for i in range(8)]
+    cache.put_many(first, vectors(8))
+    assert len(other) == 8
+    # Three more rows would pass max_bytes: the cache starts over with just them
+    cache.put_many([text_digest(f"more {i}") for i in range(3)], vectors(3))
+    assert len(cache) == len(other) == 3
+    assert other.get_many(first) == [None] * 8
+    cache.put_many([text_digest("wide")], vectors(1, dim=8))
+    assert (len(other), other.dim) == (1, 8)
+    assert len(list(tmp_path.glob("vectors-*.f32"))) == 1
+
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    inner = FakeEmbeddings(size=8)
+    embeddings = CachedEmbeddings(inner, VectorCache(str(tmp_path)))
+    first = asyncio.run(embeddings.aembed_documents(["a", "b"]))
+    second = embeddings.embed_documents(["b", "c", "a"])
+    assert (embeddings.hits, embeddings.misses) == (2, 3)
+    assert inner.batches == 2
+    assert np.allclose(second[0], first[1]) and np.allclose(second[2], first[0])
+    assert np.allclose(second[1], inner.embed_query("c"))